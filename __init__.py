@@ -1,5 +1,6 @@
 from .nodes import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS
 
+# Registers the /deploy routes; they have to exist before the server starts
 from . import generate_requirements
 
 WEB_DIRECTORY = "./web"
@@ -0,0 +1,359 @@
+"""Offline benchmarks for the deploy pipeline.
+
+Builds a synthetic ComfyUI tree, starts a local stand-in for the deploy API
+and S3, and times each stage of a deployment. Uploading is also timed on
+its own, with the models already hashed, so upload regressions show up
+apart from hashing. For every stage it reports wall time, throughput,
+peak RSS and the number of subprocesses spawned.
+
+    python benchmarks/run_benchmarks.py --num-models 15 --model-size-mb 2048
+
+Nothing leaves the machine: the API URL and cache directory are pointed at
+the stand-in and a scratch directory before the extension is imported.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_tree import build_tree  # noqa: E402
+
+
+MB = 1024 * 1024
+
+
+class RssSampler:
+    """Samples this process's RSS in a background thread to find a stage's peak."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            # ru_maxrss is the lifetime peak (KiB on Linux), the best we can do here
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+class SubprocessCounter:
+    """Counts subprocess.Popen calls made while the benchmarks run."""
+
+    def __init__(self):
+        self.count = 0
+        self._original_init = subprocess.Popen.__init__
+
+    def install(self):
+        counter = self
+
+        def counting_init(popen, *args, **kwargs):
+            counter.count += 1
+            return counter._original_init(popen, *args, **kwargs)
+
+        subprocess.Popen.__init__ = counting_init
+
+
+def measure(results, counter, stage, fn, bytes_processed=None):
+    print(f"Running {stage}...")
+    start_count = counter.count
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+    results.append(
+        {
+            "stage": stage,
+            "wall_s": round(elapsed, 4),
+            "bytes": bytes_processed,
+            "mb_per_s": round(bytes_processed / MB / elapsed, 1)
+            if bytes_processed and elapsed > 0
+            else None,
+            "peak_rss_mb": round(sampler.peak / MB, 1),
+            "subprocesses": counter.count - start_count,
+        }
+    )
+    return value
+
+
+def install_prompt_server_stand_in():
+    """Provide the `server` module the extension imports, outside ComfyUI."""
+    from aiohttp import web
+
+    class PromptServer:
+        instance = None
+
+        def __init__(self):
+            self.routes = web.RouteTableDef()
+            self.events = 0
+
+        def send_sync(self, event, data, sid=None):
+            self.events += 1
+
+    PromptServer.instance = PromptServer()
+    server_module = types.ModuleType("server")
+    server_module.PromptServer = PromptServer
+    sys.modules["server"] = server_module
+    return PromptServer.instance
+
+
+def install_nodes_stand_in(object_info):
+    """Provide ComfyUI's `nodes` registry, built from the synthetic object_info."""
+    nodes_module = types.ModuleType("nodes")
+    nodes_module.NODE_CLASS_MAPPINGS = {}
+    nodes_module.NODE_DISPLAY_NAME_MAPPINGS = {}
+    for class_type, info in object_info.items():
+        node_class = type(
+            class_type,
+            (),
+            {
+                "INPUT_TYPES": classmethod(lambda cls, inputs=info["input"]: inputs),
+                "RELATIVE_PYTHON_MODULE": info["python_module"],
+            },
+        )
+        nodes_module.NODE_CLASS_MAPPINGS[class_type] = node_class
+        nodes_module.NODE_DISPLAY_NAME_MAPPINGS[class_type] = info["display_name"]
+    sys.modules["nodes"] = nodes_module
+
+
+def load_extension():
+    spec = importlib.util.spec_from_file_location(
+        "deploy_node",
+        os.path.join(REPO_DIR, "__init__.py"),
+        submodule_search_locations=[REPO_DIR],
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["deploy_node"] = package
+    spec.loader.exec_module(package)
+    return sys.modules["deploy_node.generate_requirements"]
+
+
+def print_report(results):
+    header = f"{'stage':<34}{'wall s':>10}{'MB/s':>10}{'peak RSS MB':>13}{'procs':>7}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        mb_per_s = "" if row["mb_per_s"] is None else f"{row['mb_per_s']:.1f}"
+        print(
+            f"{row['stage']:<34}{row['wall_s']:>10.3f}{mb_per_s:>10}"
+            f"{row['peak_rss_mb']:>13.1f}{row['subprocesses']:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workdir", help="Where to build the synthetic tree")
+    parser.add_argument("--num-models", type=int, default=15)
+    parser.add_argument("--model-size-mb", type=int, default=2048)
+    parser.add_argument("--custom-nodes", type=int, default=30)
+    parser.add_argument("--files-per-node", type=int, default=500)
+    parser.add_argument("--chunk-size-mb", type=int, default=64)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic tree")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="deploy-node-bench-")
+    tree_root = os.path.join(workdir, "ComfyUI")
+    print(f"Building synthetic tree in {tree_root}")
+    tree = build_tree(
+        tree_root,
+        num_models=args.num_models,
+        model_size=args.model_size_mb * MB,
+        num_custom_nodes=args.custom_nodes,
+        files_per_custom_node=args.files_per_node,
+    )
+    total_model_bytes = sum(os.path.getsize(p) for p in tree["model_paths"])
+
+    # The extension reads these at import time
+    cache_dir = os.path.join(workdir, "cache")
+    os.environ["DEPLOY_NODE_CACHE_DIR"] = cache_dir
+    os.chdir(tree["base_dir"])
+
+    from stand_in import StandInServer
+
+    prompt_server = install_prompt_server_stand_in()
+    install_nodes_stand_in(tree["object_info"])
+    server = StandInServer(chunk_size=args.chunk_size_mb * MB)
+    gr = load_extension()
+    server.app.add_routes(prompt_server.routes)
+    server.start()
+    gr.API_BASE_URL = server.api_url
+
+    import requests
+
+    counter = SubprocessCounter()
+    counter.install()
+    results = []
+
+    def post(path, payload):
+        response = requests.post(f"{server.base_url}{path}", json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def build_index():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        gr.model_index = gr.ModelIndex(
+            gr.SEARCH_DIRS, os.path.join(cache_dir, "model_index.json")
+        )
+        gr.model_index.refresh()
+
+    measure(results, counter, "model index build (cold)", build_index)
+    measure(results, counter, "model index refresh (warm)", gr.model_index.refresh)
+
+    measure(
+        results,
+        counter,
+        "get_initial_models",
+        lambda: post("/deploy/get_initial_models", {"workflow": tree["workflow"]}),
+    )
+
+    def validate_all():
+        for name in tree["model_names"]:
+            post("/deploy/validate_and_get_model_paths", {"path": name})
+        for folder in sorted({os.path.basename(os.path.dirname(p)) for p in tree["model_paths"]}):
+            post("/deploy/validate_and_get_model_paths", {"path": folder})
+
+    measure(results, counter, "validate_and_get_model_paths", validate_all)
+
+    def hash_all():
+        hashes = gr.get_file_hashes(tree["model_paths"])
+        errors = [h for h in hashes.values() if isinstance(h, Exception)]
+        if errors:
+            raise errors[0]
+
+    gr.hash_cache = gr.HashCache(os.path.join(cache_dir, "hash_cache.json"))
+    measure(results, counter, "hashing (cold cache)", hash_all, total_model_bytes)
+    measure(results, counter, "hashing (warm cache)", hash_all)
+
+    repo_paths = [
+        os.path.join("custom_nodes", repo) for repo in tree["custom_node_repos"]
+    ]
+    git_info = sys.modules["deploy_node.git_info"]
+    gr.git_info_reader = git_info.GitInfoReader()
+    measure(
+        results, counter, "git info (cold)", lambda: gr.git_info_reader.read_many(repo_paths)
+    )
+    measure(
+        results, counter, "git info (warm)", lambda: gr.git_info_reader.read_many(repo_paths)
+    )
+    measure(
+        results,
+        counter,
+        "git info (CLI, previous behaviour)",
+        lambda: [git_info.get_git_version_info_cli(path) for path in repo_paths],
+    )
+
+    api_headers = gr.get_api_headers({"user_id": "bench-user", "secret_key": "bench-secret"})
+
+    def presign_models():
+        """Presigned parts for every model, as /package returns them for a deployment."""
+        hashes = gr.get_file_hashes(tree["model_paths"])
+        models = [
+            {
+                "relative_path": os.path.relpath(path, tree["base_dir"]),
+                "file_size": os.path.getsize(path),
+                "model_hash": hashes[path],
+                "content_type": "application/octet-stream",
+            }
+            for path in tree["model_paths"]
+        ]
+        return post("/api/package", {"package": {"models": models}})["files"]
+
+    def upload_all(presigned_urls):
+        journals = [
+            gr.open_upload_journal(presigned_url, deployment_id="bench-upload")
+            for presigned_url in presigned_urls
+        ]
+        # Raises the first failed file's error
+        gr.upload_journaled_files(api_headers, journals)
+
+    presigned_urls = presign_models()
+    received_before = server.stats["bytes_received"]
+    parts_before = server.stats["parts"]
+    measure(
+        results,
+        counter,
+        "upload only (pre-hashed parts)",
+        lambda: upload_all(presigned_urls),
+        total_model_bytes,
+    )
+    upload_stage_bytes = server.stats["bytes_received"] - received_before
+    upload_stage_parts = server.stats["parts"] - parts_before
+
+    deploy_request = {
+        "workflow": tree["workflow"],
+        "product_name": "bench",
+        "user_id": "bench-user",
+        "secret_key": "bench-secret",
+        "additional_model_paths": tree["model_paths"],
+    }
+    received_before = server.stats["bytes_received"]
+    parts_before = server.stats["parts"]
+    deploy_result = measure(
+        results,
+        counter,
+        "deploy (package + upload + build)",
+        lambda: gr.run_deployment(deploy_request),
+        total_model_bytes,
+    )
+    if deploy_result.get("status") != "success":
+        print(f"Deployment failed: {deploy_result.get('message')}")
+    uploaded = server.stats["bytes_received"] - received_before
+    deploy_parts = server.stats["parts"] - parts_before
+
+    server.stop()
+    print_report(results)
+    print()
+    print(f"Models: {args.num_models} x {args.model_size_mb} MB (sparse)")
+    print(
+        f"Upload stage sent {upload_stage_bytes / MB:.1f} MB in {upload_stage_parts} parts"
+    )
+    print(f"Stand-in received {uploaded / MB:.1f} MB in {deploy_parts} parts")
+    print(f"Progress events sent: {prompt_server.events}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"args": vars(args), "results": results, "stand_in": server.stats}, f, indent=2
+            )
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
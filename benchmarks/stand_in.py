@@ -0,0 +1,192 @@
+"""Local stand-in for the deploy API and S3 presigned-PUT endpoints."""
+
+import asyncio
+import hashlib
+import threading
+import uuid
+
+from aiohttp import web
+
+
+class StandInServer:
+    """Serves /package, /complete-upload, /abort-upload, /trigger-package-build and part PUTs.
+
+    Also acts as a content-addressed chunk store (/chunks/missing, chunk
+    PUTs and /files), which only keeps chunk sizes, not their bytes.
+
+    Runs its own event loop in a background thread. Extra route tables (the
+    extension's /deploy/* routes) can be mounted on the same app so they are
+    served the way PromptServer would serve them.
+    """
+
+    def __init__(self, chunk_size=64 * 1024 * 1024, extra_routes=None, host="127.0.0.1"):
+        self.chunk_size = chunk_size
+        self.host = host
+        self.port = None
+        self.uploads = {}
+        self.chunks = {}
+        self.files = {}
+        self.stats = {
+            "packages": 0,
+            "parts": 0,
+            "bytes_received": 0,
+            "completed_uploads": 0,
+            "aborted_uploads": 0,
+            "builds": 0,
+            "chunks": 0,
+            "chunk_bytes_received": 0,
+            "chunked_files": 0,
+        }
+        self._lock = threading.Lock()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+        self.app = web.Application(client_max_size=1024**3)
+        self.app.router.add_post("/api/package", self.package)
+        self.app.router.add_post("/api/complete-upload", self.complete_upload)
+        self.app.router.add_post("/api/abort-upload", self.abort_upload)
+        self.app.router.add_post("/api/trigger-package-build", self.trigger_build)
+        self.app.router.add_put("/s3/{upload_id}/{part_number}", self.put_part)
+        self.app.router.add_post("/api/chunks/missing", self.missing_chunks)
+        self.app.router.add_put("/api/chunks/{digest}", self.put_chunk)
+        self.app.router.add_post("/api/files", self.assemble_file)
+        for routes in extra_routes or []:
+            self.app.add_routes(routes)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/api"
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    async def package(self, request):
+        body = await request.json()
+        self._count("packages")
+        files = []
+        for model in body["package"]["models"]:
+            upload_id = uuid.uuid4().hex
+            num_parts = max(1, -(-model["file_size"] // self.chunk_size))
+            self.uploads[upload_id] = {"num_parts": num_parts, "parts": {}}
+            files.append(
+                {
+                    "file_path": model["relative_path"],
+                    "content_type": model["content_type"],
+                    "presigned_url": {
+                        "key": f"models/{model['model_hash']}",
+                        "upload_id": upload_id,
+                        "chunk_size": self.chunk_size,
+                        "urls": [
+                            f"{self.base_url}/s3/{upload_id}/{n}"
+                            for n in range(1, num_parts + 1)
+                        ],
+                        "fields": {},
+                    },
+                }
+            )
+        return web.json_response(
+            {"product_id": uuid.uuid4().hex, "files": files, "message": "Package saved"}
+        )
+
+    async def put_part(self, request):
+        upload_id = request.match_info["upload_id"]
+        part_number = int(request.match_info["part_number"])
+        md5 = hashlib.md5()
+        received = 0
+        async for block in request.content.iter_chunked(1024 * 1024):
+            md5.update(block)
+            received += len(block)
+        self._count("parts")
+        self._count("bytes_received", received)
+        etag = md5.hexdigest()
+        self.uploads.setdefault(upload_id, {"parts": {}})["parts"][part_number] = etag
+        return web.Response(headers={"ETag": f'"{etag}"'})
+
+    async def complete_upload(self, request):
+        body = await request.json()
+        upload = self.uploads.get(body["upload_id"])
+        if upload is None:
+            return web.json_response({"message": "Unknown upload"}, status=404)
+        expected = [f'"{upload["parts"].get(n)}"' for n in range(1, len(body["etags"]) + 1)]
+        # Like S3, an upload may be completed with fewer parts than were presigned,
+        # which is what compressed uploads do
+        if len(body["etags"]) > upload.get("num_parts", 0) or body["etags"] != expected:
+            return web.json_response({"message": "ETag mismatch"}, status=400)
+        self._count("completed_uploads")
+        return web.json_response({"location": body["key"]})
+
+    async def abort_upload(self, request):
+        body = await request.json()
+        if self.uploads.pop(body["upload_id"], None) is None:
+            return web.json_response({"message": "Unknown upload"}, status=404)
+        self._count("aborted_uploads")
+        return web.json_response({"status": "aborted"})
+
+    async def missing_chunks(self, request):
+        body = await request.json()
+        return web.json_response(
+            {"missing": [digest for digest in body["digests"] if digest not in self.chunks]}
+        )
+
+    async def put_chunk(self, request):
+        digest = request.match_info["digest"]
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        received = 0
+        async for block in request.content.iter_chunked(1024 * 1024):
+            sha256.update(block)
+            md5.update(block)
+            received += len(block)
+        if sha256.hexdigest() != digest:
+            return web.json_response({"message": "Chunk digest mismatch"}, status=400)
+        self._count("chunks")
+        self._count("chunk_bytes_received", received)
+        self.chunks[digest] = received
+        return web.Response(headers={"ETag": f'"{md5.hexdigest()}"'})
+
+    async def assemble_file(self, request):
+        body = await request.json()
+        missing = [digest for digest, _ in body["chunks"] if digest not in self.chunks]
+        if missing:
+            return web.json_response({"message": f"{len(missing)} chunks missing"}, status=400)
+        if sum(length for _, length in body["chunks"]) != body["file_size"]:
+            return web.json_response({"message": "Chunk sizes don't add up"}, status=400)
+        self.files[body["key"]] = body["chunks"]
+        self._count("chunked_files")
+        return web.json_response({"location": body["key"]})
+
+    async def trigger_build(self, request):
+        await request.json()
+        self._count("builds")
+        return web.json_response({"status": "build triggered"})
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, 0)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
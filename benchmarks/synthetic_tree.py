@@ -0,0 +1,155 @@
+"""Builds a synthetic ComfyUI install for the deploy benchmarks."""
+
+import os
+import shutil
+import subprocess
+
+
+MODEL_FOLDERS = (
+    # (models/ subfolder, loader class, input name, extension)
+    ("checkpoints", "CheckpointLoaderSimple", "ckpt_name", ".safetensors"),
+    ("loras", "LoraLoader", "lora_name", ".safetensors"),
+    ("vae", "VAELoader", "vae_name", ".pt"),
+)
+
+
+def _make_sparse_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+        # A little real data so files don't all hash the same
+        f.write(os.path.basename(path).encode("utf-8"))
+
+
+def _git(repo_path, *args):
+    subprocess.run(
+        ["git", *args],
+        cwd=repo_path,
+        check=True,
+        capture_output=True,
+        env={
+            **os.environ,
+            "GIT_AUTHOR_NAME": "bench",
+            "GIT_AUTHOR_EMAIL": "bench@example.com",
+            "GIT_COMMITTER_NAME": "bench",
+            "GIT_COMMITTER_EMAIL": "bench@example.com",
+        },
+    )
+
+
+def _make_custom_node(repo_path, index, num_files, with_git):
+    files_per_dir = 100
+    for i in range(num_files):
+        sub_dir = os.path.join(repo_path, f"pkg_{i // files_per_dir}")
+        os.makedirs(sub_dir, exist_ok=True)
+        with open(os.path.join(sub_dir, f"module_{i}.py"), "w") as f:
+            f.write(f"# synthetic module {i}\n")
+    with open(os.path.join(repo_path, "README.md"), "w") as f:
+        f.write(f"Synthetic custom node {index}\n")
+
+    if not with_git:
+        return
+    _git(repo_path, "init", "-q")
+    _git(repo_path, "remote", "add", "origin", f"git@github.com:bench/custom-node-{index}.git")
+    _git(repo_path, "add", "README.md")
+    _git(repo_path, "commit", "-q", "-m", "initial")
+    if index % 2 == 0:
+        _git(repo_path, "tag", "-a", f"v1.{index}", "-m", "release")
+    if index % 3 == 0:
+        _git(repo_path, "pack-refs", "--all")
+
+
+def build_tree(
+    root,
+    num_models=15,
+    model_size=2 * 1024**3,
+    num_custom_nodes=30,
+    files_per_custom_node=500,
+    extra_node_classes=2000,
+    with_git=True,
+):
+    """Create models/, custom_nodes/, a prompt-format workflow and object_info.
+
+    Model files are sparse, so multi-GB files cost no disk space; hashing
+    and uploading them still goes through every byte.
+    """
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    models_dir = os.path.join(root, "models")
+    custom_nodes_dir = os.path.join(root, "custom_nodes")
+    os.makedirs(models_dir)
+    os.makedirs(custom_nodes_dir)
+
+    if with_git and shutil.which("git") is None:
+        print("git not found, custom nodes won't be git repositories")
+        with_git = False
+
+    workflow = {}
+    object_info = {}
+    model_paths = []
+    model_names = []
+    options_by_class = {}
+    for i in range(num_models):
+        folder, class_type, input_name, extension = MODEL_FOLDERS[i % len(MODEL_FOLDERS)]
+        name = f"model_{i:03d}{extension}"
+        path = os.path.join(models_dir, folder, name)
+        _make_sparse_file(path, model_size)
+        model_paths.append(path)
+        model_names.append(name)
+        options_by_class.setdefault(class_type, (input_name, []))[1].append(name)
+        workflow[str(len(workflow) + 1)] = {
+            "class_type": class_type,
+            "inputs": {input_name: name},
+        }
+
+    for class_type, (input_name, options) in options_by_class.items():
+        object_info[class_type] = {
+            "input": {"required": {input_name: [options]}},
+            "python_module": "nodes",
+            "display_name": class_type,
+        }
+
+    # ComfyUI itself is a git checkout; its tag is the reported comfyui_version
+    with open(os.path.join(root, "main.py"), "w") as f:
+        f.write("# synthetic ComfyUI\n")
+    if with_git:
+        _git(root, "init", "-q")
+        _git(root, "add", "main.py")
+        _git(root, "commit", "-q", "-m", "ComfyUI")
+        _git(root, "tag", "v0.3.0")
+
+    custom_node_repos = []
+    for i in range(num_custom_nodes):
+        repo_name = f"custom-node-{i:03d}"
+        repo_path = os.path.join(custom_nodes_dir, repo_name)
+        _make_custom_node(repo_path, i, files_per_custom_node, with_git)
+        custom_node_repos.append(repo_name)
+        class_type = f"BenchNode{i:03d}"
+        object_info[class_type] = {
+            "input": {"required": {"value": ["INT", {"default": 0}]}},
+            "python_module": f"custom_nodes.{repo_name}",
+            "display_name": f"Bench Node {i}",
+        }
+        workflow[str(len(workflow) + 1)] = {
+            "class_type": class_type,
+            "inputs": {"value": i, "model": ["1", 0]},
+        }
+
+    # Unused node classes, so object_info is about as large as a real install's
+    for i in range(extra_node_classes):
+        object_info[f"UnusedNode{i}"] = {
+            "input": {"required": {"text": ["STRING", {"multiline": True}]}},
+            "python_module": f"custom_nodes.unused-pack-{i % 50}",
+            "display_name": f"Unused Node {i}",
+        }
+
+    return {
+        "base_dir": root,
+        "models_dir": models_dir,
+        "custom_nodes_dir": custom_nodes_dir,
+        "model_paths": model_paths,
+        "model_names": model_names,
+        "custom_node_repos": custom_node_repos,
+        "workflow": workflow,
+        "object_info": object_info,
+    }
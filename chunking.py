@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    # Always present in a ComfyUI install; the pure Python path is a slow fallback
+    import numpy as np
+except ImportError:
+    np = None
+
+
+DEFAULT_AVG_CHUNK_SIZE = 1024 * 1024
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+# Limits on the chunk index; at the default chunk size each is about 250 GB
+# of model data and a few tens of MB of JSON
+DEFAULT_MAX_KNOWN_CHUNKS = 250000
+DEFAULT_MAX_FILE_CHUNKS = 250000
+
+
+def _gear_table():
+    # Fixed pseudo-random values, so chunk boundaries are stable across runs
+    return [
+        int.from_bytes(hashlib.sha256(b"deploy-node-gear-%d" % i).digest()[:4], "little")
+        for i in range(256)
+    ]
+
+
+GEAR = _gear_table()
+_GEAR_NP = np.array(GEAR, dtype=np.uint32) if np is not None else None
+
+
+class Chunk(NamedTuple):
+    offset: int
+    length: int
+    digest: str
+
+
+def _candidates_numpy(block, context, bits):
+    """Offsets i in block where the gear hash of the bytes up to i hits the mask.
+
+    The gear hash is h = (h << 1) + GEAR[byte]; its low `bits` bits only
+    depend on the last `bits` bytes, so it can be computed for a whole
+    block at once as a sum of shifted table lookups.
+    """
+    data = np.frombuffer(context + block, dtype=np.uint8)
+    g = _GEAR_NP[data]
+    n = len(block)
+    p = len(context)
+    h = np.zeros(n, dtype=np.uint32)
+    for k in range(bits):
+        h += g[p - k : p - k + n] << np.uint32(k)
+    mask = np.uint32((1 << bits) - 1)
+    return np.flatnonzero((h & mask) == 0).tolist()
+
+
+def _candidates_python(block, context, bits):
+    mask = (1 << bits) - 1
+    h = 0
+    for byte in context:
+        h = ((h << 1) + GEAR[byte]) & mask
+    gear = GEAR
+    candidates = []
+    for i, byte in enumerate(block):
+        h = ((h << 1) + gear[byte]) & mask
+        if not h:
+            candidates.append(i)
+    return candidates
+
+
+def chunk_file(
+    path,
+    avg_size=DEFAULT_AVG_CHUNK_SIZE,
+    min_size=None,
+    max_size=None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> List[Chunk]:
+    """Split a file into content-defined chunks and return them with their SHA-256s.
+
+    Boundaries fall where a rolling gear hash of the preceding bytes has
+    its low log2(avg_size) bits all zero, so an insertion or change only
+    moves the boundaries near it and the rest of the file chunks the same
+    way as before. Chunks are kept between min_size (default avg/4) and
+    max_size (default avg*4). avg_size must be a power of two.
+    """
+    bits = avg_size.bit_length() - 1
+    if avg_size != 1 << bits:
+        raise ValueError(f"avg_size must be a power of two, got {avg_size}")
+    min_size = min_size or avg_size // 4
+    max_size = max_size or avg_size * 4
+    find_candidates = _candidates_numpy if np is not None else _candidates_python
+
+    chunks: List[Chunk] = []
+    start = 0
+    offset = 0
+    hasher = hashlib.sha256()
+    context = b"\0" * (bits - 1)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            view = memoryview(block)
+            fed = 0
+
+            def cut(boundary):
+                nonlocal start, hasher, fed
+                rel = boundary - offset
+                hasher.update(view[fed:rel])
+                fed = rel
+                chunks.append(Chunk(start, boundary - start, hasher.hexdigest()))
+                start = boundary
+                hasher = hashlib.sha256()
+
+            for i in find_candidates(block, context, bits):
+                boundary = offset + i + 1
+                while boundary - start > max_size:
+                    cut(start + max_size)
+                if boundary - start >= min_size:
+                    cut(boundary)
+            end = offset + len(block)
+            while end - start > max_size:
+                cut(start + max_size)
+            hasher.update(view[fed:])
+            context = (context + block[-(bits - 1):])[-(bits - 1):]
+            offset = end
+            if on_progress:
+                on_progress(len(block))
+    if offset > start:
+        chunks.append(Chunk(start, offset - start, hasher.hexdigest()))
+    return chunks
+
+
+def dedup_stats(chunks: Iterable[Chunk], known: Callable[[str], bool]) -> Dict[str, float]:
+    """How much of a file is made of chunks that are known or repeat within it."""
+    seen = set()
+    total = duplicate = count = duplicate_count = 0
+    for chunk in chunks:
+        count += 1
+        total += chunk.length
+        if chunk.digest in seen or known(chunk.digest):
+            duplicate += chunk.length
+            duplicate_count += 1
+        seen.add(chunk.digest)
+    return {
+        "chunks": count,
+        "duplicate_chunks": duplicate_count,
+        "bytes": total,
+        "duplicate_bytes": duplicate,
+        "dedup_ratio": round(duplicate / total, 4) if total else 0.0,
+    }
+
+
+class ChunkIndex:
+    """Chunk digests already deployed, and the chunk lists of files already chunked.
+
+    Chunk lists are keyed by (dev, inode) like the hash cache and are reused
+    while size and mtime match, so unchanged models aren't read again.
+    Both are bounded like the hash cache: past max_known digests or
+    max_file_chunks listed chunks, the least recently used entries are
+    dropped. A dropped digest only makes the dedup estimate lower; the
+    chunk store is still asked which chunks it is missing.
+    """
+
+    def __init__(
+        self,
+        cache_path=None,
+        max_known=DEFAULT_MAX_KNOWN_CHUNKS,
+        max_file_chunks=DEFAULT_MAX_FILE_CHUNKS,
+    ):
+        self.cache_path = cache_path
+        self.max_known = max_known
+        self.max_file_chunks = max_file_chunks
+        self._known: "OrderedDict[str, int]" = OrderedDict()
+        self._files: "OrderedDict[str, dict]" = OrderedDict()
+        self._file_chunks = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            # Saved least recently used first
+            self._known = OrderedDict(data.get("chunks", {}))
+            self._files = OrderedDict(data.get("files", {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable chunk index {self.cache_path}: {e}")
+        self._file_chunks = sum(len(entry["chunks"]) for entry in self._files.values())
+        self._evict()
+
+    def _evict(self):
+        while len(self._known) > self.max_known:
+            self._known.popitem(last=False)
+            self._dirty = True
+        while self._file_chunks > self.max_file_chunks and self._files:
+            _, entry = self._files.popitem(last=False)
+            self._file_chunks -= len(entry["chunks"])
+            self._dirty = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+
+    def known(self, digest) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return digest in self._known
+
+    def add_known(self, chunks: Iterable[Chunk]):
+        with self._lock:
+            self._ensure_loaded()
+            for chunk in chunks:
+                self._known[chunk.digest] = chunk.length
+                self._known.move_to_end(chunk.digest)
+            self._dirty = True
+            self._evict()
+
+    def chunks_for(self, identity, avg_size) -> Optional[List[Chunk]]:
+        dev, ino, size, mtime_ns = identity
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._files.get(f"{dev}:{ino}")
+            if entry is not None:
+                # Recency only; not worth a save on its own
+                self._files.move_to_end(f"{dev}:{ino}")
+        if (
+            entry is None
+            or entry["size"] != size
+            or entry["mtime_ns"] != mtime_ns
+            or entry["avg_size"] != avg_size
+        ):
+            return None
+        chunks, offset = [], 0
+        for length, digest in entry["chunks"]:
+            chunks.append(Chunk(offset, length, digest))
+            offset += length
+        return chunks
+
+    def put_chunks(self, identity, avg_size, chunks: List[Chunk], path=None):
+        dev, ino, size, mtime_ns = identity
+        key = f"{dev}:{ino}"
+        with self._lock:
+            self._ensure_loaded()
+            previous = self._files.pop(key, None)
+            if previous is not None:
+                self._file_chunks -= len(previous["chunks"])
+            self._files[key] = {
+                "path": path,
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "avg_size": avg_size,
+                "chunks": [[chunk.length, chunk.digest] for chunk in chunks],
+            }
+            self._file_chunks += len(chunks)
+            self._dirty = True
+            self._evict()
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"chunks": dict(self._known), "files": dict(self._files)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = f"{self.cache_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"Could not save chunk index {self.cache_path}: {e}")
+            with self._lock:
+                self._dirty = True
@@ -0,0 +1,198 @@
+import io
+import os
+import tempfile
+import time
+import zlib
+from typing import Callable, Iterator, Optional, Tuple
+
+from .multipart import _new_md5
+
+
+ENCODING_GZIP = "gzip"
+# Level 1 compresses model files nearly as well as 6, at about three times the speed
+DEFAULT_LEVEL = 1
+# Compress only when the sample shrinks to at most this fraction of its size
+DEFAULT_MAX_RATIO = 0.85
+MIN_COMPRESS_SIZE = 1024 * 1024
+SAMPLE_BLOCKS = 8
+SAMPLE_BLOCK_SIZE = 256 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+# Compressed parts are kept in memory up to this size, then spill to a temp file
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+def estimate_ratio(
+    path, level=DEFAULT_LEVEL, samples=SAMPLE_BLOCKS, block_size=SAMPLE_BLOCK_SIZE
+) -> Tuple[float, float]:
+    """Compress a few evenly spaced blocks of the file.
+
+    Returns (compressed size / raw size, raw bytes compressed per second).
+    """
+    file_size = os.path.getsize(path)
+    if file_size == 0:
+        return 1.0, 0.0
+    if file_size <= samples * block_size:
+        offsets = [0]
+        block_size = file_size
+    else:
+        step = (file_size - block_size) // max(1, samples - 1)
+        offsets = [i * step for i in range(samples)]
+    raw = compressed = 0
+    elapsed = 0.0
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            block = f.read(block_size)
+            started = time.perf_counter()
+            compressed += len(zlib.compress(block, level))
+            elapsed += time.perf_counter() - started
+            raw += len(block)
+    if not raw:
+        return 1.0, 0.0
+    return compressed / raw, raw / elapsed if elapsed else float("inf")
+
+
+def choose_encoding(
+    path,
+    max_ratio=DEFAULT_MAX_RATIO,
+    level=DEFAULT_LEVEL,
+    min_size=MIN_COMPRESS_SIZE,
+    uplink_bytes_per_second=None,
+) -> Tuple[Optional[str], float]:
+    """Return (ENCODING_GZIP or None, estimated ratio) for a file.
+
+    Files that are small or barely compress (fp16 weights, already
+    compressed archives) are sent as they are. Compression and upload
+    overlap, so it only pays off when compressing is faster than the
+    uplink; with a known uplink speed, files that compress slower than
+    that are sent as they are too.
+    """
+    if os.path.getsize(path) < min_size:
+        return None, 1.0
+    ratio, speed = estimate_ratio(path, level)
+    if ratio > max_ratio:
+        return None, ratio
+    if uplink_bytes_per_second and speed < uplink_bytes_per_second:
+        return None, ratio
+    return ENCODING_GZIP, ratio
+
+
+class SpooledPart(io.RawIOBase):
+    """One part of a compressed upload, held in a spooled temp file.
+
+    Has the interface upload_parts expects from multipart.FilePart: a
+    length, a part number, rewinding for retries and the MD5 of its bytes
+    (known up front, since the part was written before it is sent).
+    raw_length is how many bytes of the source file went into it.
+    """
+
+    def __init__(self, part_number, spool, length, md5_hexdigest, raw_length, throttle=None):
+        super().__init__()
+        self.part_number = part_number
+        self.length = length
+        self.raw_length = raw_length
+        self.throttle = throttle
+        self._spool = spool
+        self._md5 = md5_hexdigest
+        self._spool.seek(0)
+
+    def __len__(self):
+        return self.length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._spool.tell()
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        return self._spool.seek(pos, whence)
+
+    def md5_hexdigest(self):
+        return self._md5
+
+    def read(self, size=-1):
+        data = self._spool.read(size)
+        if data and self.throttle:
+            self.throttle(len(data))
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def __iter__(self):
+        self.seek(0)
+        while True:
+            block = self.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+    def close(self):
+        self._spool.close()
+        super().close()
+
+
+def compressed_parts(
+    path,
+    part_size,
+    level=DEFAULT_LEVEL,
+    throttle=None,
+    on_read: Optional[Callable[[int], None]] = None,
+) -> Iterator[SpooledPart]:
+    """Gzip a file as one stream and cut the output into parts of part_size.
+
+    Parts are produced one at a time as the file is read, so memory and
+    temp space only grow with the parts the caller keeps open. Every part
+    but the last is exactly part_size, which keeps S3's minimum part size.
+    The output only depends on the file and level, so a resumed upload
+    can regenerate the parts it already sent and skip them.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    part_number = 1
+    raw_read = raw_at_last_part = 0
+    spool = tempfile.SpooledTemporaryFile(max_size=min(part_size, SPOOL_MAX_MEMORY))
+    size = 0
+    md5 = _new_md5()
+
+    def finish_part():
+        nonlocal part_number, raw_at_last_part, spool, size, md5
+        part = SpooledPart(
+            part_number, spool, size, md5.hexdigest(), raw_read - raw_at_last_part, throttle
+        )
+        part_number += 1
+        raw_at_last_part = raw_read
+        spool = tempfile.SpooledTemporaryFile(max_size=min(part_size, SPOOL_MAX_MEMORY))
+        size = 0
+        md5 = _new_md5()
+        return part
+
+    with open(path, "rb") as f:
+        eof = False
+        while not eof:
+            block = f.read(READ_BLOCK_SIZE)
+            if block:
+                raw_read += len(block)
+                if on_read:
+                    on_read(len(block))
+                out = memoryview(compressor.compress(block))
+            else:
+                eof = True
+                out = memoryview(compressor.flush())
+            while len(out):
+                take = min(len(out), part_size - size)
+                spool.write(out[:take])
+                md5.update(out[:take])
+                size += take
+                out = out[take:]
+                if size == part_size:
+                    yield finish_part()
+    if size or part_number == 1:
+        yield finish_part()
+    else:
+        spool.close()
@@ -0,0 +1,38 @@
+import json
+import sys
+import threading
+import time
+
+
+class JsonLogger:
+    """Writes one JSON object per line, tagged with the deployment it belongs to.
+
+    Complements the human-readable prints: these lines are meant to be
+    grepped by deploy_id or fed to a log pipeline.
+    """
+
+    def __init__(self, enabled=True, stream=None, source="deploy-node"):
+        self.enabled = enabled
+        self.stream = stream
+        self.source = source
+        self._lock = threading.Lock()
+
+    def event(self, event, deploy_id=None, level="info", **fields):
+        if not self.enabled:
+            return
+        record = {
+            "ts": round(time.time(), 3),
+            "level": level,
+            "source": self.source,
+            "event": event,
+            "deploy_id": deploy_id,
+        }
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        stream = self.stream or sys.stdout
+        with self._lock:
+            try:
+                stream.write(line + "\n")
+                stream.flush()
+            except (OSError, ValueError) as e:
+                print(f"Could not write log event {event}: {e}")
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+
+CHANGE_NEW = "new"
+CHANGE_CHANGED = "changed"
+CHANGE_UNCHANGED = "unchanged"
+
+
+class DeployManifestStore:
+    """Remembers what was last deployed for each product, one JSON file each.
+
+    A manifest records every model's hash, size, relative path, aliases
+    and the storage key it was uploaded to, plus each custom node's
+    commit. It is only written after a deployment succeeded, so it never
+    lists files that didn't make it to storage.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, product_name):
+        digest = hashlib.sha256(product_name.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest[:32]}.json")
+
+    def load(self, product_name) -> Optional[dict]:
+        try:
+            with open(self.path(product_name), "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable deploy manifest for {product_name}: {e}")
+            return None
+        if manifest.get("product_name") != product_name:
+            return None
+        return manifest
+
+    def save(self, product_name, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(product_name)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+
+def previous_keys_by_hash(previous: Optional[dict]) -> Dict[str, str]:
+    """{model_hash: storage key} for every model of a previous deployment."""
+    if not previous:
+        return {}
+    return {
+        model["model_hash"]: model["key"]
+        for model in previous.get("models", {}).values()
+        if model.get("key")
+    }
+
+
+def _model_paths(models):
+    """Every relative path of (relative_path, model) pairs, aliases included."""
+    paths = set()
+    for relative_path, model in models:
+        paths.add(relative_path)
+        paths.update(model.get("aliases", []))
+    return paths
+
+
+def diff_package(package: dict, previous: Optional[dict]) -> dict:
+    """Mark each model and custom node of package as new, changed or unchanged.
+
+    A model is unchanged when a file with the same hash was deployed
+    before, wherever it lived; changed when its relative path or one of
+    its aliases was deployed with different contents; otherwise new.
+    Custom nodes compare commit SHAs. Entries get a "change" field;
+    returns a summary for the package.
+    """
+    previous = previous or {}
+    previous_models = previous.get("models", {})
+    previous_hashes = {model["model_hash"] for model in previous_models.values()}
+    previous_paths = _model_paths(previous_models.items())
+    previous_nodes = previous.get("custom_nodes", {})
+
+    counts = {CHANGE_NEW: 0, CHANGE_CHANGED: 0, CHANGE_UNCHANGED: 0}
+    unchanged_bytes = 0
+    for model in package["models"]:
+        if model["model_hash"] in previous_hashes:
+            change = CHANGE_UNCHANGED
+            unchanged_bytes += model["file_size"]
+        elif previous_paths.intersection([model["relative_path"]] + model.get("aliases", [])):
+            change = CHANGE_CHANGED
+        else:
+            change = CHANGE_NEW
+        model["change"] = change
+        counts[change] += 1
+
+    node_counts = {CHANGE_NEW: 0, CHANGE_CHANGED: 0, CHANGE_UNCHANGED: 0}
+    for repo_name, node in package["custom_nodes"].items():
+        commit_sha = (node.get("git_info") or {}).get("commit_sha")
+        if repo_name not in previous_nodes:
+            change = CHANGE_NEW
+        elif commit_sha and commit_sha == previous_nodes[repo_name].get("commit_sha"):
+            change = CHANGE_UNCHANGED
+        else:
+            change = CHANGE_CHANGED
+        node["change"] = change
+        node_counts[change] += 1
+
+    current_paths = _model_paths((model["relative_path"], model) for model in package["models"])
+    return {
+        "base_version": previous.get("version"),
+        "models": counts,
+        "unchanged_bytes": unchanged_bytes,
+        "removed_models": sorted(previous_paths - current_paths),
+        "custom_nodes": node_counts,
+        "removed_custom_nodes": sorted(set(previous_nodes) - set(package["custom_nodes"])),
+    }
+
+
+def build_manifest(product_name, version, package: dict, keys_by_hash: Dict[str, str]) -> dict:
+    """The manifest to store once package has been deployed."""
+    return {
+        "product_name": product_name,
+        "version": version,
+        "deployed_at": time.time(),
+        "models": {
+            model["relative_path"]: {
+                "model_hash": model["model_hash"],
+                "file_size": model["file_size"],
+                "key": keys_by_hash.get(model["model_hash"]),
+                "content_encoding": model.get("content_encoding"),
+                "aliases": model.get("aliases", []),
+            }
+            for model in package["models"]
+        },
+        "custom_nodes": {
+            repo_name: {
+                "commit_sha": (node.get("git_info") or {}).get("commit_sha"),
+                "remote_url": (node.get("git_info") or {}).get("remote_url"),
+            }
+            for repo_name, node in package["custom_nodes"].items()
+        },
+    }
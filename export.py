@@ -0,0 +1,280 @@
+import errno
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+LINK_AUTO = "auto"
+LINK_REFLINK = "reflink"
+LINK_HARDLINK = "hardlink"
+LINK_COPY = "copy"
+LINK_MODES = (LINK_AUTO, LINK_REFLINK, LINK_HARDLINK, LINK_COPY)
+
+MANIFEST_NAME = "manifest.json"
+
+# ioctl(dest_fd, FICLONE, src_fd) shares extents on btrfs, XFS and bcachefs
+FICLONE = 0x40049409
+
+# Errors meaning "this filesystem or kernel can't do that", not "the copy failed"
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EPERM,
+    errno.EMLINK,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+
+class ExportError(Exception):
+    """A file couldn't be placed into the export."""
+
+
+def _reflink(src, dst):
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError as e:
+            if e.errno in _UNSUPPORTED_ERRNOS:
+                return False
+            raise
+
+
+def _hardlink(src, dst):
+    try:
+        os.link(src, dst)
+        return True
+    except OSError as e:
+        if e.errno in _UNSUPPORTED_ERRNOS or e.errno == errno.EACCES:
+            return False
+        raise
+
+
+def _copy_file_range(src, dst):
+    if not hasattr(os, "copy_file_range"):
+        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        while remaining > 0:
+            try:
+                n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, 1 << 30))
+            except OSError as e:
+                # Only fall back before anything was written; later errors are real
+                if copied == 0 and e.errno in _UNSUPPORTED_ERRNOS:
+                    return False
+                raise
+            if n == 0:
+                break
+            copied += n
+            remaining -= n
+        return True
+
+
+def _copy(src, dst):
+    # shutil.copyfile uses os.sendfile on Linux and fcopyfile on macOS, so
+    # the data still doesn't pass through Python buffers there
+    shutil.copyfile(src, dst)
+    return True
+
+
+_STRATEGIES = {
+    LINK_REFLINK: ((LINK_REFLINK, _reflink),),
+    LINK_HARDLINK: ((LINK_HARDLINK, _hardlink),),
+    LINK_COPY: (("copy_file_range", _copy_file_range), ("copy", _copy)),
+}
+_STRATEGIES[LINK_AUTO] = (
+    _STRATEGIES[LINK_REFLINK] + _STRATEGIES[LINK_HARDLINK] + _STRATEGIES[LINK_COPY]
+)
+
+
+def _same_file(src, dst):
+    try:
+        s, d = os.stat(src), os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if (s.st_dev, s.st_ino) == (d.st_dev, d.st_ino):
+        return True
+    return s.st_size == d.st_size and s.st_mtime_ns == d.st_mtime_ns
+
+
+def place_file(src, dst, link_mode=LINK_AUTO) -> str:
+    """Put src at dst as cheaply as the filesystem allows and return how.
+
+    In auto mode the order is: reflink (a copy-on-write clone), hardlink
+    (same inode, so the export must be treated as read-only),
+    copy_file_range (in-kernel copy), then shutil.copyfile. A dst that is
+    already the same file is left alone and reported as "existing".
+    """
+    if link_mode not in _STRATEGIES:
+        raise ValueError(f"Unknown link mode {link_mode!r}, expected one of {LINK_MODES}")
+    if _same_file(src, dst):
+        return "existing"
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.tmp-{os.getpid()}"
+    for method, strategy in _STRATEGIES[link_mode]:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            if strategy(src, tmp):
+                if method != LINK_HARDLINK:
+                    shutil.copystat(src, tmp)
+                os.replace(tmp, dst)
+                return method
+        except OSError as e:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            raise ExportError(f"Could not export {src} to {dst}: {e}")
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    raise ExportError(f"Could not {link_mode} {src} to {dst} on this filesystem")
+
+
+def safe_export_name(name) -> str:
+    """name reduced to one safe path component, for export directories and downloads."""
+    # Leading dots would make "." and ".." (or a hidden directory)
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".") or "_"
+
+
+def resolve_output_dir(root, output_dir) -> str:
+    """output_dir resolved against root; raises ExportError unless it is a directory under root.
+
+    Symlinks are resolved first, so neither "..", an absolute path nor a
+    link inside root can send an export somewhere else.
+    """
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, output_dir))
+    try:
+        inside = os.path.commonpath([root, resolved]) == root and resolved != root
+    except ValueError:
+        # Different drives on Windows
+        inside = False
+    if not inside:
+        raise ExportError(f"{output_dir} is not a directory under the export root {root}")
+    return resolved
+
+
+def export_arcname(relative_path, file_name) -> str:
+    """Where a model goes inside an export; paths outside ComfyUI go to models/external."""
+    relative_path = relative_path.replace("\\", "/")
+    if os.path.isabs(relative_path) or relative_path.startswith("../") or relative_path == "..":
+        return f"models/external/{file_name}"
+    return relative_path
+
+
+def export_to_directory(
+    output_dir,
+    manifest: dict,
+    files: List[Tuple[str, str]],
+    link_mode=LINK_AUTO,
+    on_file_done: Optional[Callable[[str, str], None]] = None,
+) -> Dict[str, int]:
+    """Write manifest.json and every (source path, arcname) file under output_dir.
+
+    The manifest is written last, so an export with a manifest is complete.
+    Returns how many files were placed with each method.
+    """
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    methods: Dict[str, int] = {}
+    for src, arcname in files:
+        dst = os.path.normpath(os.path.join(output_dir, arcname))
+        if os.path.commonpath([output_dir, dst]) != output_dir:
+            raise ExportError(f"{arcname} would be written outside {output_dir}")
+        method = place_file(src, dst, link_mode)
+        methods[method] = methods.get(method, 0) + 1
+        if on_file_done:
+            on_file_done(src, method)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp = f"{manifest_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, manifest_path)
+    return methods
+
+
+def _tar_header(name, size, mtime, mode=0o644) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = mode
+    return info.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def _padding(size) -> bytes:
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+class TarPlan:
+    """The exact byte layout of a tar export, worked out before sending anything.
+
+    Knowing the total size up front lets the response carry a Content-Length,
+    which is what allows file data to be sent with sendfile instead of
+    chunked writes. Each member is (header bytes, source path or None,
+    size, padding).
+    """
+
+    def __init__(self, manifest: dict, files: List[Tuple[str, str]], root="package"):
+        manifest_bytes = json.dumps(manifest, indent=2).encode("utf-8")
+        self.manifest_bytes = manifest_bytes
+        self.members = []
+        for src, arcname in files:
+            st = os.stat(src)
+            self.members.append(
+                (
+                    _tar_header(f"{root}/{arcname}", st.st_size, st.st_mtime),
+                    src,
+                    st.st_size,
+                    _padding(st.st_size),
+                )
+            )
+        # The manifest goes last, like in directory exports
+        self.members.append(
+            (
+                _tar_header(
+                    f"{root}/{MANIFEST_NAME}", len(manifest_bytes), manifest.get("exported_at", 0)
+                ),
+                None,
+                len(manifest_bytes),
+                _padding(len(manifest_bytes)),
+            )
+        )
+        self.trailer = b"\0" * (tarfile.BLOCKSIZE * 2)
+
+    @property
+    def size(self) -> int:
+        return sum(len(h) + size + len(p) for h, _, size, p in self.members) + len(self.trailer)
+
+    async def stream(self, write, sendfile):
+        """Send the archive with await write(bytes) and await sendfile(file, count).
+
+        A file whose size no longer matches its header aborts the stream,
+        since the archive would be corrupt from that point on.
+        """
+        for header, src, size, padding in self.members:
+            await write(header)
+            if src is None:
+                await write(self.manifest_bytes)
+            else:
+                with open(src, "rb") as f:
+                    if os.fstat(f.fileno()).st_size != size:
+                        raise ExportError(f"{src} changed while it was being exported")
+                    await sendfile(f, size)
+            if padding:
+                await write(padding)
+        await write(self.trailer)
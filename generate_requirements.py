@@ -1,14 +1,103 @@
 import os
-import requests
+import atexit
 import mimetypes
+import asyncio
+import random
+import time
 from pathlib import Path
-import subprocess
 from server import PromptServer
 from aiohttp import web
-import hashlib
 from typing import List
 import datetime
-
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .chunking import DEFAULT_AVG_CHUNK_SIZE, ChunkIndex, chunk_file, dedup_stats
+from .compression import (
+    DEFAULT_LEVEL as DEFAULT_COMPRESS_LEVEL,
+    DEFAULT_MAX_RATIO as DEFAULT_COMPRESS_MAX_RATIO,
+    ENCODING_GZIP,
+    choose_encoding,
+    compressed_parts,
+)
+from .deploy_log import JsonLogger
+from .deploy_manifest import (
+    CHANGE_UNCHANGED,
+    DeployManifestStore,
+    build_manifest,
+    diff_package,
+    previous_keys_by_hash,
+)
+from .export import (
+    LINK_AUTO,
+    LINK_MODES,
+    ExportError,
+    TarPlan,
+    export_arcname,
+    export_to_directory,
+    resolve_output_dir,
+    safe_export_name,
+)
+from .git_info import GitInfoReader
+from .hash_cache import HashCache, file_identity, group_by_inode
+from .hashing import DEFAULT_BUFFER_SIZE, DEFAULT_WORKERS, hash_file, hash_files
+from .jobs import (
+    DEFAULT_MAX_CONCURRENT_JOBS,
+    FINISHED_STATES,
+    QUEUED,
+    RUNNING,
+    SUCCEEDED,
+    JobCancelled,
+    JobManager,
+)
+from .metrics import (
+    EVENT_LOOP_LAG_BUCKETS,
+    PROMETHEUS_CONTENT_TYPE,
+    EventLoopLagMonitor,
+    Metrics,
+    StageTimer,
+)
+from .model_index import ModelIndex
+from .model_refs import extract_model_names, resolve_model_names
+from .node_registry import CustomNodeIndex, custom_nodes_from_object_info
+from .multipart import (
+    DEFAULT_PART_RETRIES,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_UPLOAD_CONCURRENCY,
+    FilePart,
+    UploadCancelled,
+    split_file_into_parts,
+    upload_parts,
+)
+from .prehash import DEFAULT_INTERVAL as DEFAULT_PREHASH_INTERVAL, PrehashWorker
+from .safetensors_info import describe_model, describe_models
+from .progress import (
+    PROGRESS_EVENT,
+    STAGE_BUILD,
+    STAGE_CHUNK,
+    STAGE_DONE,
+    STAGE_EXPORT,
+    STAGE_GIT,
+    STAGE_HASH,
+    STAGE_PACKAGE,
+    STAGE_SCAN,
+    STAGE_UPLOAD,
+    ProgressReporter,
+)
+from .upload_journal import UploadJournal
+
+# requests is imported inside the functions that send HTTP requests: it is
+# the slowest import here and isn't needed until a deployment runs, so
+# ComfyUI doesn't pay for it at startup.
+from .upload_scheduler import (
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_FILES,
+    DEFAULT_MAX_INFLIGHT_BYTES,
+    RateLimiter,
+    UploadBudget,
+    upload_files,
+)
 
 MODEL_EXTENSIONS = (
     ".safetensors",
@@ -27,121 +116,218 @@ base_dir = os.getcwd()
 models_dir = os.path.join(base_dir, "models")
 custom_nodes_dir = os.path.join(base_dir, "custom_nodes")
 SEARCH_DIRS = [models_dir, custom_nodes_dir]
+CACHE_DIR = os.environ.get(
+    "DEPLOY_NODE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), ".cache"),
+)
+API_BASE_URL = os.environ.get(
+    "DEPLOY_NODE_API_URL",
+    "https://sdibavx1oh.execute-api.eu-central-1.amazonaws.com/staging",
+)
 
+metrics = Metrics()
+DEPLOYMENTS = metrics.counter(
+    "deploy_node_deployments_total", "Deployments and resumed uploads by outcome."
+)
+STAGE_SECONDS = metrics.histogram(
+    "deploy_node_stage_seconds", "Time one deployment spent in each stage."
+)
+MODEL_INDEX_REFRESH_SECONDS = metrics.histogram(
+    "deploy_node_model_index_refresh_seconds", "Time spent refreshing the model index."
+)
+HASH_BYTES_READ = metrics.counter(
+    "deploy_node_hash_bytes_read_total", "Bytes read from disk to hash model files."
+)
+HASH_CACHE_LOOKUPS = metrics.counter(
+    "deploy_node_hash_cache_lookups_total", "Hash cache lookups by result (hit or miss)."
+)
+GIT_CLI_FALLBACKS = metrics.counter(
+    "deploy_node_git_cli_fallbacks_total", "Repositories read by spawning the git CLI."
+)
+UPLOAD_BYTES = metrics.counter(
+    "deploy_node_upload_bytes_total", "Bytes of model parts uploaded successfully."
+)
+UPLOAD_PARTS = metrics.counter(
+    "deploy_node_upload_parts_total", "Model parts uploaded successfully."
+)
+UPLOAD_SKIPPED_BYTES = metrics.counter(
+    "deploy_node_upload_skipped_bytes_total",
+    "Bytes not uploaded because a previous deployment already stored them.",
+)
+UPLOAD_DEDUP_BYTES = metrics.counter(
+    "deploy_node_upload_dedup_bytes_total",
+    "Bytes not uploaded because their chunks were already in the chunk store.",
+)
+UPLOAD_COMPRESSION_SAVED_BYTES = metrics.counter(
+    "deploy_node_upload_compression_saved_bytes_total",
+    "Bytes not uploaded because model parts were sent gzip-compressed.",
+)
+UPLOAD_RETRIES = metrics.counter(
+    "deploy_node_upload_retries_total", "Part uploads retried after an error."
+)
+EVENT_LOOP_LAG = metrics.histogram(
+    "deploy_node_event_loop_lag_seconds",
+    "How late the server event loop ran a periodic callback.",
+    EVENT_LOOP_LAG_BUCKETS,
+)
+EVENT_LOOP_LAG_LAST = metrics.gauge(
+    "deploy_node_event_loop_lag_last_seconds", "Most recent event loop lag sample."
+)
+JOBS = metrics.gauge("deploy_node_jobs", "Background jobs by status.")
+PREHASH_FILES = metrics.counter(
+    "deploy_node_prehash_files_total", "Model files hashed in the background while idle."
+)
+PREHASH_PENDING = metrics.gauge(
+    "deploy_node_prehash_pending_files", "Model files waiting to be hashed in the background."
+)
+PREHASH_RUNNING = metrics.gauge(
+    "deploy_node_prehash_running", "Whether background pre-hashing is running."
+)
+PREHASH_PAUSED = metrics.gauge(
+    "deploy_node_prehash_paused", "Whether background pre-hashing waits for ComfyUI to be idle."
+)
+deploy_log = JsonLogger(enabled=os.environ.get("DEPLOY_NODE_JSON_LOGS", "1") != "0")
 
-def get_git_version_info(repo_path):
-    if not os.path.exists(repo_path):
-        print("error", f"The path '{repo_path}' does not exist")
 
-    # Check if it's a git repository by looking for .git directory
-    if not os.path.exists(os.path.join(repo_path, ".git")):
-        print("error", f"The path '{repo_path}' is not a git repository")
+def refresh_model_index():
+    with MODEL_INDEX_REFRESH_SECONDS.time():
+        model_index.refresh()
 
-    try:
-        # Get remote URL
-        result = subprocess.run(
-            ["git", "config", "--get", "remote.origin.url"],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        remote_url = result.stdout.strip()
-
-        # Convert SSH URL to HTTPS URL if needed
-        if remote_url.startswith("git@github.com:"):
-            remote_url = remote_url.replace(":", "/")
-            remote_url = remote_url.replace("git@", "https://")
-
-        # Get commit SHA
-        result = subprocess.run(
-            ["git", "rev-parse", "HEAD"],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        commit_sha = result.stdout.strip()
-
-        # Get short SHA
-        result = subprocess.run(
-            ["git", "rev-parse", "--short", "HEAD"],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        short_sha = result.stdout.strip()
-
-        # Get version from tags
-        result = subprocess.run(
-            ["git", "tag", "--points-at", "HEAD"],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        tags = result.stdout.strip().split("\n") if result.stdout.strip() else []
-        version = tags[0] if tags and tags[0] != "" else None
 
-        return {
-            "remote_url": remote_url,
-            "commit_sha": commit_sha,
-            "short_sha": short_sha,
-            "version": version,
-        }
+# Built in the background at startup; lookups block until the first build is done
+model_index = ModelIndex(SEARCH_DIRS, os.path.join(CACHE_DIR, "model_index.json"))
+threading.Thread(target=refresh_model_index, daemon=True).start()
+hash_cache = HashCache(os.path.join(CACHE_DIR, "hash_cache.json"))
+# Largest page /deploy/models/search returns
+MODEL_SEARCH_MAX_LIMIT = 500
+custom_node_index = CustomNodeIndex()
+git_info_reader = GitInfoReader(on_cli_fallback=lambda repo_path: GIT_CLI_FALLBACKS.inc())
+HASH_WORKERS = int(os.environ.get("DEPLOY_NODE_HASH_WORKERS", DEFAULT_WORKERS))
+UPLOAD_CONCURRENCY = int(
+    os.environ.get("DEPLOY_NODE_UPLOAD_CONCURRENCY", DEFAULT_UPLOAD_CONCURRENCY)
+)
+# Files uploaded at once, and the parts in flight across all of them
+UPLOAD_MAX_FILES = int(os.environ.get("DEPLOY_NODE_UPLOAD_MAX_FILES", DEFAULT_MAX_FILES))
+UPLOAD_MAX_CONNECTIONS = int(
+    os.environ.get(
+        "DEPLOY_NODE_UPLOAD_MAX_CONNECTIONS", max(DEFAULT_MAX_CONNECTIONS, UPLOAD_CONCURRENCY)
+    )
+)
+UPLOAD_MAX_INFLIGHT_MB = int(
+    os.environ.get(
+        "DEPLOY_NODE_UPLOAD_MAX_INFLIGHT_MB", DEFAULT_MAX_INFLIGHT_BYTES // (1024 * 1024)
+    )
+)
+# 0 means no limit
+UPLOAD_RATE_LIMIT_MBPS = float(os.environ.get("DEPLOY_NODE_UPLOAD_RATE_LIMIT_MBPS", 0))
+upload_budget = UploadBudget(UPLOAD_MAX_CONNECTIONS, UPLOAD_MAX_INFLIGHT_MB * 1024 * 1024)
+upload_rate_limiter = (
+    RateLimiter(UPLOAD_RATE_LIMIT_MBPS * 1024 * 1024) if UPLOAD_RATE_LIMIT_MBPS > 0 else None
+)
+UPLOAD_JOURNAL_DIR = os.path.join(CACHE_DIR, "uploads")
+# What was last deployed for each product_name, to diff new deployments against
+deploy_manifests = DeployManifestStore(os.path.join(CACHE_DIR, "deployments"))
+# Content-defined chunking of models (off by default, or "chunk_dedup" in a
+# request): reports how much of each model was already deployed and, with a
+# chunk store configured, uploads only the chunks the store doesn't have
+CHUNK_DEDUP = os.environ.get("DEPLOY_NODE_CHUNK_DEDUP", "0") == "1"
+CHUNK_AVG_KB = int(os.environ.get("DEPLOY_NODE_CHUNK_AVG_KB", DEFAULT_AVG_CHUNK_SIZE // 1024))
+CHUNK_STORE_URL = os.environ.get("DEPLOY_NODE_CHUNK_STORE_URL", "").rstrip("/")
+chunk_index = ChunkIndex(os.path.join(CACHE_DIR, "chunk_index.json"))
+# Gzip models that sample as compressible while uploading them (off by
+# default, or "compress" in a request); the builder has to decompress
+# models whose content_encoding is set
+COMPRESS_UPLOADS = os.environ.get("DEPLOY_NODE_COMPRESS", "0") == "1"
+COMPRESS_LEVEL = int(os.environ.get("DEPLOY_NODE_COMPRESS_LEVEL", DEFAULT_COMPRESS_LEVEL))
+COMPRESS_MAX_RATIO = float(
+    os.environ.get("DEPLOY_NODE_COMPRESS_MAX_RATIO", DEFAULT_COMPRESS_MAX_RATIO)
+)
+# Files that compress slower than the uplink are sent raw; defaults to the
+# upload rate limit, 0 means unknown (compress whenever the ratio is good)
+UPLINK_MBPS = float(os.environ.get("DEPLOY_NODE_UPLINK_MBPS", UPLOAD_RATE_LIMIT_MBPS))
+# Check part ETags against the MD5 of the streamed bytes. Buckets using SSE-KMS
+# return ETags that aren't MD5s; those are skipped, but this can be turned off.
+VERIFY_ETAGS = os.environ.get("DEPLOY_NODE_VERIFY_ETAGS", "1") != "0"
+# Hash new and changed models in the background while ComfyUI has no
+# prompts to run (off by default); 0 MB/s means no read limit
+PREHASH = os.environ.get("DEPLOY_NODE_PREHASH", "0") == "1"
+PREHASH_INTERVAL = float(os.environ.get("DEPLOY_NODE_PREHASH_INTERVAL", DEFAULT_PREHASH_INTERVAL))
+PREHASH_MBPS = float(os.environ.get("DEPLOY_NODE_PREHASH_MBPS", 0))
+# How long shutdown waits for the pre-hash thread to stop reading
+PREHASH_STOP_TIMEOUT = 5.0
+job_manager = JobManager(
+    int(os.environ.get("DEPLOY_NODE_MAX_CONCURRENT_JOBS", DEFAULT_MAX_CONCURRENT_JOBS))
+)
+
+# PromptServer creates its loop before loading custom nodes; the monitor's
+# first callback is queued until the loop starts running
+if getattr(PromptServer.instance, "loop", None) is not None:
+    EventLoopLagMonitor(PromptServer.instance.loop, EVENT_LOOP_LAG, EVENT_LOOP_LAG_LAST).start()
+
+
+def check_cancelled(job):
+    if job is not None:
+        job.check_cancelled()
 
-    except subprocess.CalledProcessError as e:
-        return {"error": f"Git command failed: {e.stderr.strip()}"}
+
+def make_progress_reporter(job=None, timer=None):
+    """Report progress over the PromptServer websocket and on the job itself.
+
+    Stage events also move timer on to the new stage.
+    """
+
+    def emit(event):
+        if event["type"] == "stage":
+            if job is not None:
+                job.progress = event
+            if timer is not None:
+                timer.enter(event["stage"])
+        PromptServer.instance.send_sync(PROGRESS_EVENT, event)
+
+    return ProgressReporter(emit, job.id if job else None)
+
+
+def run_tracked(kind, job, fn, **log_fields):
+    """Run fn(progress) with per-stage timing, an outcome counter and JSON logs.
+
+    The job id doubles as the deploy id that tags every log line.
+    """
+    deploy_id = job.id if job else uuid.uuid4().hex
+
+    def on_stage_end(stage, seconds):
+        deploy_log.event(
+            "stage_finished", deploy_id, kind=kind, stage=stage, seconds=round(seconds, 3)
+        )
+
+    timer = StageTimer(STAGE_SECONDS, on_stage_end)
+    deploy_log.event(f"{kind}_started", deploy_id, **log_fields)
+    status, message = "failed", None
+    try:
+        result = fn(make_progress_reporter(job, timer))
+        status = result.get("status", "success")
+        message = result.get("message") if status == "error" else None
+        return result
+    except JobCancelled:
+        status = "cancelled"
+        raise
     except Exception as e:
-        return {"error": f"An error occurred: {str(e)}"}
-
-
-def extract_models_from_workflow(workflow):
-    """Extract model filenames from a workflow JSON file."""
-    # with open(workflow_path, 'r') as f:
-    #     workflow = json.load(f)
-
-    models = []
-
-    # Look for model loaders and their inputs
-    for node_id, node in workflow.items():
-        if "class_type" in node:
-            # Check for checkpoint loaders
-            if (
-                "CheckpointLoader" in node["class_type"]
-                and "inputs" in node
-                and "ckpt_name" in node["inputs"]
-            ):
-                models.append(node["inputs"]["ckpt_name"])
-
-            # Check for CLIP loaders
-            elif (
-                node["class_type"] == "CLIPLoader"
-                and "inputs" in node
-                and "clip_name" in node["inputs"]
-            ):
-                models.append(node["inputs"]["clip_name"])
-
-            # Check for VAE loaders
-            elif (
-                "VAELoader" in node["class_type"]
-                and "inputs" in node
-                and "vae_name" in node["inputs"]
-            ):
-                models.append(node["inputs"]["vae_name"])
-
-            # Check for LoRA loaders
-            elif (
-                "LoraLoader" in node["class_type"]
-                and "inputs" in node
-                and "lora_name" in node["inputs"]
-            ):
-                models.append(node["inputs"]["lora_name"])
-
-            # Add more model types as needed
-
-    return models
+        message = str(e)
+        raise
+    finally:
+        totals = timer.close()
+        DEPLOYMENTS.inc(kind=kind, status=status)
+        deploy_log.event(
+            f"{kind}_finished",
+            deploy_id,
+            level="info" if status in ("success", "cancelled") else "error",
+            status=status,
+            message=message,
+            stage_seconds={stage: round(seconds, 3) for stage, seconds in totals.items()},
+        )
+
+
+def get_git_version_info(repo_path):
+    return git_info_reader.read_many([repo_path])[repo_path]
 
 
 def find_model_file(model_name, search_dirs):
@@ -149,20 +335,47 @@ def find_model_file(model_name, search_dirs):
     # Handle Windows-style paths in the JSON
     model_name = model_name.replace("\\", "/")
 
+    if not model_index.covers(search_dirs):
+        return _walk_for_model_file(model_name, search_dirs)
+
     # First, try direct path if it seems to be a relative path
+    for search_dir in search_dirs:
+        direct_path = model_index.direct(search_dir, model_name)
+        if direct_path is None:
+            direct_path = os.path.join(search_dir, model_name)
+            if not os.path.exists(direct_path):
+                continue
+        return direct_path
+
+    # If not found, try to find by filename in any subdirectory
+    filename = os.path.basename(model_name)
+    for search_dir in search_dirs:
+        matches = model_index.files_named(filename, search_dir)
+        if matches:
+            return matches[0]
+
+    # If still not found, try case-insensitive search
+    for search_dir in search_dirs:
+        matches = model_index.files_named(filename, search_dir, case_sensitive=False)
+        if matches:
+            return matches[0]
+
+    return None
+
+
+def _walk_for_model_file(model_name, search_dirs):
+    """Fallback for find_model_file when search_dirs aren't indexed."""
     for search_dir in search_dirs:
         direct_path = os.path.join(search_dir, model_name)
         if os.path.exists(direct_path):
             return direct_path
 
-    # If not found, try to find by filename in any subdirectory
     filename = os.path.basename(model_name)
     for search_dir in search_dirs:
         for root, dirs, files in os.walk(search_dir):
             if filename in files:
                 return os.path.join(root, filename)
 
-    # If still not found, try case-insensitive search
     lower_filename = filename.lower()
     for search_dir in search_dirs:
         for root, dirs, files in os.walk(search_dir):
@@ -173,71 +386,135 @@ def find_model_file(model_name, search_dirs):
     return None
 
 
-def contains_model_file(value):
-    """Recursively check if a value contains a model file."""
-    if isinstance(value, str) and value.lower().endswith(MODEL_EXTENSIONS):
-        return [value]
-    elif isinstance(value, list):
-        return [item for sublist in value for item in contains_model_file(sublist)]
-    elif isinstance(value, dict):
-        return [
-            item
-            for item in value.values()
-            if isinstance(item, str) and item.lower().endswith(MODEL_EXTENSIONS)
-        ]
-    return []
+def get_object_info_for_classes(class_types):
+    """Build object_info entries for the given node classes from ComfyUI's node registry."""
+    try:
+        import nodes
+    except ImportError:
+        return {}
+
+    object_info = {}
+    for class_type in class_types:
+        node_class = nodes.NODE_CLASS_MAPPINGS.get(class_type)
+        if node_class is None:
+            continue
+        try:
+            object_info[class_type] = {
+                "input": node_class.INPUT_TYPES(),
+                # The same fields ComfyUI's /object_info reports
+                "python_module": getattr(node_class, "RELATIVE_PYTHON_MODULE", "nodes"),
+                "display_name": nodes.NODE_DISPLAY_NAME_MAPPINGS.get(class_type, class_type),
+            }
+        except Exception as e:
+            print(f"Could not get input types for {class_type}: {e}")
+    return object_info
+
 
+def get_custom_nodes_for_classes(class_types, object_info=None):
+    """Return {class_type: {repo_name, display_name}} for the custom node classes given.
+
+    Uses object_info when a client still sends it, otherwise the cached
+    index of ComfyUI's node registry.
+    """
+    if object_info:
+        return custom_nodes_from_object_info(object_info, class_types)
+    try:
+        import nodes
+    except ImportError:
+        return {}
+    index = custom_node_index.get(nodes.NODE_CLASS_MAPPINGS, nodes.NODE_DISPLAY_NAME_MAPPINGS)
+    return {class_type: index[class_type] for class_type in class_types if class_type in index}
 
-def find_model_filenames(workflow):
+
+def find_model_filenames(workflow, object_info=None):
     """Extract all model filenames from workflow inputs."""
-    model_names = []
-    for node in workflow.values():
-        if "inputs" in node:
-            model_names.extend(contains_model_file(node["inputs"]))
-    return model_names
+    if object_info is None:
+        class_types = {
+            node.get("class_type") for node in workflow.values() if isinstance(node, dict)
+        }
+        object_info = get_object_info_for_classes(class_types)
+    return extract_model_names(workflow, MODEL_EXTENSIONS, object_info)
+
+
+def build_original_name_map(workflow_original_model_names):
+    """Map the normalized path each workflow model name resolves to back to that name.
+
+    A name only matches a file with the same basename, and the first name
+    listed wins, so looking a path up here gives the same answer as checking
+    every name against it.
+    """
+    original_names_by_path = {}
+    if not workflow_original_model_names:
+        return original_names_by_path
+    resolved = resolve_model_filepaths(workflow_original_model_names)
+    for w_name, resolved_path in resolved.items():
+        if not resolved_path:
+            continue
+        abs_resolved_path = os.path.abspath(os.path.normpath(resolved_path))
+        if os.path.basename(w_name) != os.path.basename(abs_resolved_path):
+            continue
+        if abs_resolved_path not in original_names_by_path:
+            original_names_by_path[abs_resolved_path] = w_name
+            print(f"Matched {abs_resolved_path} to original workflow name: {w_name}")
+    return original_names_by_path
+
+
+def resolve_model_filepaths(model_names):
+    """Resolve a batch of model names against the model index in one go."""
+    refresh_model_index()
+    return resolve_model_names(model_names, find_model_filepath)
 
 
 def find_model_filepath(model_name):
     """Find a model file in the given directories."""
     model_name = model_name.replace("\\", "/")  # Normalize Windows-style paths
     filename = os.path.basename(model_name)
-    lower_filename = filename.lower()
 
     for search_dir in SEARCH_DIRS:
-        direct_path = os.path.join(search_dir, model_name)
-        print("Direct path:", direct_path)
-        if os.path.exists(direct_path):
+        direct_path = model_index.direct(search_dir, model_name)
+        if direct_path is None:
+            # Not an indexed file, but could still be a folder or an absolute path
+            direct_path = os.path.join(search_dir, model_name)
+            if not os.path.exists(direct_path):
+                direct_path = None
+        if direct_path:
+            print("Direct path:", direct_path)
             return direct_path
 
-        for root, _, files in os.walk(search_dir):
-            file_map = {file.lower(): file for file in files}
-            if filename in files:
-                print("Found filename in files:", filename)
-                return os.path.join(root, filename)
-            elif lower_filename in file_map:
-                print("Found lower filename in file_map:", lower_filename)
-                return os.path.join(root, file_map[lower_filename])
+        found = model_index.first_in_walk_order(filename, search_dir)
+        if found:
+            print("Found filename in index:", found)
+            return found
 
     return None
 
 
-def split_file_into_chunks(file_path, chunk_size):
-    chunks = []
+_upload_session = None
+_upload_session_lock = threading.Lock()
 
-    with open(file_path, "rb") as file:
-        while True:
-            chunk = file.read(chunk_size)
-            if not chunk:
-                break
-            chunks.append(chunk)
 
-    return chunks
+def get_upload_session():
+    """Return a shared keep-alive session sized for concurrent part uploads."""
+    global _upload_session
+    with _upload_session_lock:
+        if _upload_session is None:
+            import requests
 
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=UPLOAD_MAX_CONNECTIONS, pool_maxsize=UPLOAD_MAX_CONNECTIONS
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _upload_session = session
+        return _upload_session
 
-def upload_chunk(url, chunk_data, content_type, fields):
+
+def upload_chunk(url, chunk_data, content_type, fields, session=None):
     try:
         headers = {"Content-Type": content_type}
-        response = requests.put(url, data=chunk_data, headers=headers)
+        session = session or get_upload_session()
+        response = session.put(url, data=chunk_data, headers=headers)
 
         if not response.ok:
             raise Exception(
@@ -251,25 +528,433 @@ def upload_chunk(url, chunk_data, content_type, fields):
         raise
 
 
-def upload_to_s3(file_path, file_type, chunk_size, urls, fields):
-    etags = []
+class UploadError(Exception):
+    """A file couldn't be fully uploaded; its journal allows resuming it."""
 
-    chunks = split_file_into_chunks(file_path, chunk_size)
-    for i, chunk in enumerate(chunks):
-        try:
-            etag = upload_chunk(urls[i], chunk, file_type, fields)
-            etags.append(etag)
-            print(f"Chunk {i + 1} of {len(chunks)} uploaded successfully")
-        except Exception as error:
-            print(f"Error uploading chunk {i + 1}:", error)
-            break
 
+def upload_retry_handler(file_path, job=None):
+    """on_retry for upload_parts: count the retry and log it."""
+
+    def on_retry(chunk, attempt, error):
+        UPLOAD_RETRIES.inc()
+        deploy_log.event(
+            "upload_retry",
+            job.id if job else None,
+            level="warning",
+            file=os.path.basename(file_path),
+            part=chunk.part_number,
+            attempt=attempt,
+            error=str(error),
+        )
+
+    return on_retry
+
+
+def upload_to_s3(
+    file_path,
+    file_type,
+    chunk_size,
+    urls,
+    fields,
+    concurrency=None,
+    journal=None,
+    job=None,
+    progress=None,
+):
+    # Parts are streamed from disk as they are sent, so memory use doesn't grow with the file
+    on_progress = None
+    if progress:
+        on_progress = lambda delta: progress.advance(file_path, delta, STAGE_UPLOAD)
+    identity = file_identity(file_path)
+    chunks = split_file_into_parts(
+        file_path,
+        chunk_size,
+        on_progress,
+        throttle=upload_rate_limiter.consume if upload_rate_limiter else None,
+    )
+    completed = journal.completed_parts if journal else {}
+    pending = [chunk for chunk in chunks if chunk.part_number not in completed]
+    if completed:
+        print(
+            f"Resuming {file_path}: {len(completed)} of {len(chunks)} parts already uploaded"
+        )
+    if progress:
+        progress.start_file(
+            file_path,
+            sum(chunk.length for chunk in chunks),
+            done_bytes=sum(chunk.length for chunk in chunks if chunk.part_number in completed),
+            stage=STAGE_UPLOAD,
+        )
+    session = get_upload_session()
+
+    def on_part_done(chunk, etag):
+        if journal:
+            journal.record_part(chunk.part_number, etag)
+        UPLOAD_PARTS.inc()
+        UPLOAD_BYTES.inc(chunk.length)
+        print(f"Chunk {chunk.part_number} of {len(chunks)} uploaded successfully")
+
+    try:
+        etags = upload_parts(
+            pending,
+            urls,
+            lambda url, chunk: upload_chunk(url, chunk, file_type, fields, session),
+            concurrency=UPLOAD_CONCURRENCY if concurrency is None else concurrency,
+            on_part_done=on_part_done,
+            on_retry=upload_retry_handler(file_path, job),
+            cancel_event=job.cancel_event if job else None,
+            verify_etags=VERIFY_ETAGS,
+            budget=upload_budget,
+        )
+    except UploadCancelled:
+        check_cancelled(job)
+        raise
+    except Exception as error:
+        print(f"Error uploading {file_path}:", error)
+        raise UploadError(f"Failed to upload {os.path.basename(file_path)}: {error}")
+
+    if file_identity(file_path) != identity:
+        raise UploadError(f"{os.path.basename(file_path)} changed while it was being uploaded")
+
+    if progress:
+        progress.finish_file(file_path, STAGE_UPLOAD)
+
+    etags_by_part = dict(completed)
+    etags_by_part.update(
+        (chunk.part_number, etag) for chunk, etag in zip(pending, etags)
+    )
+    return [etags_by_part[chunk.part_number] for chunk in chunks]
+
+
+def upload_compressed_to_s3(
+    file_path,
+    file_type,
+    chunk_size,
+    urls,
+    level=None,
+    journal=None,
+    job=None,
+    progress=None,
+):
+    """Gzip a file while uploading it and return the ETags of the compressed parts.
+
+    Parts are cut from one gzip stream, so the stored object is a plain
+    .gz of the file, usually in fewer parts than urls has room for. At
+    most UPLOAD_CONCURRENCY parts are compressed ahead of the uploads,
+    which bounds memory and temp space. On resume the stream is
+    regenerated and parts already in the journal aren't sent again.
+    """
+    identity = file_identity(file_path)
+    completed = journal.completed_parts if journal else {}
+    if progress:
+        progress.start_file(file_path, identity[2], stage=STAGE_UPLOAD)
+    session = get_upload_session()
+    cancel_event = job.cancel_event if job else None
+    throttle = upload_rate_limiter.consume if upload_rate_limiter else None
+    slots = threading.BoundedSemaphore(UPLOAD_CONCURRENCY)
+    failed = threading.Event()
+    on_retry = upload_retry_handler(file_path, job)
+
+    def part_done(part):
+        if progress:
+            progress.advance(file_path, part.raw_length, STAGE_UPLOAD)
+
+    def on_part_done(part, etag):
+        if journal:
+            journal.record_part(part.part_number, etag)
+        UPLOAD_PARTS.inc()
+        UPLOAD_BYTES.inc(part.length)
+        UPLOAD_COMPRESSION_SAVED_BYTES.inc(max(0, part.raw_length - part.length))
+        part_done(part)
+
+    def send(part):
+        try:
+            return upload_parts(
+                [part],
+                urls,
+                lambda url, chunk: upload_chunk(url, chunk, file_type, None, session),
+                concurrency=1,
+                on_part_done=on_part_done,
+                on_retry=on_retry,
+                cancel_event=cancel_event,
+                verify_etags=VERIFY_ETAGS,
+                budget=upload_budget,
+            )[0]
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            slots.release()
+
+    futures = {}
+    level = COMPRESS_LEVEL if level is None else level
+    parts = compressed_parts(file_path, chunk_size, level, throttle)
+    try:
+        with ThreadPoolExecutor(
+            max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="deploy-gzip"
+        ) as pool:
+            for part in parts:
+                if part.part_number > len(urls):
+                    part.close()
+                    raise UploadError(
+                        f"{os.path.basename(file_path)} compressed to more than "
+                        f"{len(urls)} parts; deploy it without compression"
+                    )
+                if part.part_number in completed:
+                    part.close()
+                    part_done(part)
+                    continue
+                # Wait for a free upload slot before compressing further ahead
+                while not slots.acquire(timeout=0.25):
+                    if failed.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                        break
+                else:
+                    if not failed.is_set():
+                        futures[part.part_number] = pool.submit(send, part)
+                        continue
+                part.close()
+                break
+        num_parts = max(list(futures) + list(completed) + [0])
+        etags = [
+            futures[n].result() if n in futures else completed.get(n)
+            for n in range(1, num_parts + 1)
+        ]
+    except UploadCancelled:
+        check_cancelled(job)
+        raise
+    except UploadError:
+        raise
+    except Exception as error:
+        print(f"Error uploading {file_path}:", error)
+        raise UploadError(f"Failed to upload {os.path.basename(file_path)}: {error}")
+    finally:
+        parts.close()
+
+    check_cancelled(job)
+    if file_identity(file_path) != identity:
+        raise UploadError(f"{os.path.basename(file_path)} changed while it was being uploaded")
+    if progress:
+        progress.finish_file(file_path, STAGE_UPLOAD)
     return etags
 
 
+def open_upload_journal(
+    presigned_url, deployment=None, content_encoding=None, deployment_id=None, completion=None
+):
+    """Start or resume the journal for one file of a package upload."""
+    return UploadJournal.open(
+        UPLOAD_JOURNAL_DIR,
+        presigned_url["file_path"],
+        presigned_url["presigned_url"]["key"],
+        presigned_url["presigned_url"]["upload_id"],
+        presigned_url["presigned_url"]["chunk_size"],
+        presigned_url["presigned_url"]["urls"],
+        presigned_url["content_type"],
+        deployment,
+        content_encoding,
+        deployment_id,
+        completion,
+    )
+
+
+def upload_journaled_file(headers, journal, job=None, progress=None):
+    """Upload the missing parts of a journaled file and complete its upload."""
+    state = journal.state
+    if state.get("content_encoding") == ENCODING_GZIP:
+        # Parts already sent can only be skipped if the stream is
+        # regenerated at the same level
+        if "compress_level" not in state:
+            state["compress_level"] = COMPRESS_LEVEL
+            journal.save()
+        etags = upload_compressed_to_s3(
+            state["file_path"],
+            state["content_type"],
+            state["chunk_size"],
+            state["urls"],
+            level=state["compress_level"],
+            journal=journal,
+            job=job,
+            progress=progress,
+        )
+    else:
+        etags = upload_to_s3(
+            state["file_path"],
+            state["content_type"],
+            state["chunk_size"],
+            state["urls"],
+            None,
+            journal=journal,
+            job=job,
+            progress=progress,
+        )
+    location = complete_multipart_upload(
+        headers, state["key"], state["upload_id"], etags
+    )
+    journal.remove()
+    return location
+
+
+def upload_journaled_files(headers, journals, job=None, progress=None):
+    """Upload several journaled files at once under the shared upload budget.
+
+    The largest file starts first and the smaller ones fill the other
+    slots, so small files don't wait behind a large checkpoint.
+    """
+
+    def upload_one(journal):
+        check_cancelled(job)
+        return upload_journaled_file(headers, journal, job=job, progress=progress)
+
+    return upload_files(
+        journals,
+        [journal.state["file_size"] for journal in journals],
+        upload_one,
+        max_files=UPLOAD_MAX_FILES,
+    )
+
+
+def chunk_store_request(session, headers, path, payload):
+    response = session.post(f"{CHUNK_STORE_URL}/{path}", json=payload, headers=headers)
+    if not response.ok:
+        raise Exception(f"Chunk store {path} failed. Status code: {response.status_code}")
+    return response.json()
+
+
+def upload_chunked_file(headers, presigned_url, model, job=None, progress=None):
+    """Send only the chunks of a model the chunk store is missing, then its chunk list.
+
+    The store assembles the file under the presigned key from the chunk
+    list, so the multipart upload for it is never used. Nothing is
+    journaled: after an interruption the next deployment asks the store
+    again and only sends what is still missing.
+    """
+    file_path = os.path.join(base_dir, model["relative_path"])
+    identity = file_identity(file_path)
+    chunks = get_file_chunks(file_path)
+    session = get_upload_session()
+    store_headers = {key: value for key, value in headers.items() if key != "Content-Type"}
+
+    unique = {}
+    for chunk in chunks:
+        unique.setdefault(chunk.digest, chunk)
+    missing = set(
+        chunk_store_request(session, headers, "chunks/missing", {"digests": list(unique)})[
+            "missing"
+        ]
+    )
+    to_send = [chunk for digest, chunk in unique.items() if digest in missing]
+    send_bytes = sum(chunk.length for chunk in to_send)
+
+    on_progress = None
+    if progress:
+        on_progress = lambda delta: progress.advance(file_path, delta, STAGE_UPLOAD)
+        progress.start_file(
+            file_path,
+            model["file_size"],
+            done_bytes=model["file_size"] - send_bytes,
+            stage=STAGE_UPLOAD,
+        )
+    throttle = upload_rate_limiter.consume if upload_rate_limiter else None
+    parts = [
+        FilePart(file_path, chunk.offset, chunk.length, i + 1, on_progress, throttle)
+        for i, chunk in enumerate(to_send)
+    ]
+    urls = [f"{CHUNK_STORE_URL}/chunks/{chunk.digest}" for chunk in to_send]
+
+    def put_chunk(url, part):
+        response = session.put(
+            url,
+            data=part,
+            headers=dict(store_headers, **{"Content-Type": "application/octet-stream"}),
+        )
+        if not response.ok:
+            raise Exception(f"Network response was not ok. Status code: {response.status_code}")
+        return response.headers.get("ETag")
+
+    def on_part_done(part, etag):
+        UPLOAD_PARTS.inc()
+        UPLOAD_BYTES.inc(part.length)
+
+    try:
+        upload_parts(
+            parts,
+            urls,
+            put_chunk,
+            concurrency=UPLOAD_CONCURRENCY,
+            on_part_done=on_part_done,
+            on_retry=upload_retry_handler(file_path, job),
+            cancel_event=job.cancel_event if job else None,
+            verify_etags=VERIFY_ETAGS,
+            budget=upload_budget,
+        )
+        if file_identity(file_path) != identity:
+            raise Exception("file changed while it was being uploaded")
+        location = chunk_store_request(
+            session,
+            headers,
+            "files",
+            {
+                "key": presigned_url["presigned_url"]["key"],
+                "upload_id": presigned_url["presigned_url"].get("upload_id"),
+                "model_hash": model["model_hash"],
+                "file_size": model["file_size"],
+                "chunks": [[chunk.digest, chunk.length] for chunk in chunks],
+            },
+        )
+    except UploadCancelled:
+        check_cancelled(job)
+        raise
+    except Exception as error:
+        print(f"Error uploading chunks of {file_path}:", error)
+        raise UploadError(
+            f"Failed to upload {model['file_name']}: {error}; deploying again sends "
+            "only the chunks still missing"
+        )
+
+    UPLOAD_DEDUP_BYTES.inc(model["file_size"] - send_bytes)
+    print(
+        f"Uploaded {len(to_send)} of {len(chunks)} chunks of {model['file_name']} "
+        f"({send_bytes} of {model['file_size']} bytes)"
+    )
+    if progress:
+        progress.finish_file(file_path, STAGE_UPLOAD)
+    return location
+
+
+def uses_chunk_store(model):
+    """Whether a model of a package is uploaded through the chunk store."""
+    return bool(CHUNK_STORE_URL) and "dedup" in model
+
+
+def upload_chunked_files(headers, uploads, job=None, progress=None):
+    """Upload several (presigned_url, model) pairs through the chunk store."""
+
+    def upload_one(item):
+        check_cancelled(job)
+        return upload_chunked_file(headers, item[0], item[1], job=job, progress=progress)
+
+    return upload_files(
+        uploads,
+        [model["file_size"] for _, model in uploads],
+        upload_one,
+        max_files=UPLOAD_MAX_FILES,
+    )
+
+
 def complete_multipart_upload(
-    headers: dict, key: str, upload_id: str, etags: List[str]
+    headers: dict,
+    key: str,
+    upload_id: str,
+    etags: List[str],
+    retries=DEFAULT_PART_RETRIES,
+    backoff=DEFAULT_RETRY_BACKOFF,
 ):
+    """Complete a multipart upload, retrying network errors and 5xx/429 with backoff.
+
+    Raises UploadError if it still fails: every part is journaled by then,
+    so resuming the deployment only has to complete the upload.
+    """
+    import requests
 
     payload = {
         "key": key,
@@ -277,23 +962,214 @@ def complete_multipart_upload(
         "etags": etags,
     }
 
-    url = "https://sdibavx1oh.execute-api.eu-central-1.amazonaws.com/staging/complete-upload"
+    url = f"{API_BASE_URL}/complete-upload"
+    for attempt in range(retries + 1):
+        try:
+            response = requests.request("POST", url, json=payload, headers=headers)
+        except requests.RequestException as e:
+            error = str(e)
+        else:
+            if response.ok:
+                try:
+                    return response.json()
+                except ValueError:
+                    raise Exception("Invalid response format received from server")
+            error = f"status code {response.status_code}"
+            if response.status_code < 500 and response.status_code != 429:
+                # The request itself was refused; sending it again won't help
+                break
+        if attempt < retries:
+            delay = backoff * (2**attempt) * (0.5 + random.random())
+            print(f"Completing the upload of {key} failed ({error}), retrying in {delay:.1f}s")
+            UPLOAD_RETRIES.inc()
+            time.sleep(delay)
+    raise UploadError(f"Failed to complete multipart upload of {key}: {error}")
+
+
+def abort_multipart_upload(headers: dict, key: str, upload_id: str) -> bool:
+    """Ask the API to abort a multipart upload that won't be used.
+
+    Best effort: a failure is only logged, since the file itself is
+    already stored or sent another way.
+    """
+    import requests
+
+    url = f"{API_BASE_URL}/abort-upload"
     try:
-        response = requests.request("POST", url, json=payload, headers=headers)
+        response = requests.request(
+            "POST", url, json={"key": key, "upload_id": upload_id}, headers=headers
+        )
         response.raise_for_status()
-        return response.json()
+        return True
     except requests.RequestException as e:
-        raise Exception(f"Failed to complete multipart upload: {str(e)}")
-    except KeyError:
-        raise Exception("Invalid response format received from server")
+        print(f"Could not abort the unused upload of {key}: {e}")
+        return False
+
+
+def get_api_headers(data):
+    return {
+        "Accept": "*/*",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Connection": "keep-alive",
+        "x-api-key": data["secret_key"],
+        "x-user-id": data["user_id"],
+        "Content-Type": "application/json",
+    }
 
 
-def get_file_hash(path, algo="sha256", chunk_size=8192):
-    h = hashlib.new(algo)
-    with open(path, "rb") as f:
-        while chunk := f.read(chunk_size):
-            h.update(chunk)
-    return h.hexdigest()
+def trigger_package_build(headers, build_requirements):
+    import requests
+
+    url = f"{API_BASE_URL}/trigger-package-build"
+    build_response = requests.request(
+        "POST", url, json=build_requirements, headers=headers
+    )
+    build_response_data = build_response.json()
+    print(f"Build Response: {build_response_data}")
+    return build_response_data
+
+
+def get_file_hash(path, algo="sha256", chunk_size=DEFAULT_BUFFER_SIZE, on_progress=None):
+    identity = file_identity(path)
+    cached = hash_cache.get(identity, algo)
+    if cached:
+        HASH_CACHE_LOOKUPS.inc(result="hit")
+        print(f"Using cached {algo} for {path}")
+        return cached
+    HASH_CACHE_LOOKUPS.inc(result="miss")
+
+    def count_bytes(n):
+        HASH_BYTES_READ.inc(n)
+        if on_progress:
+            on_progress(n)
+
+    digest = hash_file(path, algo, chunk_size, count_bytes)
+
+    # Only cache the result if the file didn't change while we were reading it
+    if file_identity(path) == identity:
+        hash_cache.put(identity, algo, digest, path)
+    return digest
+
+
+def get_file_hashes(paths, algo="sha256", workers=None, job=None, progress=None):
+    """Hash several model files concurrently, using the hash cache where possible."""
+
+    def hash_fn(path):
+        check_cancelled(job)
+        if not progress:
+            return get_file_hash(path, algo)
+        progress.start_file(path, os.path.getsize(path), stage=STAGE_HASH)
+        digest = get_file_hash(
+            path, algo, on_progress=lambda n: progress.advance(path, n, STAGE_HASH)
+        )
+        progress.finish_file(path, STAGE_HASH)
+        return digest
+
+    try:
+        return hash_files(
+            paths, workers=HASH_WORKERS if workers is None else workers, hash_fn=hash_fn
+        )
+    finally:
+        # One write for the whole batch, including the files that did finish
+        hash_cache.flush()
+
+
+def get_file_chunks(path, avg_size=None, on_progress=None):
+    """Content-defined chunks of a model file, from the chunk index if it hasn't changed."""
+    avg_size = avg_size or CHUNK_AVG_KB * 1024
+    identity = file_identity(path)
+    cached = chunk_index.chunks_for(identity, avg_size)
+    if cached is not None:
+        return cached
+
+    def count_bytes(n):
+        HASH_BYTES_READ.inc(n)
+        if on_progress:
+            on_progress(n)
+
+    chunks = chunk_file(path, avg_size, on_progress=count_bytes)
+    if file_identity(path) == identity:
+        chunk_index.put_chunks(identity, avg_size, chunks, path)
+    return chunks
+
+
+def get_files_chunks(paths, job=None, progress=None):
+    """Chunk several model files concurrently; returns {path: chunks or exception}."""
+
+    def chunk_fn(path):
+        check_cancelled(job)
+        if not progress:
+            return get_file_chunks(path)
+        progress.start_file(path, os.path.getsize(path), stage=STAGE_CHUNK)
+        chunks = get_file_chunks(
+            path, on_progress=lambda n: progress.advance(path, n, STAGE_CHUNK)
+        )
+        progress.finish_file(path, STAGE_CHUNK)
+        return chunks
+
+    results = hash_files(paths, workers=HASH_WORKERS, hash_fn=chunk_fn)
+    chunk_index.save()
+    return results
+
+
+def comfyui_is_idle():
+    """True while no prompts are queued or running and no deploy job is active."""
+    if any(job.status in (QUEUED, RUNNING) for job in job_manager.list()):
+        return False
+    prompt_queue = getattr(PromptServer.instance, "prompt_queue", None)
+    return prompt_queue is None or prompt_queue.get_tasks_remaining() == 0
+
+
+def list_prehash_files():
+    """Model files under SEARCH_DIRS, one path per file on disk."""
+    refresh_model_index()
+    paths = []
+    for search_dir in SEARCH_DIRS:
+        paths.extend(model_index.files_under(search_dir, MODEL_EXTENSIONS) or [])
+    return list(group_by_inode(paths))
+
+
+def is_prehashed(path):
+    identity = file_identity(path)
+    if hash_cache.get(identity, "sha256") is None:
+        return False
+    return not CHUNK_DEDUP or chunk_index.chunks_for(identity, CHUNK_AVG_KB * 1024) is not None
+
+
+def save_prehash_round():
+    hash_cache.flush()
+    if CHUNK_DEDUP:
+        chunk_index.save()
+
+
+def prehash_file(path, on_progress):
+    """Fill the caches a deployment reads for path: its hash and, with chunk dedup, its chunks."""
+    get_file_hash(path, on_progress=on_progress)
+    if CHUNK_DEDUP:
+        get_file_chunks(path, on_progress=on_progress)
+    PREHASH_FILES.inc()
+
+
+prehash_worker = PrehashWorker(
+    list_prehash_files,
+    is_prehashed,
+    prehash_file,
+    comfyui_is_idle,
+    interval=PREHASH_INTERVAL,
+    throttle=RateLimiter(PREHASH_MBPS * 1024 * 1024).consume if PREHASH_MBPS > 0 else None,
+    on_round_done=save_prehash_round,
+)
+
+
+def stop_prehash():
+    """Stop background pre-hashing and keep what it hashed so far."""
+    prehash_worker.stop(PREHASH_STOP_TIMEOUT)
+    save_prehash_round()
+
+
+if PREHASH:
+    prehash_worker.start()
+    atexit.register(stop_prehash)
 
 
 # def get_node_info():
@@ -306,14 +1182,18 @@ def get_file_hash(path, algo="sha256", chunk_size=8192):
 
 
 def get_comfyui_version():
-    result = subprocess.run(
-        ["git", "tag", "--points-at", "HEAD"],
-        cwd=base_dir,
-        capture_output=True,
-        text=True,
-        check=True,
-    )
-    return result.stdout.strip()
+    return "\n".join(git_info_reader.tags_at_head(base_dir))
+
+
+def find_initial_model_paths(workflow, object_info=None):
+    """Existing model files for the model names a workflow references, without duplicates."""
+    model_names = find_model_filenames(workflow, object_info)
+    model_paths = []
+    for model_name, model_path in resolve_model_filepaths(model_names).items():
+        print(model_name)
+        if model_path and os.path.isfile(model_path) and model_path not in model_paths:
+            model_paths.append(model_path)
+    return model_paths
 
 
 @PromptServer.instance.routes.post("/deploy/get_initial_models")
@@ -326,19 +1206,39 @@ async def get_initial_models(request):
                 {"status": "error", "message": "Workflow data not provided"}, status=400
             )
 
-        model_names = find_model_filenames(workflow)
-        model_paths = []
-        for model_name in model_names:
-            print(model_name)
-            model_path = find_model_filepath(model_name)
-            if model_path and os.path.isfile(model_path):
-                model_paths.append(model_path)
-        return web.json_response({"status": "success", "models": model_paths})
+        # Node INPUT_TYPES list model folders through folder_paths, refreshing
+        # the index stats the model tree and the first refresh builds it;
+        # keep all of that off the event loop
+        model_paths = await asyncio.get_running_loop().run_in_executor(
+            None, find_initial_model_paths, workflow, data.get("object_info")
+        )
+        response = {"status": "success", "models": model_paths}
+        if data.get("with_info"):
+            # Header summaries and quick fingerprints only read a few blocks per file
+            response["model_info"] = await asyncio.get_running_loop().run_in_executor(
+                None, describe_models, model_paths
+            )
+        return web.json_response(response)
     except Exception as e:
         print(f"Error in /deploy/get_initial_models: {e}")
         return web.json_response({"status": "error", "message": str(e)}, status=500)
 
 
+@PromptServer.instance.routes.post("/deploy/model_info")
+async def get_model_info(request):
+    """Describe model files without hashing them: size, quick fingerprint and,
+    for safetensors files, tensor and parameter counts and dtypes."""
+    data = await request.json()
+    paths = [
+        os.path.abspath(path)
+        for path in data.get("paths", [])
+        if isinstance(path, str) and path.lower().endswith(MODEL_EXTENSIONS)
+    ]
+    paths = [path for path in dict.fromkeys(paths) if os.path.isfile(path)]
+    models = await asyncio.get_running_loop().run_in_executor(None, describe_models, paths)
+    return web.json_response({"status": "success", "models": models})
+
+
 def search_for_folder_in_search_dirs(folder_name):
     """Search for a folder within SEARCH_DIRS and return its absolute path if found."""
     for search_dir in SEARCH_DIRS:
@@ -353,6 +1253,9 @@ def find_all_model_files_in_folder(abs_folder_path):
     model_files = []
     if not os.path.isdir(abs_folder_path):
         return model_files
+    indexed = model_index.files_under(abs_folder_path, MODEL_EXTENSIONS)
+    if indexed is not None:
+        return [os.path.abspath(path) for path in indexed]
     for root, _, files in os.walk(abs_folder_path):
         for file in files:
             if file.lower().endswith(MODEL_EXTENSIONS):
@@ -360,132 +1263,241 @@ def find_all_model_files_in_folder(abs_folder_path):
     return model_files
 
 
-@PromptServer.instance.routes.post("/deploy/validate_and_get_model_paths")
-async def validate_and_get_model_paths(request):
-    try:
-        data = await request.json()
-        print("Received data:", data)
-        input_path = data.get("path")
-        if not input_path:
-            return web.json_response(
-                {"status": "error", "message": "Path not provided"}, status=400
-            )
+def resolve_model_input(input_path):
+    """Resolve a model file, folder name or directory path to model file paths.
 
-        found_model_paths = []
+    Returns (sorted absolute model paths, None) or ([], error message). The
+    caller refreshes the model index first.
+    """
+    found_model_paths = []
 
-        # 1. Try to find it as a direct model file path using existing logic
-        model_file_direct = find_model_filepath(input_path)
-        if model_file_direct and os.path.isfile(model_file_direct):
-            found_model_paths.append(os.path.abspath(model_file_direct))
-            print(f"Found as direct model file: {model_file_direct}")
-        else:
-            # 2. If not a direct file, try to find it as a folder name in SEARCH_DIRS
+    # 1. Try to find it as a direct model file path using existing logic
+    model_file_direct = find_model_filepath(input_path)
+    if model_file_direct and os.path.isfile(model_file_direct):
+        found_model_paths.append(os.path.abspath(model_file_direct))
+        print(f"Found as direct model file: {model_file_direct}")
+    else:
+        # 2. If not a direct file, try to find it as a folder name in SEARCH_DIRS
+        print(
+            f"'{input_path}' not found as a direct model file. Trying as folder name."
+        )
+        folder_abs_path = search_for_folder_in_search_dirs(input_path)
+        if folder_abs_path:
             print(
-                f"'{input_path}' not found as a direct model file. Trying as folder name."
+                f"Found folder '{input_path}' at '{folder_abs_path}'. Scanning for model files."
             )
-            folder_abs_path = search_for_folder_in_search_dirs(input_path)
-            if folder_abs_path:
+            model_files_in_folder = find_all_model_files_in_folder(folder_abs_path)
+            if model_files_in_folder:
+                found_model_paths.extend(model_files_in_folder)
+                print(f"Found {len(model_files_in_folder)} models in folder")
+            else:
+                print(f"No model files found in folder: {folder_abs_path}")
+        else:
+            # 3. If input_path is an absolute or relative path to a directory
+            normalized_input_path = os.path.abspath(
+                os.path.join(base_dir, input_path)
+                if not os.path.isabs(input_path)
+                else input_path
+            )
+            if os.path.isdir(normalized_input_path):
                 print(
-                    f"Found folder '{input_path}' at '{folder_abs_path}'. Scanning for model files."
+                    f"Input path '{normalized_input_path}' is a directory. Scanning for model files."
+                )
+                model_files_in_folder = find_all_model_files_in_folder(
+                    normalized_input_path
                 )
-                model_files_in_folder = find_all_model_files_in_folder(folder_abs_path)
                 if model_files_in_folder:
                     found_model_paths.extend(model_files_in_folder)
-                    print(f"Found models in folder: {model_files_in_folder}")
-                else:
-                    print(f"No model files found in folder: {folder_abs_path}")
-            else:
-                # 3. If input_path is an absolute or relative path to a directory
-                normalized_input_path = os.path.abspath(
-                    os.path.join(base_dir, input_path)
-                    if not os.path.isabs(input_path)
-                    else input_path
-                )
-                if os.path.isdir(normalized_input_path):
-                    print(
-                        f"Input path '{normalized_input_path}' is a directory. Scanning for model files."
-                    )
-                    model_files_in_folder = find_all_model_files_in_folder(
-                        normalized_input_path
-                    )
-                    if model_files_in_folder:
-                        found_model_paths.extend(model_files_in_folder)
-                        print(f"Found models in directory: {model_files_in_folder}")
-                    else:
-                        print(
-                            f"No model files found in directory: {normalized_input_path}"
-                        )
+                    print(f"Found {len(model_files_in_folder)} models in directory")
                 else:
                     print(
-                        f"Could not resolve '{input_path}' as a model file, a known folder, or a direct directory path."
+                        f"No model files found in directory: {normalized_input_path}"
                     )
+            else:
+                print(
+                    f"Could not resolve '{input_path}' as a model file, a known folder, or a direct directory path."
+                )
 
-        if found_model_paths:
-            # Remove duplicates that might arise if a direct file is also in a specified folder
-            unique_paths = sorted(list(set(found_model_paths)))
-            print(f"Returning found model paths: {unique_paths}")
-            return web.json_response({"status": "success", "model_paths": unique_paths})
-        else:
-            print(f"Model path or folder not found for input: {input_path}")
-            message = f"Could not find model file or folder: '{input_path}'. Searched in standard model directories and as a direct path."
-            if (
-                not any(input_path.lower().endswith(ext) for ext in MODEL_EXTENSIONS)
-                and not os.path.sep in input_path
-            ):
-                message += f" If '{input_path}' is a folder, ensure it exists within {SEARCH_DIRS} or provide a full path."
+    if found_model_paths:
+        # Remove duplicates that might arise if a direct file is also in a specified folder
+        return sorted(set(found_model_paths)), None
+
+    print(f"Model path or folder not found for input: {input_path}")
+    message = f"Could not find model file or folder: '{input_path}'. Searched in standard model directories and as a direct path."
+    if (
+        not any(input_path.lower().endswith(ext) for ext in MODEL_EXTENSIONS)
+        and not os.path.sep in input_path
+    ):
+        message += f" If '{input_path}' is a folder, ensure it exists within {SEARCH_DIRS} or provide a full path."
+    return [], message
+
+
+@PromptServer.instance.routes.post("/deploy/validate_and_get_model_paths")
+async def validate_and_get_model_paths(request):
+    try:
+        data = await request.json()
+        print("Received data:", data)
+        input_path = data.get("path")
+        if not input_path:
             return web.json_response(
-                {"status": "error", "message": message}, status=404
+                {"status": "error", "message": "Path not provided"}, status=400
             )
 
+        # Same executor path as /deploy/validate_model_paths
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, validate_model_inputs, [input_path]
+        )
+        resolved = result["results"][input_path]
+        unique_paths, message = resolved.get("model_paths"), resolved.get("message")
+        if unique_paths:
+            print(f"Returning {len(unique_paths)} model paths")
+            return web.json_response({"status": "success", "model_paths": unique_paths})
+        return web.json_response({"status": "error", "message": message}, status=404)
+
     except Exception as e:
         print(f"Error in /deploy/validate_and_get_model_paths: {e}")
 
 
-@PromptServer.instance.routes.post("/deploy/generate_requirements")
-async def generate_requirements(request):
-    print("Generating Requirements")
+def validate_model_inputs(paths):
+    """Resolve several paths or folder names with a single model index refresh."""
+    refresh_model_index()
+    results = {}
+    model_paths = set()
+    for input_path in paths:
+        found, message = resolve_model_input(input_path)
+        if found:
+            results[input_path] = {"status": "success", "model_paths": found}
+            model_paths.update(found)
+        else:
+            results[input_path] = {"status": "error", "message": message}
+    return {
+        "status": "success" if model_paths else "error",
+        "results": results,
+        "model_paths": sorted(model_paths),
+    }
 
+
+@PromptServer.instance.routes.post("/deploy/validate_model_paths")
+async def validate_model_paths(request):
     data = await request.json()
+    paths = [path.strip() for path in data.get("paths", []) if isinstance(path, str)]
+    paths = [path for path in dict.fromkeys(paths) if path]
+    if not paths:
+        return web.json_response(
+            {"status": "error", "message": "No paths provided"}, status=400
+        )
+    # Refreshing the index stats the model tree; keep that off the event loop
+    result = await asyncio.get_running_loop().run_in_executor(
+        None, validate_model_inputs, paths
+    )
+    return web.json_response(result)
+
+
+def search_models(query="", folder=None, offset=0, limit=50):
+    """One page of model files matching query, or of the model files in folder."""
+    refresh_model_index()
+    if folder:
+        abs_folder_path = search_for_folder_in_search_dirs(folder) or os.path.abspath(
+            os.path.join(base_dir, folder)
+        )
+        paths = sorted(find_all_model_files_in_folder(abs_folder_path))
+        needle = query.lower()
+        paths = [
+            path for path in paths if needle in os.path.relpath(path, abs_folder_path).lower()
+        ]
+        total, page = len(paths), paths[offset : offset + limit]
+    else:
+        total, matches = model_index.search(query, MODEL_EXTENSIONS, offset, limit)
+        page = [abs_path for abs_path, _ in matches]
+    return {
+        "status": "success",
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "results": [
+            {"path": path, "relative_path": os.path.relpath(path, base_dir)} for path in page
+        ],
+    }
+
+
+@PromptServer.instance.routes.get("/deploy/models/search")
+async def search_model_files(request):
+    try:
+        offset = max(0, int(request.query.get("offset", 0)))
+        limit = min(MODEL_SEARCH_MAX_LIMIT, max(1, int(request.query.get("limit", 50))))
+    except ValueError:
+        return web.json_response(
+            {"status": "error", "message": "offset and limit must be integers"}, status=400
+        )
+    result = await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: search_models(
+            request.query.get("q", ""), request.query.get("folder"), offset, limit
+        ),
+    )
+    return web.json_response(result)
+
+
+def run_deployment(data, job=None):
+    """Build the package for a deploy request, upload it and trigger the build.
+
+    Runs in a job thread, never on the event loop. Returns the response
+    payload for the frontend.
+    """
+    return run_tracked(
+        "deploy",
+        job,
+        lambda progress: _run_deployment(data, job, progress),
+        product_name=data.get("product_name"),
+    )
+
+
+def build_package(data, job, progress):
+    """Collect custom node git info and hashed model files for a deploy request.
+
+    Returns the deployment requirements: workflow name, version, the
+    workflow itself and the package object (ComfyUI version, custom nodes,
+    models). Custom nodes are looked up in ComfyUI's node registry unless
+    the request carries object_info.
+    """
+    print("Generating Requirements")
+    progress.stage(STAGE_SCAN, "Scanning workflow and custom nodes")
+
     workflow = data["workflow"]
-    node_info = data["object_info"]
     # Get additional model paths provided by the user - this is now the definitive list of ABSOLUTE model file paths
     additional_model_paths = data.get("additional_model_paths", [])
     # Get the original model names as detected from the workflow by the frontend, if provided
     workflow_original_model_names = data.get("workflow_original_model_names", [])
 
-    custom_nodes = {}
     comfyui_version = get_comfyui_version()
     print(f"ComfyUI Version: {comfyui_version}")
-    for node, node_metadata in node_info.items():
-        if (
-            "python_module" in node_metadata
-            and "custom_nodes" in node_metadata["python_module"]
-        ):
-            repo_name = node_metadata["python_module"].split("custom_nodes.")[1]
-            custom_nodes[node] = {
-                "repo_name": repo_name,
-                # "custom_node_path": str(Path("./custom_nodes/", repo_name)),
-                "display_name": node_metadata["display_name"],
-            }
 
     workflow_nodes = set()
     for node in workflow.values():
         if isinstance(node, dict) and "class_type" in node:
             workflow_nodes.add(node["class_type"])
 
+    # Only the workflow's own classes are looked up, not every installed node
+    custom_nodes = get_custom_nodes_for_classes(workflow_nodes, data.get("object_info"))
     required_custom_nodes = [
-        node_metadata["repo_name"]
-        for node, node_metadata in custom_nodes.items()
-        if node in workflow_nodes
+        node_metadata["repo_name"] for node_metadata in custom_nodes.values()
     ]
 
     required_custom_nodes_with_git_info = {}
-    for custom_node in set(required_custom_nodes):
-        custom_node_path = str(Path("./custom_nodes/", custom_node))
-        git_info = get_git_version_info(custom_node_path)
+    progress.stage(
+        STAGE_GIT, f"Reading git info for {len(set(required_custom_nodes))} custom nodes"
+    )
+    check_cancelled(job)
+    custom_node_paths = {
+        custom_node: str(Path("./custom_nodes/", custom_node))
+        for custom_node in set(required_custom_nodes)
+    }
+    # Read every repo in one pass; the git CLI is only used for unusual layouts
+    git_infos = git_info_reader.read_many(custom_node_paths.values())
+    for custom_node, custom_node_path in custom_node_paths.items():
         required_custom_nodes_with_git_info[custom_node] = {
             "custom_node_path": custom_node_path,
-            "git_info": git_info,
+            "git_info": git_infos[custom_node_path],
         }
 
     model_info = []
@@ -501,68 +1513,132 @@ async def generate_requirements(request):
             f"Using workflow original model names for display name matching: {workflow_original_model_names}"
         )
 
+    progress.stage(STAGE_SCAN, "Validating model paths")
+    refresh_model_index()
     unique_model_files = sorted(
         list(set(additional_model_paths))
     )  # Ensure uniqueness and consistent order
 
+    valid_model_files = []
     for local_path in unique_model_files:
-        try:
-            # Path should be absolute, but ensure it and normalize
-            abs_local_path = os.path.abspath(os.path.normpath(local_path))
+        # Path should be absolute, but ensure it and normalize
+        abs_local_path = os.path.abspath(os.path.normpath(local_path))
 
-            if not os.path.exists(abs_local_path):
-                print(
-                    f"Warning: Provided model path {abs_local_path} does not exist. Skipping."
-                )
-                continue
-            if not os.path.isfile(abs_local_path):
-                print(
-                    f"Warning: Provided model path {abs_local_path} is not a file. Skipping."
-                )
-                continue
-            if not abs_local_path.lower().endswith(MODEL_EXTENSIONS):
-                print(
-                    f"Warning: Provided model path {abs_local_path} does not have a recognized model extension. Skipping."
-                )
-                continue
+        if not os.path.exists(abs_local_path):
+            print(
+                f"Warning: Provided model path {abs_local_path} does not exist. Skipping."
+            )
+            continue
+        if not os.path.isfile(abs_local_path):
+            print(
+                f"Warning: Provided model path {abs_local_path} is not a file. Skipping."
+            )
+            continue
+        if not abs_local_path.lower().endswith(MODEL_EXTENSIONS):
+            print(
+                f"Warning: Provided model path {abs_local_path} does not have a recognized model extension. Skipping."
+            )
+            continue
+        valid_model_files.append(abs_local_path)
+
+    # Symlinks and hardlinks to one file are read and uploaded once, under
+    # one path; the others are listed as its aliases
+    aliases_by_path = group_by_inode(valid_model_files)
+    if len(aliases_by_path) < len(valid_model_files):
+        print(
+            f"{len(valid_model_files)} model paths are {len(aliases_by_path)} files on disk"
+        )
+    valid_model_files = list(aliases_by_path)
+
+    original_names_by_path = build_original_name_map(workflow_original_model_names)
+
+    # Hash every model at once so several files are read in parallel
+    check_cancelled(job)
+    progress.stage(
+        STAGE_HASH,
+        f"Hashing {len(valid_model_files)} model files",
+        bytes_total=sum(os.path.getsize(path) for path in valid_model_files),
+    )
+    model_hashes = get_file_hashes(valid_model_files, job=job, progress=progress)
+    check_cancelled(job)
+
+    model_chunks = {}
+    if data.get("chunk_dedup", CHUNK_DEDUP):
+        progress.stage(
+            STAGE_CHUNK,
+            f"Chunking {len(valid_model_files)} model files",
+            bytes_total=sum(os.path.getsize(path) for path in valid_model_files),
+        )
+        model_chunks = get_files_chunks(valid_model_files, job=job, progress=progress)
+        check_cancelled(job)
+
+    compress = data.get("compress", COMPRESS_UPLOADS)
+    models_by_hash = {}
+    for abs_local_path in valid_model_files:
+        try:
+            model_hash = model_hashes[abs_local_path]
+            if isinstance(model_hash, Exception):
+                raise model_hash
 
             relative_path = os.path.relpath(abs_local_path, base_dir)
-            model_hash = get_file_hash(abs_local_path)
+            alias_paths = aliases_by_path[abs_local_path]
+            aliases = [os.path.relpath(path, base_dir) for path in alias_paths]
+            if model_hash in models_by_hash:
+                # A separate copy of a file already in the package
+                existing = models_by_hash[model_hash]
+                existing["aliases"] = sorted(existing["aliases"] + [relative_path] + aliases)
+                print(f"{relative_path} has the same contents as {existing['relative_path']}")
+                continue
             file_name = os.path.basename(abs_local_path)
             file_size = os.path.getsize(abs_local_path)
             content_type, encoding = mimetypes.guess_type(abs_local_path)
             if not content_type:
                 content_type = "application/octet-stream"
 
-            original_model_name = file_name  # Default to filename
-            if workflow_original_model_names:
-                for w_name in workflow_original_model_names:
-                    # Heuristic: if basename matches, and resolving w_name (if it's a relative path from workflow) points to the same file
-                    if os.path.basename(w_name) == file_name:
-                        # find_model_filepath can resolve names like 'model.safetensors' or 'folder/model.safetensors'
-                        resolved_w_name_path = find_model_filepath(w_name)
-                        if (
-                            resolved_w_name_path
-                            and os.path.normpath(resolved_w_name_path) == abs_local_path
-                        ):
-                            original_model_name = w_name
-                            print(
-                                f"Matched {abs_local_path} to original workflow name: {w_name}"
-                            )
-                            break
-
-            model_info.append(
-                {
-                    "name": original_model_name,
-                    "file_name": file_name,
-                    "file_size": file_size,
-                    "model_hash": model_hash,
-                    "content_type": content_type,
-                    "relative_path": relative_path,
-                }
+            # Default to filename
+            original_model_name = next(
+                (
+                    original_names_by_path[path]
+                    for path in [abs_local_path] + alias_paths
+                    if path in original_names_by_path
+                ),
+                file_name,
             )
+
+            model = {
+                "name": original_model_name,
+                "file_name": file_name,
+                "file_size": file_size,
+                "model_hash": model_hash,
+                "content_type": content_type,
+                "relative_path": relative_path,
+                "aliases": sorted(aliases),
+            }
+            description = describe_model(abs_local_path)
+            model["quick_fingerprint"] = description["quick_fingerprint"]
+            if "safetensors" in description:
+                model["safetensors"] = description["safetensors"]
+            chunks = model_chunks.get(abs_local_path)
+            if isinstance(chunks, Exception):
+                print(f"Could not chunk {abs_local_path}: {chunks}")
+            elif chunks is not None:
+                # Share of the file made of chunks already deployed or repeated in it
+                model["dedup"] = dedup_stats(chunks, chunk_index.known)
+            # Chunk store uploads send raw chunks, so they are never compressed
+            model["content_encoding"] = None
+            if compress and not uses_chunk_store(model):
+                encoding, ratio = choose_encoding(
+                    abs_local_path,
+                    COMPRESS_MAX_RATIO,
+                    COMPRESS_LEVEL,
+                    uplink_bytes_per_second=UPLINK_MBPS * 1024 * 1024,
+                )
+                model["content_encoding"] = encoding
+                model["compression_ratio_estimate"] = round(ratio, 3)
+            model_info.append(model)
+            models_by_hash[model_hash] = model
         except Exception as e:
-            print(f"Error processing model file {local_path}: {e}")
+            print(f"Error processing model file {abs_local_path}: {e}")
 
     package_object = {
         "comfyui_version": comfyui_version,
@@ -579,18 +1655,44 @@ async def generate_requirements(request):
         "version": version,
         "current_time": current_time,
     }
+    return deployment_requirements
 
 
-    headers = {
-        "Accept": "*/*",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "x-api-key": data["secret_key"],
-        "x-user-id": data["user_id"],
-        "Content-Type": "application/json",
-    }
+def _run_deployment(data, job, progress):
+    import requests
+
+    deployment_requirements = build_package(data, job, progress)
+    package_object = deployment_requirements["package"]
+    version = deployment_requirements["version"]
+    current_time = deployment_requirements["current_time"]
+
+    # Mark what changed since the last successful deployment of this product;
+    # "full_deploy" in the request ignores it and re-sends everything
+    product_name = data["product_name"]
+    previous = None if data.get("full_deploy") else deploy_manifests.load(product_name)
+    delta = diff_package(package_object, previous)
+    package_object["delta"] = delta
+    if previous:
+        print(
+            f"Changes since {previous.get('version')}: models {delta['models']}, "
+            f"custom nodes {delta['custom_nodes']}"
+        )
+
+    headers = get_api_headers(data)
+    # Identifies this deployment's upload journals for /deploy/resume_uploads
+    deployment_id = job.id if job else uuid.uuid4().hex
+    # The new package gets new upload ids, so unfinished uploads of an
+    # earlier deployment of this product can't be resumed any more
+    stale = UploadJournal.remove_journals(
+        UPLOAD_JOURNAL_DIR,
+        lambda journal: (journal.state.get("deployment") or {}).get("workflow_name")
+        == product_name,
+    )
+    if stale:
+        print(f"Dropped {stale} unfinished uploads of an earlier deployment of {product_name}")
 
-    url = "https://sdibavx1oh.execute-api.eu-central-1.amazonaws.com/staging/package"
+    progress.stage(STAGE_PACKAGE, "Sending package")
+    url = f"{API_BASE_URL}/package"
     try:
         response = requests.request(
             "POST", url, json=deployment_requirements, headers=headers
@@ -601,35 +1703,13 @@ async def generate_requirements(request):
         # Handle different status codes
         if response.status_code != 200:
             # Return error message from API to frontend
-            return web.json_response(
-                {
-                    "status": "error",
-                    "status_code": response.status_code,
-                    "message": response_data.get("message", "Unknown error occurred"),
-                },
-                status=response.status_code,
-            )
+            return {
+                "status": "error",
+                "status_code": response.status_code,
+                "message": response_data.get("message", "Unknown error occurred"),
+            }
 
         presigned_urls = response_data
-
-        if presigned_urls["files"]:
-            for presigned_url in presigned_urls["files"]:
-                etags = upload_to_s3(
-                    presigned_url["file_path"],
-                    presigned_url["content_type"],
-                    presigned_url["presigned_url"]["chunk_size"],
-                    presigned_url["presigned_url"]["urls"],
-                    presigned_url["presigned_url"]["fields"],
-                )
-
-                location = complete_multipart_upload(
-                    headers,
-                    presigned_url["presigned_url"]["key"],
-                    presigned_url["presigned_url"]["upload_id"],
-                    etags,
-                )
-
-        print("Package Saved")
         build_requirements = {
             "workflow_name": data["product_name"],
             "version": version,
@@ -637,27 +1717,460 @@ async def generate_requirements(request):
             "product_id": response_data["product_id"],
         }
 
-        url = "https://sdibavx1oh.execute-api.eu-central-1.amazonaws.com/staging/trigger-package-build"
-        build_response = requests.request(
-            "POST", url, json=build_requirements, headers=headers
+        # A file whose contents were already uploaded to the same key by the
+        # previous deployment is skipped; anything else is sent in full
+        previous_keys = previous_keys_by_hash(previous)
+        previous_encodings = {
+            model["model_hash"]: model.get("content_encoding")
+            for model in (previous or {}).get("models", {}).values()
+        }
+        keys_by_hash = dict(previous_keys)
+        models_by_path = {model["relative_path"]: model for model in package_object["models"]}
+        files_to_upload = []
+        chunked_uploads = []
+        # Multipart uploads the API started for files that are skipped
+        unused_uploads = []
+        for presigned_url in presigned_urls["files"]:
+            model = models_by_path.get(presigned_url["file_path"])
+            key = presigned_url["presigned_url"]["key"]
+            if model is None:
+                files_to_upload.append(presigned_url)
+                continue
+            keys_by_hash[model["model_hash"]] = key
+            already_stored = previous_keys.get(model["model_hash"]) == key
+            if model["change"] == CHANGE_UNCHANGED and already_stored:
+                print(f"Skipping {model['file_name']}: unchanged since {delta['base_version']}")
+                UPLOAD_SKIPPED_BYTES.inc(model["file_size"])
+                unused_uploads.append(presigned_url["presigned_url"])
+                # It stays stored the way the previous deployment sent it
+                model["content_encoding"] = previous_encodings.get(model["model_hash"])
+                model.pop("compression_ratio_estimate", None)
+                continue
+            if uses_chunk_store(model):
+                chunked_uploads.append((presigned_url, model))
+                continue
+            files_to_upload.append(presigned_url)
+
+        # How each file is stored once uploaded, skipped files included
+        build_requirements["content_encodings"] = {
+            model["relative_path"]: model["content_encoding"]
+            for model in package_object["models"]
+        }
+
+        # Otherwise every redeploy leaves an open S3 upload per skipped file
+        for upload in unused_uploads:
+            if upload.get("upload_id"):
+                abort_multipart_upload(headers, upload["key"], upload["upload_id"])
+
+        if chunked_uploads:
+            progress.stage(
+                STAGE_UPLOAD,
+                f"Uploading missing chunks of {len(chunked_uploads)} files",
+                bytes_total=sum(model["file_size"] for _, model in chunked_uploads),
+            )
+            upload_chunked_files(headers, chunked_uploads, job=job, progress=progress)
+
+        # Recorded once the package is built, here or by a resume
+        completion = {
+            "product_name": product_name,
+            "manifest": build_manifest(product_name, version, package_object, keys_by_hash),
+            "chunked_paths": [
+                model["relative_path"] for model in package_object["models"] if "dedup" in model
+            ],
+        }
+        if files_to_upload:
+            # Journal every file before sending anything so an interrupted
+            # deployment can be finished with /deploy/resume_uploads
+            journals = [
+                open_upload_journal(
+                    presigned_url,
+                    build_requirements,
+                    models_by_path.get(presigned_url["file_path"], {}).get("content_encoding"),
+                    deployment_id,
+                    completion,
+                )
+                for presigned_url in files_to_upload
+            ]
+            progress.stage(
+                STAGE_UPLOAD,
+                f"Uploading {len(journals)} files",
+                bytes_total=sum(j.state["file_size"] for j in journals),
+            )
+            upload_journaled_files(headers, journals, job=job, progress=progress)
+
+        check_cancelled(job)
+        print("Package Saved")
+        progress.stage(STAGE_BUILD, "Triggering package build")
+        trigger_package_build(headers, build_requirements)
+        record_deployment(completion)
+        progress.stage(STAGE_DONE, "Deployment complete")
+
+        return {
+            "status": "success",
+            "package_object": package_object,
+            "delta": delta,
+            "uploaded_files": len(files_to_upload) + len(chunked_uploads),
+            "message": response_data.get("message", "Deployment successful"),
+        }
+    except UploadError as e:
+        return {
+            "status": "error",
+            "status_code": 502,
+            "resumable": True,
+            "deployment_id": deployment_id,
+            "message": f"{e}. Completed parts were saved; retry with /deploy/resume_uploads.",
+        }
+    except JobCancelled:
+        raise
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        return {
+            "status": "error",
+            "status_code": 500,
+            "message": f"An unexpected error occurred: {str(e)}",
+        }
+
+
+@PromptServer.instance.routes.post("/deploy/generate_requirements")
+async def generate_requirements(request):
+    data = await request.json()
+    missing = [
+        key
+        for key in ("workflow", "product_name", "secret_key", "user_id")
+        if key not in data
+    ]
+    if missing:
+        return web.json_response(
+            {"status": "error", "message": f"Missing fields: {', '.join(missing)}"},
+            status=400,
         )
-        build_response_data = build_response.json()
-        print(f"Build Response: {build_response_data}")
 
+    # The deployment does blocking I/O (hashing, git, uploads), so it runs as a
+    # background job and the frontend polls /deploy/jobs/{job_id}
+    job = job_manager.submit(
+        "deploy", lambda job: run_deployment(data, job), description=data["product_name"]
+    )
+    return web.json_response({"status": "queued", "job_id": job.id}, status=202)
+
+
+def record_deployment(completion):
+    """Save what a built deployment stored, for the next deployment to diff against."""
+    manifest = dict(completion["manifest"], deployed_at=time.time())
+    deploy_manifests.save(completion["product_name"], manifest)
+    if completion["chunked_paths"]:
+        for relative_path in completion["chunked_paths"]:
+            chunk_index.add_known(get_file_chunks(os.path.join(base_dir, relative_path)))
+        chunk_index.save()
+
+
+def run_resume_uploads(data, job=None):
+    """Finish an interrupted deployment by sending only its missing parts."""
+    return run_tracked(
+        "resume_uploads", job, lambda progress: _run_resume_uploads(data, job, progress)
+    )
+
+
+def _run_resume_uploads(data, job, progress):
+    headers = get_api_headers(data)
+
+    deployment_id = data["deployment_id"]
+    journals = UploadJournal.list_journals(UPLOAD_JOURNAL_DIR, deployment_id)
+    if not journals:
+        return {
+            "status": "error",
+            "message": "Nothing left to resume for this deployment; its uploads "
+            "finished, expired or were replaced by a newer deployment. Deploy again.",
+            "resumed": [],
+            "failed": [],
+        }
+
+    deployments = {}
+    for journal in journals:
+        deployment = journal.state.get("deployment") or {}
+        deployment_key = (
+            deployment.get("product_id"),
+            deployment.get("version"),
+            deployment.get("current_time"),
+        )
+        deployments.setdefault(deployment_key, (deployment, []))[1].append(journal)
+
+    resumed, failed = [], []
+    for deployment, deployment_journals in deployments.values():
+        try:
+            progress.stage(
+                STAGE_UPLOAD, f"Resuming upload of {deployment.get('workflow_name')}"
+            )
+            upload_journaled_files(headers, deployment_journals, job=job, progress=progress)
+            if deployment:
+                progress.stage(STAGE_BUILD, "Triggering package build")
+                trigger_package_build(headers, deployment)
+                completion = deployment_journals[0].state.get("completion")
+                if completion:
+                    record_deployment(completion)
+            resumed.append(deployment.get("workflow_name"))
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"Error resuming deployment {deployment.get('workflow_name')}: {e}")
+            failed.append({"workflow_name": deployment.get("workflow_name"), "error": str(e)})
+
+    return {
+        "status": "error" if failed else "success",
+        "message": "; ".join(f["error"] for f in failed) if failed else "Uploads resumed",
+        "resumed": resumed,
+        "failed": failed,
+    }
+
+
+@PromptServer.instance.routes.post("/deploy/resume_uploads")
+async def resume_uploads(request):
+    data = await request.json()
+    if not data.get("deployment_id"):
         return web.json_response(
-            {
-                "status": "success",
-                "package_object": package_object,
-                "message": response_data.get("message", "Deployment successful"),
-            }
+            {"status": "error", "message": "Missing fields: deployment_id"}, status=400
         )
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+    job = job_manager.submit("resume_uploads", lambda job: run_resume_uploads(data, job))
+    return web.json_response({"status": "queued", "job_id": job.id}, status=202)
+
+
+def get_export_root():
+    """Export directories are resolved against, and kept inside, ComfyUI's output directory."""
+    try:
+        import folder_paths
+    except ImportError:
+        return os.path.join(base_dir, "output")
+    return folder_paths.get_output_directory()
+
+
+def plan_export(data, job, progress):
+    """Build the package and list the (source path, arcname) files an export holds."""
+    # Exports hold the model files as they are
+    manifest = build_package(dict(data, compress=False), job, progress)
+    manifest["exported_at"] = time.time()
+    files = []
+    used = set()
+    for model in manifest["package"]["models"]:
+        arcname = export_arcname(model["relative_path"], model["file_name"])
+        if arcname in used:
+            # Two files outside ComfyUI with the same name
+            arcname = f"models/external/{model['model_hash'][:12]}/{model['file_name']}"
+        used.add(arcname)
+        model["export_path"] = arcname
+        files.append((os.path.abspath(os.path.join(base_dir, model["relative_path"])), arcname))
+    return manifest, files
+
+
+def run_export(data, job=None):
+    """Write a deploy package to a local directory, or prepare it for a tar download.
+
+    The manifest is what /package would have been sent; model files are
+    reflinked, hardlinked or kernel-copied next to it (see export.place_file).
+    """
+    return run_tracked(
+        "export",
+        job,
+        lambda progress: _run_export(data, job, progress),
+        product_name=data.get("product_name"),
+    )
+
+
+def _run_export(data, job, progress):
+    output_dir = None
+    if data.get("format") != "tar":
+        try:
+            output_dir = resolve_output_dir(
+                get_export_root(), data.get("output_dir") or safe_export_name(data["product_name"])
+            )
+        except ExportError as e:
+            return {"status": "error", "status_code": 400, "message": str(e)}
+    manifest, files = plan_export(data, job, progress)
+    check_cancelled(job)
+
+    if data.get("format") == "tar":
+        plan = TarPlan(manifest, files)
+        progress.stage(STAGE_DONE, "Export ready for download")
+        return {
+            "status": "success",
+            "format": "tar",
+            "download_url": f"/deploy/exports/{job.id}.tar",
+            "size": plan.size,
+            "manifest": manifest,
+            "files": files,
+        }
+
+    progress.stage(STAGE_EXPORT, f"Exporting {len(files)} model files to {output_dir}")
+
+    def on_file_done(src, method):
+        print(f"Exported {src} ({method})")
+        check_cancelled(job)
+
+    try:
+        methods = export_to_directory(
+            output_dir, manifest, files, data.get("link_mode", LINK_AUTO), on_file_done
+        )
+    except ExportError as e:
+        return {"status": "error", "status_code": 500, "message": str(e)}
+    progress.stage(STAGE_DONE, "Export complete")
+    return {
+        "status": "success",
+        "format": "directory",
+        "output_dir": os.path.abspath(output_dir),
+        "manifest_path": os.path.join(os.path.abspath(output_dir), "manifest.json"),
+        "files": len(files),
+        "methods": methods,
+        "message": f"Exported {len(files)} model files to {output_dir}",
+    }
+
+
+def workflow_request(workflow, product_name, **extra):
+    """Build a deploy request for a prompt-format workflow, as the frontend would.
+
+    Model files are found with the same index the HTTP routes use, and
+    object_info comes from ComfyUI's node registry.
+    """
+    model_names = find_model_filenames(workflow)
+    resolved = resolve_model_filepaths(model_names)
+    data = {
+        "workflow": workflow,
+        "product_name": product_name,
+        "additional_model_paths": [
+            path for path in resolved.values() if path and os.path.isfile(path)
+        ],
+        "workflow_original_model_names": model_names,
+    }
+    data.update(extra)
+    return data
+
+
+def generate_workflow_requirements(workflow, product_name="workflow"):
+    """Build the deployment requirements for a workflow in-process, without deploying.
+
+    Used by the GeneratePackageRequirements node; hashes and git info land
+    in the same caches a later deployment reads.
+    """
+    return build_package(
+        workflow_request(workflow, product_name), None, make_progress_reporter()
+    )
+
+
+def export_workflow(workflow, product_name, output_dir, link_mode=LINK_AUTO):
+    """Export a prompt-format workflow and the models it uses; used by the export node."""
+    return run_export(
+        workflow_request(workflow, product_name, output_dir=output_dir, link_mode=link_mode)
+    )
+
+
+@PromptServer.instance.routes.post("/deploy/export")
+async def export_package(request):
+    data = await request.json()
+    missing = [key for key in ("workflow", "product_name") if key not in data]
+    if missing:
         return web.json_response(
-            {
-                "status": "error",
-                "status_code": 500,
-                "message": f"An unexpected error occurred: {str(e)}",
-            },
-            status=500,
+            {"status": "error", "message": f"Missing fields: {', '.join(missing)}"},
+            status=400,
+        )
+    if data.get("format", "directory") not in ("directory", "tar"):
+        return web.json_response(
+            {"status": "error", "message": "format must be 'directory' or 'tar'"}, status=400
+        )
+    if data.get("link_mode", LINK_AUTO) not in LINK_MODES:
+        return web.json_response(
+            {"status": "error", "message": f"link_mode must be one of {', '.join(LINK_MODES)}"},
+            status=400,
+        )
+    if data.get("format") != "tar" and data.get("output_dir") is not None:
+        try:
+            resolve_output_dir(get_export_root(), str(data["output_dir"]))
+        except ExportError as e:
+            return web.json_response({"status": "error", "message": str(e)}, status=400)
+
+    job = job_manager.submit(
+        "export", lambda job: run_export(data, job), description=data["product_name"]
+    )
+    return web.json_response({"status": "queued", "job_id": job.id}, status=202)
+
+
+@PromptServer.instance.routes.get("/deploy/exports/{job_id}.tar")
+async def download_export(request):
+    job = job_manager.get(request.match_info["job_id"])
+    result = job.result if job is not None else None
+    if job is None or job.status != SUCCEEDED or (result or {}).get("format") != "tar":
+        return web.json_response(
+            {"status": "error", "message": "No finished tar export for this job"}, status=404
         )
+
+    manifest = result["manifest"]
+    name = safe_export_name(f"{manifest['workflow_name']}-{manifest['version']}")
+    try:
+        plan = TarPlan(manifest, result["files"], root=name)
+    except OSError as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=410)
+
+    # A fixed Content-Length keeps the body unchunked, so file data can go
+    # straight from the page cache to the socket with sendfile
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "application/x-tar",
+            "Content-Disposition": f'attachment; filename="{name}.tar"',
+        }
+    )
+    response.content_length = plan.size
+    await response.prepare(request)
+    loop = asyncio.get_running_loop()
+
+    async def sendfile(f, count):
+        # Falls back to read/write by itself on transports without sendfile (TLS)
+        await loop.sendfile(request.transport, f, 0, count)
+
+    try:
+        await plan.stream(response.write, sendfile)
+    except (ExportError, ConnectionError) as e:
+        print(f"Tar export of {name} aborted: {e}")
+        # The body is shorter than Content-Length, so the client sees a failed download
+        if request.transport is not None:
+            request.transport.close()
+        return response
+    await response.write_eof()
+    return response
+
+
+@PromptServer.instance.routes.get("/deploy/jobs")
+async def list_jobs(request):
+    return web.json_response({"jobs": [job.to_dict() for job in job_manager.list()]})
+
+
+@PromptServer.instance.routes.get("/deploy/jobs/{job_id}")
+async def get_job(request):
+    job = job_manager.get(request.match_info["job_id"])
+    if job is None:
+        return web.json_response(
+            {"status": "error", "message": "Job not found"}, status=404
+        )
+    return web.json_response(job.to_dict())
+
+
+@PromptServer.instance.routes.post("/deploy/jobs/{job_id}/cancel")
+async def cancel_job(request):
+    job = job_manager.cancel(request.match_info["job_id"])
+    if job is None:
+        return web.json_response(
+            {"status": "error", "message": "Job not found"}, status=404
+        )
+    return web.json_response(job.to_dict())
+
+
+@PromptServer.instance.routes.get("/deploy/metrics")
+async def get_metrics(request):
+    counts = {}
+    for job in job_manager.list():
+        counts[job.status] = counts.get(job.status, 0) + 1
+    for status in (QUEUED, RUNNING) + FINISHED_STATES:
+        JOBS.set(counts.get(status, 0), status=status)
+    prehash_status = prehash_worker.status()
+    PREHASH_RUNNING.set(int(prehash_status["running"]))
+    PREHASH_PAUSED.set(int(prehash_status["paused"]))
+    PREHASH_PENDING.set(prehash_status["pending"])
+    return web.Response(
+        body=metrics.render().encode("utf-8"),
+        headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+    )
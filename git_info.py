@@ -0,0 +1,463 @@
+import os
+import re
+import struct
+import subprocess
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+
+SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+DEFAULT_ABBREV = 7
+
+# Pack object types, see gitformat-pack(5)
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+OBJ_TYPE_NAMES = {1: "commit", 2: "tree", 3: "blob", OBJ_TAG: "tag"}
+
+
+class UnsupportedRepoLayout(Exception):
+    """The repository can't be read directly and needs the git CLI."""
+
+
+# Everything reading a repository directly can raise when it is unusual or
+# corrupt (IndexError/struct.error: truncated pack or index files)
+READ_ERRORS = (UnsupportedRepoLayout, OSError, ValueError, IndexError, struct.error, zlib.error)
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def find_git_dir(repo_path):
+    """Return the .git directory of a work tree, following `gitdir:` files."""
+    dot_git = os.path.join(repo_path, ".git")
+    if os.path.isdir(dot_git):
+        git_dir = dot_git
+    elif os.path.isfile(dot_git):
+        content = _read_text(dot_git).strip()
+        if not content.startswith("gitdir:"):
+            raise UnsupportedRepoLayout(f"Unrecognised .git file in {repo_path}")
+        git_dir = content[len("gitdir:"):].strip()
+        if not os.path.isabs(git_dir):
+            git_dir = os.path.normpath(os.path.join(repo_path, git_dir))
+    else:
+        raise UnsupportedRepoLayout(f"The path '{repo_path}' is not a git repository")
+    if os.path.exists(os.path.join(git_dir, "commondir")):
+        # Linked worktrees split refs between two directories
+        raise UnsupportedRepoLayout(f"{repo_path} is a linked worktree")
+    return git_dir
+
+
+def parse_git_config(text) -> Dict[Tuple[str, Optional[str]], Dict[str, List[str]]]:
+    """Parse git config into {(section, subsection): {key: [values]}}."""
+    sections: Dict[Tuple[str, Optional[str]], Dict[str, List[str]]] = {}
+    current = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            header = line[1 : line.index("]")]
+            match = re.match(r'^([^\s"]+)\s+"(.*)"$', header)
+            if match:
+                current = (match.group(1).lower(), match.group(2))
+            elif "." in header:
+                # Deprecated [section.subsection] syntax
+                section, subsection = header.split(".", 1)
+                current = (section.lower(), subsection.lower())
+            else:
+                current = (header.lower(), None)
+            sections.setdefault(current, {})
+            line = line[line.index("]") + 1 :].strip()
+            if not line:
+                continue
+        if current is None:
+            continue
+        key, _, value = line.partition("=")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+            value = value[1:-1]
+        sections[current].setdefault(key.strip().lower(), []).append(value)
+    return sections
+
+
+def normalize_remote_url(remote_url):
+    # Convert SSH URL to HTTPS URL if needed
+    if remote_url.startswith("git@github.com:"):
+        remote_url = remote_url.replace(":", "/")
+        remote_url = remote_url.replace("git@", "https://")
+    return remote_url
+
+
+class _PackIndex:
+    """Minimal reader for version 2 pack .idx files."""
+
+    def __init__(self, idx_path):
+        with open(idx_path, "rb") as f:
+            data = f.read()
+        if data[:4] != b"\xfftOc" or struct.unpack(">I", data[4:8])[0] != 2:
+            raise UnsupportedRepoLayout(f"Unsupported pack index {idx_path}")
+        self.data = data
+        self.fanout = struct.unpack(">256I", data[8 : 8 + 1024])
+        self.count = self.fanout[255]
+        self.sha_start = 8 + 1024
+        self.offset_start = self.sha_start + 20 * self.count + 4 * self.count
+        self.large_offset_start = self.offset_start + 4 * self.count
+        self.pack_path = idx_path[: -len(".idx")] + ".pack"
+
+    def find(self, sha) -> Optional[int]:
+        raw = bytes.fromhex(sha)
+        lo = self.fanout[raw[0] - 1] if raw[0] else 0
+        hi = self.fanout[raw[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.sha_start + 20 * mid
+            candidate = self.data[start : start + 20]
+            if candidate < raw:
+                lo = mid + 1
+            elif candidate > raw:
+                hi = mid
+            else:
+                pos = self.offset_start + 4 * mid
+                offset = struct.unpack(">I", self.data[pos : pos + 4])[0]
+                if offset & 0x80000000:
+                    pos = self.large_offset_start + 8 * (offset & 0x7FFFFFFF)
+                    offset = struct.unpack(">Q", self.data[pos : pos + 8])[0]
+                return offset
+        return None
+
+
+class GitInfoReader:
+    """Reads HEAD, refs, tags and the origin URL straight from .git.
+
+    Results are cached per repository and reused for as long as the mtimes
+    of HEAD, the checked-out ref, packed-refs, refs/tags and config are
+    unchanged. Repositories this reader can't handle (linked worktrees,
+    missing refs, tags stored as deltas, truncated packs, ...) fall back
+    to the git CLI; on_cli_fallback(repo_path) is called each time that
+    happens.
+    """
+
+    def __init__(self, on_cli_fallback=None):
+        self.on_cli_fallback = on_cli_fallback
+        self._cache: Dict[str, Tuple[tuple, dict]] = {}
+        self._tags_cache: Dict[str, Tuple[tuple, List[str]]] = {}
+        self._pack_indexes: Dict[tuple, _PackIndex] = {}
+        self._lock = threading.Lock()
+
+    # -- refs ------------------------------------------------------------
+
+    @staticmethod
+    def _packed_refs(git_dir) -> Tuple[Dict[str, str], Dict[str, str], bool]:
+        """Return ({ref: sha}, {ref: peeled sha}, fully_peeled) from packed-refs.
+
+        fully_peeled means every annotated tag has a peeled entry.
+        """
+        refs, peeled, fully_peeled = {}, {}, False
+        path = os.path.join(git_dir, "packed-refs")
+        if not os.path.isfile(path):
+            return refs, peeled, True
+        last_ref = None
+        for line in _read_text(path).splitlines():
+            if line.startswith("# pack-refs with:"):
+                fully_peeled = "fully-peeled" in line.split()
+                continue
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("^"):
+                if last_ref:
+                    peeled[last_ref] = line[1:].strip()
+                continue
+            sha, _, ref = line.partition(" ")
+            refs[ref.strip()] = sha
+            last_ref = ref.strip()
+        return refs, peeled, fully_peeled
+
+    def _resolve_head(self, git_dir, packed):
+        head = _read_text(os.path.join(git_dir, "HEAD")).strip()
+        ref = None
+        for _ in range(5):
+            if not head.startswith("ref:"):
+                break
+            ref = head[len("ref:"):].strip()
+            loose = os.path.join(git_dir, *ref.split("/"))
+            if os.path.isfile(loose):
+                head = _read_text(loose).strip()
+            elif ref in packed:
+                head = packed[ref]
+            else:
+                raise UnsupportedRepoLayout(f"Can't resolve {ref}")
+        if not SHA_RE.match(head):
+            raise UnsupportedRepoLayout(f"Unexpected HEAD contents: {head}")
+        return head, ref
+
+    def _loose_tags(self, git_dir) -> Dict[str, str]:
+        tags = {}
+        tags_dir = os.path.join(git_dir, "refs", "tags")
+        for root, _, files in os.walk(tags_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, tags_dir).replace(os.sep, "/")
+                tags[name] = _read_text(path).strip()
+        return tags
+
+    def _tags_at(self, git_dir, commit_sha, packed, peeled, fully_peeled) -> List[str]:
+        """Return the names of all tags that point (after peeling) at commit_sha,
+        sorted like `git tag --points-at`."""
+        tags = []
+        loose_tags = self._loose_tags(git_dir)
+        for ref, sha in packed.items():
+            if ref.startswith("refs/tags/"):
+                name = ref[len("refs/tags/"):]
+                if name in loose_tags:
+                    continue
+                if ref in peeled or fully_peeled:
+                    target = peeled.get(ref, sha)
+                else:
+                    target = sha if sha == commit_sha else self._peel(git_dir, sha)
+                if target == commit_sha:
+                    tags.append(name)
+        for name, sha in loose_tags.items():
+            if sha == commit_sha or self._peel(git_dir, sha) == commit_sha:
+                tags.append(name)
+        return sorted(tags)
+
+    # -- objects ---------------------------------------------------------
+
+    def _pack_index(self, idx_path):
+        key = (idx_path, _mtime_ns(idx_path))
+        with self._lock:
+            index = self._pack_indexes.get(key)
+        if index is None:
+            index = _PackIndex(idx_path)
+            with self._lock:
+                self._pack_indexes[key] = index
+        return index
+
+    def _read_object(self, git_dir, sha) -> Tuple[str, bytes]:
+        """Return (type, body) of an object that is loose or stored whole in a pack."""
+        loose = os.path.join(git_dir, "objects", sha[:2], sha[2:])
+        if os.path.isfile(loose):
+            with open(loose, "rb") as f:
+                raw = zlib.decompress(f.read())
+            header, _, body = raw.partition(b"\0")
+            return header.split(b" ")[0].decode(), body
+
+        pack_dir = os.path.join(git_dir, "objects", "pack")
+        if os.path.isdir(pack_dir):
+            for name in os.listdir(pack_dir):
+                if not name.endswith(".idx"):
+                    continue
+                index = self._pack_index(os.path.join(pack_dir, name))
+                offset = index.find(sha)
+                if offset is None:
+                    continue
+                with open(index.pack_path, "rb") as f:
+                    f.seek(offset)
+                    byte = f.read(1)[0]
+                    obj_type = (byte >> 4) & 0x7
+                    while byte & 0x80:
+                        byte = f.read(1)[0]
+                    if obj_type in (OBJ_OFS_DELTA, OBJ_REF_DELTA):
+                        # e.g. an annotated tag after `git gc`; only the CLI can rebuild it
+                        raise UnsupportedRepoLayout(f"Object {sha} is stored as a delta")
+                    if obj_type != OBJ_TAG:
+                        return OBJ_TYPE_NAMES.get(obj_type, str(obj_type)), b""
+                    decompressor = zlib.decompressobj()
+                    body = b""
+                    while not decompressor.eof:
+                        chunk = f.read(4096)
+                        if not chunk:
+                            raise UnsupportedRepoLayout(f"{index.pack_path} is truncated")
+                        body += decompressor.decompress(chunk)
+                    return "tag", body
+        raise UnsupportedRepoLayout(f"Object {sha} not found as a whole object")
+
+    def _peel(self, git_dir, sha):
+        """Follow annotated tags down to the object they point at."""
+        for _ in range(10):
+            obj_type, body = self._read_object(git_dir, sha)
+            if obj_type != "tag":
+                return sha
+            first_line = body.split(b"\n", 1)[0].decode()
+            if not first_line.startswith("object "):
+                raise UnsupportedRepoLayout(f"Malformed tag object {sha}")
+            sha = first_line[len("object "):].strip()
+        return sha
+
+    # -- public API ------------------------------------------------------
+
+    def _cache_key(self, git_dir, head_ref):
+        paths = [
+            os.path.join(git_dir, "HEAD"),
+            os.path.join(git_dir, "packed-refs"),
+            os.path.join(git_dir, "config"),
+            os.path.join(git_dir, "refs", "tags"),
+        ]
+        if head_ref:
+            paths.append(os.path.join(git_dir, *head_ref.split("/")))
+        return tuple(_mtime_ns(path) for path in paths)
+
+    def _read(self, repo_path, git_dir):
+        packed, peeled, fully_peeled = self._packed_refs(git_dir)
+        commit_sha, head_ref = self._resolve_head(git_dir, packed)
+
+        config = parse_git_config(_read_text(os.path.join(git_dir, "config")))
+        origin = config.get(("remote", "origin"), {})
+        if not origin.get("url"):
+            raise UnsupportedRepoLayout(f"No origin remote in {repo_path}")
+        remote_url = normalize_remote_url(origin["url"][-1])
+
+        abbrev = DEFAULT_ABBREV
+        core_abbrev = config.get(("core", None), {}).get("abbrev")
+        if core_abbrev and core_abbrev[-1].isdigit():
+            abbrev = max(4, int(core_abbrev[-1]))
+
+        tags = self._tags_at(git_dir, commit_sha, packed, peeled, fully_peeled)
+
+        return {
+            "remote_url": remote_url,
+            "commit_sha": commit_sha,
+            "short_sha": commit_sha[:abbrev],
+            "version": tags[0] if tags else None,
+            "tags": tags,
+        }
+
+    def _cached(self, cache, repo_path, read_fn):
+        """read_fn(repo_path, git_dir), reused from cache while the repo's mtimes match."""
+        git_dir = find_git_dir(repo_path)
+        head_ref = None
+        head = _read_text(os.path.join(git_dir, "HEAD")).strip()
+        if head.startswith("ref:"):
+            head_ref = head[len("ref:"):].strip()
+        key = self._cache_key(git_dir, head_ref)
+        cache_id = os.path.abspath(repo_path)
+        with self._lock:
+            cached = cache.get(cache_id)
+        if cached and cached[0] == key:
+            return cached[1]
+        value = read_fn(repo_path, git_dir)
+        with self._lock:
+            cache[cache_id] = (key, value)
+        return value
+
+    def read(self, repo_path):
+        """Return git info for one repository, or raise UnsupportedRepoLayout."""
+        return dict(self._cached(self._cache, repo_path, self._read))
+
+    def read_many(self, repo_paths) -> Dict[str, dict]:
+        """Return git info for every repository, using the git CLI only where needed."""
+        results = {}
+        for repo_path in repo_paths:
+            try:
+                info = self.read(repo_path)
+                info.pop("tags", None)
+                results[repo_path] = info
+            except READ_ERRORS as e:
+                print(f"Reading git info for {repo_path} with the git CLI: {e}")
+                if self.on_cli_fallback:
+                    self.on_cli_fallback(repo_path)
+                results[repo_path] = get_git_version_info_cli(repo_path)
+        return results
+
+    def tags_at_head(self, repo_path) -> List[str]:
+        try:
+            return self.read_tags(repo_path)
+        except READ_ERRORS:
+            if self.on_cli_fallback:
+                self.on_cli_fallback(repo_path)
+            try:
+                result = subprocess.run(
+                    ["git", "tag", "--points-at", "HEAD"],
+                    cwd=repo_path,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"Could not read the tags of {repo_path}: {e}")
+                return []
+            return result.stdout.strip().split("\n") if result.stdout.strip() else []
+
+    def read_tags(self, repo_path) -> List[str]:
+        """Return the tags pointing at HEAD; unlike read() no origin is needed."""
+        return list(self._cached(self._tags_cache, repo_path, self._read_tags))
+
+    def _read_tags(self, repo_path, git_dir):
+        packed, peeled, fully_peeled = self._packed_refs(git_dir)
+        commit_sha, _ = self._resolve_head(git_dir, packed)
+        return self._tags_at(git_dir, commit_sha, packed, peeled, fully_peeled)
+
+
+def get_git_version_info_cli(repo_path):
+    """Read git info by running the git CLI; used for layouts GitInfoReader can't read."""
+    if not os.path.exists(repo_path):
+        print("error", f"The path '{repo_path}' does not exist")
+
+    # Check if it's a git repository by looking for .git directory
+    if not os.path.exists(os.path.join(repo_path, ".git")):
+        print("error", f"The path '{repo_path}' is not a git repository")
+
+    try:
+        # Get remote URL
+        result = subprocess.run(
+            ["git", "config", "--get", "remote.origin.url"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        remote_url = normalize_remote_url(result.stdout.strip())
+
+        # Get commit SHA
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        commit_sha = result.stdout.strip()
+
+        # Get short SHA
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        short_sha = result.stdout.strip()
+
+        # Get version from tags
+        result = subprocess.run(
+            ["git", "tag", "--points-at", "HEAD"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        tags = result.stdout.strip().split("\n") if result.stdout.strip() else []
+        version = tags[0] if tags and tags[0] != "" else None
+
+        return {
+            "remote_url": remote_url,
+            "commit_sha": commit_sha,
+            "short_sha": short_sha,
+            "version": version,
+        }
+
+    except subprocess.CalledProcessError as e:
+        return {"error": f"Git command failed: {e.stderr.strip()}"}
+    except Exception as e:
+        return {"error": f"An error occurred: {str(e)}"}
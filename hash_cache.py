@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def file_identity(path):
+    """Return the (st_dev, st_ino, st_size, st_mtime_ns) tuple identifying a file's contents."""
+    st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def group_by_inode(paths) -> "OrderedDict[str, list]":
+    """Group paths that are the same file on disk through symlinks or hardlinks.
+
+    Returns {canonical path: [its other paths]}, in the order the groups
+    first appear in paths. The canonical path is the first one that isn't
+    a symlink, or the first one if they all are. Paths that can't be
+    stat'ed are kept on their own.
+    """
+    groups: "OrderedDict[tuple, list]" = OrderedDict()
+    for path in paths:
+        try:
+            st = os.stat(path)
+            key = (st.st_dev, st.st_ino)
+        except OSError:
+            key = ("path", path)
+        groups.setdefault(key, []).append(path)
+    result = OrderedDict()
+    for group in groups.values():
+        canonical = next((p for p in group if not os.path.islink(p)), group[0])
+        result[canonical] = [p for p in group if p != canonical]
+    return result
+
+
+class HashCache:
+    """On-disk cache of file hashes keyed by file identity.
+
+    Entries are keyed by (device, inode, algorithm) and remember the size and
+    mtime the hash was computed for, so any change to the file invalidates its
+    entry. The least recently used entries are evicted once max_entries is
+    exceeded. Changes are kept in memory until flush(), so a batch of files
+    is written out once.
+    """
+
+    def __init__(self, cache_path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def _key(dev, ino, algo):
+        return f"{dev}:{ino}:{algo}"
+
+    def _load(self):
+        self._loaded = True
+        if not self.cache_path or not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable hash cache {self.cache_path}: {e}")
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        entries = sorted(data.get("entries", {}).items(), key=lambda kv: kv[1]["last_used"])
+        self._entries = OrderedDict(entries)
+
+    def flush(self):
+        """Write the cache to disk if anything changed since the last flush."""
+        if not self.cache_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        # Serialized outside the lock so lookups don't wait on the write
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": CACHE_VERSION, "entries": entries}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save hash cache to {self.cache_path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def get(self, identity, algo):
+        """Return the cached hash for a file identity, or None on a miss."""
+        dev, ino, size, mtime_ns = identity
+        key = self._key(dev, ino, algo)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+                # The file changed since it was hashed
+                del self._entries[key]
+                self._dirty = True
+                return None
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(key)
+            return entry["hash"]
+
+    def put(self, identity, algo, digest, path=None):
+        """Record the hash of a file identity, evicting the oldest entries if full."""
+        dev, ino, size, mtime_ns = identity
+        key = self._key(dev, ino, algo)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries[key] = {
+                "hash": digest,
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "path": path,
+                "last_used": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
@@ -0,0 +1,52 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Union
+
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+DEFAULT_WORKERS = 4
+
+
+def hash_file(path, algo="sha256", buffer_size=DEFAULT_BUFFER_SIZE, on_progress=None):
+    """Hash a file by reading it into a single reused buffer.
+
+    on_progress, if given, is called with the number of bytes read after
+    every buffer.
+    """
+    h = hashlib.new(algo)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+            if on_progress:
+                on_progress(n)
+    return h.hexdigest()
+
+
+def hash_files(
+    paths: List[str],
+    workers=DEFAULT_WORKERS,
+    hash_fn: Callable[[str], str] = hash_file,
+) -> Dict[str, Union[str, Exception]]:
+    """Hash several files concurrently.
+
+    hashlib releases the GIL while digesting large buffers, so a thread pool
+    keeps several files in flight. Returns a dict mapping each path to its
+    digest, or to the exception raised while hashing it.
+    """
+    results: Dict[str, Union[str, Exception]] = {}
+    if not paths:
+        return results
+    workers = max(1, min(workers, len(paths)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deploy-hash") as pool:
+        futures = {path: pool.submit(hash_fn, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+    return results
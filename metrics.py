@@ -0,0 +1,236 @@
+import asyncio
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+EVENT_LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra=None) -> str:
+    pairs = list(labels) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    type_name = "untyped"
+
+    def __init__(self, name, help_text, lock):
+        self.name = name
+        self.help = help_text
+        self._lock = lock
+        self._values: Dict[tuple, object] = {}
+
+    @staticmethod
+    def _key(labels) -> tuple:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Counter(_Family):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Family):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Family):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, lock, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, lock)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, labels, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["buckets"]):
+            cumulative += count
+            le = _format_labels(labels, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """A small registry of counters, gauges and histograms.
+
+    Thread-safe; render() produces the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, family):
+        with self._lock:
+            existing = self._families.get(family.name)
+            if existing is not None:
+                return existing
+            self._families[family.name] = family
+            return family
+
+    def counter(self, name, help_text) -> Counter:
+        return self._register(Counter(name, help_text, threading.Lock()))
+
+    def gauge(self, name, help_text) -> Gauge:
+        return self._register(Gauge(name, help_text, threading.Lock()))
+
+    def histogram(self, name, help_text, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, threading.Lock(), buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Accumulates the time a deployment spends in each stage.
+
+    enter(stage) closes the current stage and starts the next one; a stage
+    that is entered more than once accumulates. close() observes one total
+    per stage on the histogram and calls on_stage_end(stage, seconds) each
+    time a stage is left.
+    """
+
+    def __init__(
+        self,
+        histogram: Histogram,
+        on_stage_end: Optional[Callable[[str, float], None]] = None,
+    ):
+        self.histogram = histogram
+        self.on_stage_end = on_stage_end
+        self.totals: Dict[str, float] = {}
+        self._stage = None
+        self._started = None
+        self._lock = threading.Lock()
+
+    def _leave(self, now):
+        if self._stage is None:
+            return None
+        seconds = now - self._started
+        self.totals[self._stage] = self.totals.get(self._stage, 0.0) + seconds
+        return self._stage, seconds
+
+    def enter(self, stage):
+        now = time.perf_counter()
+        with self._lock:
+            left = self._leave(now)
+            self._stage, self._started = stage, now
+        if left and self.on_stage_end:
+            self.on_stage_end(*left)
+
+    def close(self):
+        with self._lock:
+            left = self._leave(time.perf_counter())
+            self._stage = None
+            totals = dict(self.totals)
+        if left and self.on_stage_end:
+            self.on_stage_end(*left)
+        for stage, seconds in totals.items():
+            self.histogram.observe(seconds, stage=stage)
+        return totals
+
+
+class EventLoopLagMonitor:
+    """Measures how late the event loop runs a callback scheduled every interval.
+
+    Lag well above a few milliseconds means something is blocking the loop
+    and every HTTP and websocket client of the server is waiting on it.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        histogram: Histogram,
+        gauge: Optional[Gauge] = None,
+        interval=0.5,
+    ):
+        self.loop = loop
+        self.histogram = histogram
+        self.gauge = gauge
+        self.interval = interval
+        self._expected = None
+        self._handle = None
+
+    def start(self):
+        # Safe before the loop runs and from other threads
+        self.loop.call_soon_threadsafe(self._schedule)
+
+    def stop(self):
+        if self._handle is not None:
+            self.loop.call_soon_threadsafe(self._handle.cancel)
+
+    def _schedule(self):
+        self._expected = self.loop.time() + self.interval
+        self._handle = self.loop.call_at(self._expected, self._tick)
+
+    def _tick(self):
+        lag = max(0.0, self.loop.time() - self._expected)
+        self.histogram.observe(lag)
+        if self.gauge is not None:
+            self.gauge.set(lag)
+        self._schedule()
@@ -0,0 +1,397 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+
+INDEX_VERSION = 2
+# Directories that never hold models but can hold many small files
+SKIPPED_DIRS = frozenset({".git", ".hg", ".svn", "__pycache__", ".ipynb_checkpoints"})
+# Changes are persisted at most this often; a listing that wasn't saved is
+# just listed again on the next startup
+DEFAULT_SAVE_INTERVAL = 60.0
+# Past this share of indexed files changing, rebuilding the maps is cheaper
+REBUILD_FRACTION = 0.25
+
+
+class ModelIndex:
+    """In-memory index of every file under a set of search directories.
+
+    The index maps relative paths, basenames and lowercased basenames to
+    absolute paths so lookups don't have to walk the tree, and keeps the
+    relative paths sorted for folder listings and prefix search. The directory
+    listing is persisted to disk and refreshed incrementally: a directory is
+    only re-listed when its mtime changes, otherwise only its subdirectories
+    are stat'ed, and the maps are only updated for the files that came or
+    went. VCS and cache directories are not indexed.
+    """
+
+    def __init__(self, search_dirs, cache_path=None, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.search_dirs = [os.path.abspath(d) for d in search_dirs]
+        self.cache_path = cache_path
+        self.save_interval = save_interval
+        # root -> relative dir ("" for the root itself) -> listing
+        self._dirs: Dict[str, Dict[str, dict]] = {root: {} for root in self.search_dirs}
+        self._by_relpath: Dict[Tuple[int, str], str] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._by_lower_name: Dict[str, List[str]] = {}
+        self._order: Dict[str, Tuple] = {}
+        # Sorted (root index, relative path) and (lowercased path, root index, path)
+        self._sorted: List[Tuple[int, str]] = []
+        self._sorted_lower: List[Tuple[str, int, str]] = []
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = False
+        self._last_save = 0.0
+        self._ready = threading.Event()
+
+    # -- persistence -----------------------------------------------------
+
+    def load(self):
+        """Load the persisted directory listing, if there is one."""
+        if not self.cache_path or not os.path.isfile(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable model index {self.cache_path}: {e}")
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        roots = data.get("roots", {})
+        with self._lock:
+            for root in self.search_dirs:
+                self._dirs[root] = roots.get(root, {})
+            self._rebuild_maps()
+        return True
+
+    def save(self):
+        """Persist the directory listing so the next startup only re-stats."""
+        if not self.cache_path:
+            return
+        with self._lock:
+            data = json.dumps({"version": INDEX_VERSION, "roots": self._dirs})
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save model index to {self.cache_path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def flush(self):
+        """Save the listing if it changed since the last save."""
+        if self._dirty:
+            self.save()
+
+    # -- scanning --------------------------------------------------------
+
+    def _list_dir(self, abs_dir):
+        """List a directory the way os.walk would split it into files and dirs."""
+        files, subdirs = [], []
+        try:
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry.name)
+                    elif entry.name in SKIPPED_DIRS:
+                        continue
+                    elif not entry.is_symlink():
+                        # os.walk doesn't follow directory symlinks by default
+                        subdirs.append(entry.name)
+        except OSError:
+            return None
+        return {"files": files, "subdirs": subdirs}
+
+    def _refresh_dir(self, root_idx, root, rel_dir, listings, seen, changes):
+        """Re-list rel_dir and its subdirectories where their mtime changed.
+
+        Appends (root index, rel_dir, old files, new files) to changes for
+        every directory whose files changed. Returns True if any listing did.
+        """
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            return False
+
+        changed = False
+        listing = listings.get(rel_dir)
+        if listing is None or listing.get("mtime_ns") != mtime_ns:
+            new_listing = self._list_dir(abs_dir)
+            if new_listing is None:
+                return False
+            new_listing["mtime_ns"] = mtime_ns
+            listings[rel_dir] = new_listing
+            old_files = listing["files"] if listing else []
+            if set(old_files) != set(new_listing["files"]):
+                changes.append((root_idx, rel_dir, old_files, new_listing["files"]))
+            listing = new_listing
+            changed = True
+
+        seen.add(rel_dir)
+        for subdir in listing["subdirs"]:
+            sub_rel = f"{rel_dir}/{subdir}" if rel_dir else subdir
+            changed = self._refresh_dir(root_idx, root, sub_rel, listings, seen, changes) or changed
+        return changed
+
+    def refresh(self):
+        """Bring the index up to date with the filesystem.
+
+        Returns True if anything changed since the last refresh.
+        """
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                self._loaded = True
+
+            changed = False
+            changes = []
+            for root_idx, root in enumerate(self.search_dirs):
+                listings = self._dirs.setdefault(root, {})
+                seen = set()
+                if os.path.isdir(root):
+                    changed = (
+                        self._refresh_dir(root_idx, root, "", listings, seen, changes) or changed
+                    )
+                for rel_dir in list(listings):
+                    if rel_dir not in seen:
+                        changes.append((root_idx, rel_dir, listings.pop(rel_dir)["files"], []))
+                        changed = True
+
+            if not self._by_relpath:
+                self._rebuild_maps()
+            elif changes:
+                self._update_maps(changes)
+            if changed:
+                self._dirty = True
+            if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+                self.save()
+            self._ready.set()
+            return changed
+
+    def _rebuild_maps(self):
+        by_relpath, by_name, by_lower_name, order = {}, {}, {}, {}
+        for root_idx, root in enumerate(self.search_dirs):
+            for rel_dir, listing in self._dirs.get(root, {}).items():
+                abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+                # Sorting by (root, path components) reproduces a top-down walk
+                dir_key = (root_idx, tuple(rel_dir.split("/")) if rel_dir else ())
+                for file in listing["files"]:
+                    abs_path = os.path.join(abs_dir, file)
+                    rel_path = f"{rel_dir}/{file}" if rel_dir else file
+                    by_relpath[(root_idx, rel_path)] = abs_path
+                    by_name.setdefault(file, []).append(abs_path)
+                    by_lower_name.setdefault(file.lower(), []).append(abs_path)
+                    order[abs_path] = dir_key
+        for paths in list(by_name.values()) + list(by_lower_name.values()):
+            paths.sort(key=lambda p: order[p])
+        self._by_relpath = by_relpath
+        self._by_name = by_name
+        self._by_lower_name = by_lower_name
+        self._order = order
+        self._sorted = sorted(by_relpath)
+        self._sorted_lower = sorted(
+            (rel_path.lower(), root_idx, rel_path) for root_idx, rel_path in by_relpath
+        )
+
+    def _update_maps(self, changes):
+        """Apply the files that came or went in changed directories to the maps."""
+        removed, added = [], []
+        # Case-insensitive names shared by several files of a changed directory,
+        # whose relative order follows that directory's listing
+        collisions = set()
+        for root_idx, rel_dir, old_files, new_files in changes:
+            old, new = set(old_files), set(new_files)
+            removed.extend((root_idx, rel_dir, f) for f in old_files if f not in new)
+            added.extend((root_idx, rel_dir, f) for f in new_files if f not in old)
+            lower_names = [f.lower() for f in new_files]
+            if len(set(lower_names)) < len(lower_names):
+                seen = set()
+                for name in lower_names:
+                    if name in seen:
+                        collisions.add((root_idx, rel_dir, name))
+                    seen.add(name)
+        if len(removed) + len(added) > len(self._sorted) * REBUILD_FRACTION:
+            self._rebuild_maps()
+            return
+
+        for root_idx, rel_dir, file in removed:
+            rel_path = f"{rel_dir}/{file}" if rel_dir else file
+            abs_path = self._by_relpath.pop((root_idx, rel_path), None)
+            if abs_path is None:
+                continue
+            del self._order[abs_path]
+            for names, name in ((self._by_name, file), (self._by_lower_name, file.lower())):
+                paths = names[name]
+                paths.remove(abs_path)
+                if not paths:
+                    del names[name]
+            del self._sorted[bisect_left(self._sorted, (root_idx, rel_path))]
+            del self._sorted_lower[
+                bisect_left(self._sorted_lower, (rel_path.lower(), root_idx, rel_path))
+            ]
+
+        for root_idx, rel_dir, file in added:
+            root = self.search_dirs[root_idx]
+            abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+            abs_path = os.path.join(abs_dir, file)
+            rel_path = f"{rel_dir}/{file}" if rel_dir else file
+            dir_key = (root_idx, tuple(rel_dir.split("/")) if rel_dir else ())
+            self._by_relpath[(root_idx, rel_path)] = abs_path
+            self._order[abs_path] = dir_key
+            self._insert_in_walk_order(self._by_name.setdefault(file, []), abs_path)
+            self._insert_in_walk_order(self._by_lower_name.setdefault(file.lower(), []), abs_path)
+            insort(self._sorted, (root_idx, rel_path))
+            insort(self._sorted_lower, (rel_path.lower(), root_idx, rel_path))
+
+        for root_idx, rel_dir, name in collisions:
+            dir_key = (root_idx, tuple(rel_dir.split("/")) if rel_dir else ())
+            self._sort_dir_run(self._by_lower_name[name], dir_key)
+
+    def _dir_run(self, paths, dir_key):
+        """The slice of paths (in walk order) that lies in the directory dir_key."""
+        keys = [self._order[p] for p in paths]
+        return bisect_left(keys, dir_key), bisect_right(keys, dir_key)
+
+    def _sort_dir_run(self, paths, dir_key):
+        """Order the paths in one directory the way it lists them, as _rebuild_maps does."""
+        lo, hi = self._dir_run(paths, dir_key)
+        if hi - lo > 1:
+            root_idx, parts = dir_key
+            files = self._dirs[self.search_dirs[root_idx]]["/".join(parts)]["files"]
+            paths[lo:hi] = sorted(paths[lo:hi], key=lambda p: files.index(os.path.basename(p)))
+
+    def _insert_in_walk_order(self, paths, abs_path):
+        dir_key = self._order[abs_path]
+        paths.insert(self._dir_run(paths, dir_key)[1], abs_path)
+        self._sort_dir_run(paths, dir_key)
+
+    def wait_ready(self):
+        """Make sure the index has been built at least once."""
+        if not self._ready.is_set():
+            self.refresh()
+
+    # -- lookups ---------------------------------------------------------
+
+    def _root_index(self, search_dir):
+        try:
+            return self.search_dirs.index(os.path.abspath(search_dir))
+        except ValueError:
+            return None
+
+    def covers(self, search_dirs):
+        """Whether every directory in search_dirs is indexed."""
+        return all(self._root_index(d) is not None for d in search_dirs)
+
+    def direct(self, search_dir, model_name) -> Optional[str]:
+        """Return the indexed file at search_dir/model_name, if any."""
+        self.wait_ready()
+        root_idx = self._root_index(search_dir)
+        if root_idx is None:
+            return None
+        rel_path = os.path.normpath(model_name.replace("\\", "/")).replace(os.sep, "/")
+        with self._lock:
+            abs_path = self._by_relpath.get((root_idx, rel_path))
+        if abs_path is None:
+            return None
+        # Return the path the way os.path.join would have spelled it
+        return os.path.join(search_dir, model_name)
+
+    def files_named(self, filename, search_dir=None, case_sensitive=True) -> List[str]:
+        """Return indexed files with the given basename, in top-down walk order."""
+        self.wait_ready()
+        with self._lock:
+            if case_sensitive:
+                paths = self._by_name.get(filename, [])
+            else:
+                paths = self._by_lower_name.get(filename.lower(), [])
+            if search_dir is None:
+                return list(paths)
+            root_idx = self._root_index(search_dir)
+            return [p for p in paths if self._order[p][0] == root_idx]
+
+    def first_in_walk_order(self, filename, search_dir) -> Optional[str]:
+        """Mimic a top-down walk of search_dir that stops at the first directory
+        holding filename, preferring an exact match over a case-insensitive one
+        within that directory."""
+        candidates = self.files_named(filename, search_dir, case_sensitive=False)
+        if not candidates:
+            return None
+        with self._lock:
+            first_dir = self._order[candidates[0]]
+            same_dir = [p for p in candidates if self._order[p] == first_dir]
+        for path in same_dir:
+            if os.path.basename(path) == filename:
+                return path
+        return same_dir[-1]
+
+    def files_under(self, abs_folder_path, extensions=None) -> List[str]:
+        """Return indexed files under abs_folder_path, or None if it isn't indexed."""
+        self.wait_ready()
+        abs_folder_path = os.path.abspath(abs_folder_path)
+        for root_idx, root in enumerate(self.search_dirs):
+            if abs_folder_path != root and not abs_folder_path.startswith(root + os.sep):
+                continue
+            rel_folder = os.path.relpath(abs_folder_path, root).replace(os.sep, "/")
+            rel_folder = "" if rel_folder == "." else rel_folder
+            prefix = rel_folder + "/" if rel_folder else ""
+            with self._lock:
+                if rel_folder not in self._dirs.get(root, {}):
+                    # e.g. a folder behind a directory symlink, which isn't indexed
+                    return None
+                # Everything under the folder is one contiguous run of the sorted paths
+                files = []
+                for i in range(bisect_left(self._sorted, (root_idx, prefix)), len(self._sorted)):
+                    idx, rel_path = self._sorted[i]
+                    if idx != root_idx or not rel_path.startswith(prefix):
+                        break
+                    if extensions is None or rel_path.lower().endswith(extensions):
+                        files.append(self._by_relpath[(idx, rel_path)])
+                return files
+        return None
+
+    def search(
+        self, query, extensions=None, offset=0, limit=50
+    ) -> Tuple[int, List[Tuple[str, str]]]:
+        """Case-insensitive search of indexed relative paths, one page at a time.
+
+        Paths starting with query come first (found by bisecting the sorted
+        paths), then paths containing it anywhere, each group in path order.
+        Returns the total number of matches and (absolute path, path
+        relative to its search directory) for matches offset..offset+limit.
+        """
+        self.wait_ready()
+        needle = query.replace("\\", "/").lower()
+        with self._lock:
+            entries = self._sorted_lower
+            start = bisect_left(entries, (needle,))
+            end = start
+            while end < len(entries) and entries[end][0].startswith(needle):
+                end += 1
+            prefixed = entries[start:end]
+            contained = [
+                e for i, e in enumerate(entries) if (i < start or i >= end) and needle in e[0]
+            ]
+            matches = [
+                e
+                for e in prefixed + contained
+                if extensions is None or e[0].endswith(extensions)
+            ]
+            page = [
+                (self._by_relpath[(root_idx, rel_path)], rel_path)
+                for _, root_idx, rel_path in matches[offset : offset + limit]
+            ]
+        return len(matches), page
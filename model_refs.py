@@ -0,0 +1,78 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def _combo_options(spec) -> Optional[list]:
+    """Return the options of a combo input spec, or None if it isn't a combo."""
+    if not isinstance(spec, (list, tuple)) or not spec:
+        return None
+    if isinstance(spec[0], (list, tuple)):
+        return list(spec[0])
+    # Newer ComfyUI versions describe combos as ["COMBO", {"options": [...]}]
+    if spec[0] == "COMBO" and len(spec) > 1 and isinstance(spec[1], dict):
+        return list(spec[1].get("options", []))
+    return None
+
+
+def model_inputs_by_class(object_info, extensions) -> Dict[str, Set[str]]:
+    """Return {class_type: input names} for combo inputs that list model files.
+
+    A combo input counts as a model reference when any of its options has a
+    model extension, which is how ComfyUI lists files from a models folder.
+    """
+    model_inputs = {}
+    for class_type, info in (object_info or {}).items():
+        inputs = info.get("input", {}) if isinstance(info, dict) else {}
+        names = set()
+        for section in ("required", "optional"):
+            for input_name, spec in (inputs.get(section) or {}).items():
+                options = _combo_options(spec)
+                if options and any(
+                    isinstance(option, str) and option.lower().endswith(extensions)
+                    for option in options
+                ):
+                    names.add(input_name)
+        model_inputs[class_type] = names
+    return model_inputs
+
+
+def _strings_with_extension(value, extensions) -> List[str]:
+    if isinstance(value, str):
+        return [value] if value.lower().endswith(extensions) else []
+    if isinstance(value, (list, tuple)):
+        return [item for sub in value for item in _strings_with_extension(sub, extensions)]
+    if isinstance(value, dict):
+        return [
+            item for sub in value.values() for item in _strings_with_extension(sub, extensions)
+        ]
+    return []
+
+
+def extract_model_names(workflow, extensions, object_info=None) -> List[str]:
+    """Walk a prompt-format workflow once and return the model names it references.
+
+    Inputs that object_info describes as model combos are taken as-is, which
+    also catches files with extensions outside `extensions`. Nodes that
+    object_info doesn't know about fall back to picking up any string input
+    (nested lists and dicts included) that ends with a model extension.
+    Links to other nodes (["node_id", output_index]) are ignored. Names are
+    returned in workflow order without duplicates.
+    """
+    model_inputs = model_inputs_by_class(object_info, extensions) if object_info else {}
+    names: Dict[str, None] = {}
+    for node in workflow.values():
+        if not isinstance(node, dict) or not isinstance(node.get("inputs"), dict):
+            continue
+        known_inputs = model_inputs.get(node.get("class_type"))
+        for input_name, value in node["inputs"].items():
+            if known_inputs is not None and input_name in known_inputs:
+                if isinstance(value, str) and value:
+                    names[value] = None
+                continue
+            for name in _strings_with_extension(value, extensions):
+                names[name] = None
+    return list(names)
+
+
+def resolve_model_names(names: Iterable[str], resolve) -> Dict[str, Optional[str]]:
+    """Resolve each distinct name once with resolve(name) -> path or None."""
+    return {name: resolve(name) for name in dict.fromkeys(names)}
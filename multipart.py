@@ -0,0 +1,271 @@
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+
+STREAM_BLOCK_SIZE = 1024 * 1024
+DEFAULT_UPLOAD_CONCURRENCY = 4
+DEFAULT_PART_RETRIES = 5
+DEFAULT_RETRY_BACKOFF = 1.0
+
+
+class UploadCancelled(Exception):
+    """Raised by upload_parts when its cancel_event is set."""
+
+
+class PartChecksumMismatch(Exception):
+    """The ETag returned for a part doesn't match the MD5 of the bytes sent."""
+
+
+def _new_md5():
+    try:
+        return hashlib.md5(usedforsecurity=False)
+    except TypeError:
+        # Python < 3.9
+        return hashlib.md5()
+
+
+class FilePart(io.RawIOBase):
+    """Read-only, seekable view of a byte range of a file.
+
+    Passed as the request body so the HTTP client streams the part from disk
+    instead of holding it in memory. The file is opened lazily and can be
+    rewound, which lets a failed part be re-sent. on_progress, if set, is
+    called with the change in position after every read or seek; throttle,
+    if set, is called with the size of every read and may block to limit
+    the upload rate.
+
+    The MD5 of the part is computed from the same reads that feed the
+    request body, so checking the returned ETag costs no extra disk I/O.
+    """
+
+    def __init__(self, path, offset, length, part_number=None, on_progress=None, throttle=None):
+        super().__init__()
+        self.on_progress = on_progress
+        self.throttle = throttle
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.part_number = part_number
+        self._pos = 0
+        self._file = None
+        self._md5 = _new_md5()
+        self._md5_pos = 0
+
+    def __len__(self):
+        return self.length
+
+    def _ensure_open(self):
+        if self._file is None:
+            self._file = open(self.path, "rb", buffering=0)
+        return self._file
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self.length
+        pos = max(0, min(pos, self.length))
+        if pos == 0:
+            # Rewound to re-send the part: start its checksum over
+            self._md5 = _new_md5()
+            self._md5_pos = 0
+        self._advance(pos - self._pos)
+        return self._pos
+
+    def _digest(self, data):
+        # Only sequential reads from the start of the part give a valid MD5
+        if self._md5_pos == self._pos:
+            self._md5.update(data)
+            self._md5_pos += len(data)
+
+    def md5_hexdigest(self) -> Optional[str]:
+        """MD5 of the part if it has been read in full, else None."""
+        if self._md5_pos != self.length:
+            return None
+        return self._md5.hexdigest()
+
+    def _advance(self, delta):
+        self._pos += delta
+        if delta and self.on_progress:
+            self.on_progress(delta)
+
+    def _throttle(self, n):
+        if n and self.throttle:
+            self.throttle(n)
+
+    def readinto(self, buffer):
+        remaining = self.length - self._pos
+        if remaining <= 0:
+            return 0
+        view = memoryview(buffer)
+        if len(view) > remaining:
+            view = view[:remaining]
+        f = self._ensure_open()
+        f.seek(self.offset + self._pos)
+        n = f.readinto(view) or 0
+        self._throttle(n)
+        self._digest(view[:n])
+        self._advance(n)
+        return n
+
+    def read(self, size=-1):
+        remaining = self.length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size == 0:
+            return b""
+        f = self._ensure_open()
+        f.seek(self.offset + self._pos)
+        data = f.read(size)
+        self._throttle(len(data))
+        self._digest(data)
+        self._advance(len(data))
+        return data
+
+    def __iter__(self):
+        self.seek(0)
+        while True:
+            block = self.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def split_file_into_parts(
+    file_path, chunk_size, on_progress=None, throttle=None
+) -> List[FilePart]:
+    """Describe the multipart parts of a file without reading any of it."""
+    file_size = os.path.getsize(file_path)
+    parts = []
+    offset = 0
+    part_number = 1
+    while offset < file_size:
+        length = min(chunk_size, file_size - offset)
+        parts.append(FilePart(file_path, offset, length, part_number, on_progress, throttle))
+        offset += length
+        part_number += 1
+    return parts
+
+
+def verify_part_etag(part: FilePart, etag):
+    """Raise PartChecksumMismatch if etag is an MD5 that differs from the part's.
+
+    ETags that aren't plain MD5s (e.g. from SSE-KMS buckets) can't be checked
+    and are accepted.
+    """
+    if not etag:
+        return
+    expected = part.md5_hexdigest()
+    returned = etag.strip('"').lower()
+    if expected is None or len(returned) != 32 or "-" in returned:
+        return
+    try:
+        int(returned, 16)
+    except ValueError:
+        return
+    if returned != expected:
+        raise PartChecksumMismatch(
+            f"Part {part.part_number} ETag {returned} doesn't match MD5 {expected}"
+        )
+
+
+def upload_parts(
+    parts: List[FilePart],
+    urls: List[str],
+    upload_fn: Callable[[str, FilePart], str],
+    concurrency=DEFAULT_UPLOAD_CONCURRENCY,
+    on_part_done: Optional[Callable[[FilePart, str], None]] = None,
+    retries=DEFAULT_PART_RETRIES,
+    backoff=DEFAULT_RETRY_BACKOFF,
+    on_retry: Optional[Callable[[FilePart, int, Exception], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    verify_etags=False,
+    budget=None,
+) -> List[str]:
+    """Upload parts concurrently and return their ETags in the order of `parts`.
+
+    upload_fn(url, part) sends one part and returns its ETag; the URL for a
+    part is urls[part.part_number - 1], so `parts` may be any subset of the
+    file's parts. At most `concurrency` parts are in flight at once. A failed
+    part is retried up to `retries` times with exponential backoff and
+    jitter. If it still fails, parts that haven't started yet are cancelled
+    and the last error is raised. Setting cancel_event stops the upload with
+    UploadCancelled before the next part or retry. With verify_etags, an
+    ETag that is a plain MD5 but doesn't match the bytes streamed for the
+    part counts as a failed attempt. A shared budget (see
+    upload_scheduler.UploadBudget) additionally limits parts in flight
+    across every file being uploaded.
+    """
+    if parts and len(urls) < max(part.part_number for part in parts):
+        raise ValueError(f"Got {len(urls)} upload URLs for {len(parts)} parts")
+
+    def send(part):
+        url = urls[part.part_number - 1]
+        with part:
+            for attempt in range(retries + 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise UploadCancelled(f"Upload of part {part.part_number} cancelled")
+                if budget is not None and not budget.acquire(len(part), cancel_event):
+                    raise UploadCancelled(f"Upload of part {part.part_number} cancelled")
+                try:
+                    part.seek(0)
+                    etag = upload_fn(url, part)
+                    if verify_etags:
+                        verify_part_etag(part, etag)
+                except Exception as error:
+                    if attempt == retries:
+                        raise
+                    delay = backoff * (2**attempt) * (0.5 + random.random())
+                    print(
+                        f"Part {part.part_number} failed ({error}), "
+                        f"retrying in {delay:.1f}s ({attempt + 1}/{retries})"
+                    )
+                    if on_retry:
+                        on_retry(part, attempt + 1, error)
+                else:
+                    break
+                finally:
+                    # Don't hold a connection slot through the backoff
+                    if budget is not None:
+                        budget.release(len(part))
+                time.sleep(delay)
+        if on_part_done:
+            on_part_done(part, etag)
+        return etag
+
+    etags: List[Optional[str]] = [None] * len(parts)
+    if not parts:
+        return []
+    workers = max(1, min(concurrency, len(parts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deploy-upload") as pool:
+        futures = {pool.submit(send, part): i for i, part in enumerate(parts)}
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                raise error
+            etags[futures[future]] = future.result()
+    return etags
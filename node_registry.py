@@ -0,0 +1,66 @@
+import threading
+from typing import Dict, Iterable, Optional
+
+
+CUSTOM_NODES_PREFIX = "custom_nodes."
+
+
+def repo_from_python_module(python_module) -> Optional[str]:
+    """Return the custom node repo a node's python_module belongs to, if any."""
+    if not python_module or "custom_nodes" not in python_module:
+        return None
+    parts = python_module.split(CUSTOM_NODES_PREFIX, 1)
+    return parts[1] if len(parts) == 2 else None
+
+
+def custom_nodes_from_object_info(object_info, class_types: Iterable[str]) -> Dict[str, dict]:
+    """{class_type: {repo_name, display_name}} for the given classes, from /object_info data."""
+    custom_nodes = {}
+    for class_type in class_types:
+        info = object_info.get(class_type)
+        if not isinstance(info, dict):
+            continue
+        repo_name = repo_from_python_module(info.get("python_module"))
+        if repo_name:
+            custom_nodes[class_type] = {
+                "repo_name": repo_name,
+                "display_name": info.get("display_name", class_type),
+            }
+    return custom_nodes
+
+
+class CustomNodeIndex:
+    """Maps node class_type to the custom node repo that provides it.
+
+    Built from ComfyUI's loaded node registry (NODE_CLASS_MAPPINGS and the
+    RELATIVE_PYTHON_MODULE ComfyUI sets on every custom node class) rather
+    than from /object_info, which also serializes every node's inputs. The
+    index is rebuilt only when the registry changes size, which is when
+    nodes are added; ComfyUI never unloads them.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._index: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, class_mappings, display_names=None) -> Dict[str, dict]:
+        key = (id(class_mappings), len(class_mappings))
+        with self._lock:
+            if key != self._key:
+                self._index = self._build(class_mappings, display_names or {})
+                self._key = key
+            return self._index
+
+    @staticmethod
+    def _build(class_mappings, display_names) -> Dict[str, dict]:
+        index = {}
+        for class_type, node_class in list(class_mappings.items()):
+            python_module = getattr(node_class, "RELATIVE_PYTHON_MODULE", None)
+            repo_name = repo_from_python_module(python_module)
+            if repo_name:
+                index[class_type] = {
+                    "repo_name": repo_name,
+                    "display_name": display_names.get(class_type, class_type),
+                }
+        return index
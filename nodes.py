@@ -1,5 +1,7 @@
+import json
 import os
-import subprocess
+
+from .export import LINK_MODES
 
 
 class GeneratePackageRequirements:
@@ -7,22 +9,24 @@ class GeneratePackageRequirements:
     def INPUT_TYPES(cls):
         return {
             "required": {},  # No inputs needed
+            "hidden": {"prompt": "PROMPT"},
         }
 
     RETURN_TYPES = ()  # No outputs needed
     FUNCTION = "process"
     CATEGORY = "custom"
 
-    def process(self):
-        # Trigger the generate_requirements.py script
+    def process(self, prompt=None):
+        # Runs in the ComfyUI process so it shares the model index, hash cache
+        # and git info cache with the /deploy routes
         try:
-            script_path = os.path.join(
-                os.path.dirname(os.path.realpath(__file__)), "generate_requirements.py"
-            )
-            subprocess.run(["python", script_path], check=True)
-            print("generate_requirements.py executed successfully!")
+            from .generate_requirements import generate_workflow_requirements
+
+            requirements = generate_workflow_requirements(prompt or {})
+            print(json.dumps(requirements["package"], indent=2))
+            print("Package requirements generated successfully!")
         except Exception as e:
-            print(f"Error executing generate_requirements.py: {e}")
+            print(f"Error generating package requirements: {e}")
 
         return ()  # Return an empty tuple
 
@@ -37,12 +41,47 @@ class GeneratePackageRequirements:
         return os.path.join(os.path.dirname(os.path.realpath(__file__)), "web")
 
 
+class ExportDeployPackage:
+    """Writes the deploy package of the running workflow to a local directory."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "product_name": ("STRING", {"default": "workflow"}),
+                # A directory inside ComfyUI's output directory
+                "output_dir": ("STRING", {"default": "deploy_export"}),
+                "link_mode": (list(LINK_MODES),),
+            },
+            "hidden": {"prompt": "PROMPT"},
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("manifest_path",)
+    FUNCTION = "export"
+    OUTPUT_NODE = True
+    CATEGORY = "custom"
+
+    def export(self, product_name, output_dir, link_mode, prompt=None):
+        from .generate_requirements import export_workflow
+
+        result = export_workflow(prompt or {}, product_name, output_dir, link_mode)
+        if result.get("status") != "success":
+            raise RuntimeError(result.get("message", "Export failed"))
+        print(result["message"])
+        return (result["manifest_path"],)
+
+    @classmethod
+    def IS_CHANGED(cls, *args, **kwargs):
+        return float("nan")
 
 
 NODE_CLASS_MAPPINGS = {
     "GeneratePackageRequirements": GeneratePackageRequirements,
+    "ExportDeployPackage": ExportDeployPackage,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "GeneratePackageRequirements": "Generate Package Requirements",
+    "ExportDeployPackage": "Export Deploy Package",
 }
@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+DEFAULT_INTERVAL = 60.0
+# How often a paused worker asks again whether the host is idle
+IDLE_POLL_INTERVAL = 1.0
+# is_idle() is checked at most this often while a file is being read
+IDLE_CHECK_INTERVAL = 0.5
+LOWEST_NICENESS = 19
+
+
+class PrehashStopped(Exception):
+    """The worker was stopped while warming a file."""
+
+
+def lower_thread_priority(niceness=LOWEST_NICENESS) -> bool:
+    """Give the calling thread the lowest CPU priority, where the OS allows it.
+
+    Only Linux has per-thread nice values; the default I/O scheduling
+    class follows them too, so reads drop in priority as well. Elsewhere
+    this does nothing and returns False.
+    """
+    if not sys.platform.startswith("linux") or not hasattr(threading, "get_native_id"):
+        return False
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+        return True
+    except OSError:
+        return False
+
+
+def _stat_key(path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class PrehashWorker:
+    """Warms the hash caches for new and changed files while the host is idle.
+
+    Every interval it lists candidate files, drops those is_cached already
+    knows and passes the rest to warm_fn(path, on_progress) one at a time,
+    in a daemon thread at the lowest priority. warm_fn calls on_progress
+    after each block it reads; that is where the worker pauses while
+    is_idle() is False, so even a half-read file stops until the host is
+    idle again. throttle(nbytes), if given, caps the read rate.
+    """
+
+    def __init__(
+        self,
+        list_files: Callable[[], Iterable[str]],
+        is_cached: Callable[[str], bool],
+        warm_fn: Callable[[str, Callable[[int], None]], object],
+        is_idle: Callable[[], bool],
+        interval=DEFAULT_INTERVAL,
+        throttle: Optional[Callable[[int], None]] = None,
+        on_round_done: Optional[Callable[[], None]] = None,
+    ):
+        self.list_files = list_files
+        self.is_cached = is_cached
+        self.warm_fn = warm_fn
+        self.is_idle = is_idle
+        self.interval = interval
+        self.throttle = throttle
+        self.on_round_done = on_round_done
+        self.pending = 0
+        self.current: Optional[str] = None
+        self.paused = False
+        self.files_warmed = 0
+        self._failed: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._last_idle_check = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="deploy-prehash", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return {
+            "running": self._thread is not None and not self._stop.is_set(),
+            "paused": self.paused,
+            "pending": self.pending,
+            "current": self.current,
+            "files_warmed": self.files_warmed,
+        }
+
+    def _run(self):
+        lower_thread_priority()
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except PrehashStopped:
+                break
+            except Exception as e:
+                print(f"Background pre-hashing failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _wait_idle(self):
+        while not self.is_idle():
+            self.paused = True
+            if self._stop.wait(IDLE_POLL_INTERVAL):
+                break
+        self.paused = False
+        if self._stop.is_set():
+            raise PrehashStopped()
+
+    def _on_progress(self, nbytes):
+        if self._stop.is_set():
+            raise PrehashStopped()
+        if self.throttle:
+            self.throttle(nbytes)
+        now = time.monotonic()
+        if now - self._last_idle_check >= IDLE_CHECK_INTERVAL:
+            self._last_idle_check = now
+            self._wait_idle()
+
+    def _needs_warming(self, path):
+        if path in self._failed:
+            # Don't retry a file that failed until it changes
+            if self._failed[path] == _stat_key(path):
+                return False
+            del self._failed[path]
+        try:
+            return not self.is_cached(path)
+        except OSError:
+            return False
+
+    def run_once(self):
+        """Warm every file that isn't cached yet; returns how many were warmed."""
+        self._wait_idle()
+        pending = [path for path in self.list_files() if self._needs_warming(path)]
+        self.pending = len(pending)
+        warmed = 0
+        for path in pending:
+            self._wait_idle()
+            self.current = path
+            try:
+                self.warm_fn(path, self._on_progress)
+                warmed += 1
+                self.files_warmed += 1
+            except OSError as e:
+                print(f"Could not pre-hash {path}: {e}")
+                self._failed[path] = _stat_key(path)
+            finally:
+                self.current = None
+                self.pending -= 1
+        if warmed and self.on_round_done:
+            self.on_round_done()
+        return warmed
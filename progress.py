@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+PROGRESS_EVENT = "deploy-node.progress"
+
+STAGE_SCAN = "scan"
+STAGE_HASH = "hash"
+STAGE_CHUNK = "chunk"
+STAGE_GIT = "git"
+STAGE_PACKAGE = "package"
+STAGE_UPLOAD = "upload"
+STAGE_BUILD = "build"
+STAGE_EXPORT = "export"
+STAGE_DONE = "done"
+
+DEFAULT_MIN_INTERVAL = 0.5
+
+
+class _FileProgress:
+    def __init__(self, stage, path, total_bytes, done_bytes):
+        self.stage = stage
+        self.path = path
+        self.total_bytes = total_bytes
+        self.done_bytes = done_bytes
+        self.start_bytes = done_bytes
+        self.started_at = time.monotonic()
+        self.last_emit = 0.0
+
+
+class ProgressReporter:
+    """Turns stage changes and byte counts into structured progress events.
+
+    Events are dicts passed to emit(); per-file events carry bytes done and
+    total, the average MB/s since the file started and an ETA. File events
+    are throttled to one every min_interval seconds per file. Safe to call
+    from worker threads.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[dict], None],
+        job_id=None,
+        min_interval=DEFAULT_MIN_INTERVAL,
+    ):
+        self.emit = emit
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.stage_name: Optional[str] = None
+        self._files: Dict[str, _FileProgress] = {}
+        self._lock = threading.Lock()
+
+    def _send(self, event):
+        event["job_id"] = self.job_id
+        event["time"] = time.time()
+        try:
+            self.emit(event)
+        except Exception as e:
+            print(f"Could not send progress event: {e}")
+
+    def stage(self, stage, message=None, **extra):
+        """Announce that the deployment moved on to a new stage."""
+        self.stage_name = stage
+        event = {"type": "stage", "stage": stage, "message": message}
+        event.update(extra)
+        self._send(event)
+
+    def start_file(self, path, total_bytes, done_bytes=0, stage=None):
+        stage = stage or self.stage_name
+        with self._lock:
+            self._files[(stage, path)] = _FileProgress(stage, path, total_bytes, done_bytes)
+        self._emit_file(stage, path, force=True)
+
+    def advance(self, path, nbytes, stage=None):
+        """Add nbytes (negative when a part is rewound for a retry) to a file."""
+        stage = stage or self.stage_name
+        with self._lock:
+            record = self._files.get((stage, path))
+            if record is None:
+                return
+            record.done_bytes = max(0, min(record.total_bytes, record.done_bytes + nbytes))
+        self._emit_file(stage, path)
+
+    def finish_file(self, path, stage=None):
+        stage = stage or self.stage_name
+        with self._lock:
+            record = self._files.get((stage, path))
+            if record is None:
+                return
+            record.done_bytes = record.total_bytes
+        self._emit_file(stage, path, force=True, finished=True)
+        with self._lock:
+            self._files.pop((stage, path), None)
+
+    def _emit_file(self, stage, path, force=False, finished=False):
+        now = time.monotonic()
+        with self._lock:
+            record = self._files.get((stage, path))
+            if record is None:
+                return
+            if not force and now - record.last_emit < self.min_interval:
+                return
+            record.last_emit = now
+            elapsed = now - record.started_at
+            transferred = record.done_bytes - record.start_bytes
+            rate = transferred / elapsed if elapsed > 0 else 0.0
+            remaining = record.total_bytes - record.done_bytes
+            eta = remaining / rate if rate > 0 else None
+            event = {
+                "type": "file",
+                "stage": stage,
+                "file": os.path.basename(path),
+                "path": path,
+                "bytes_done": record.done_bytes,
+                "bytes_total": record.total_bytes,
+                "mb_per_s": round(rate / (1024 * 1024), 2),
+                "eta_s": round(eta, 1) if eta is not None else None,
+                "finished": finished,
+            }
+        self._send(event)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Optional
+
+
+SAFETENSORS_EXTENSIONS = (".safetensors", ".sft")
+# The format caps headers at 100 MB; anything larger isn't a safetensors file
+MAX_HEADER_SIZE = 100 * 1024 * 1024
+FINGERPRINT_SAMPLES = 8
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+# __metadata__ values longer than this (e.g. embedded training configs) are left out
+MAX_METADATA_VALUE_LENGTH = 256
+
+# Bits per element; dtypes not listed here are still counted, just without a byte size
+DTYPE_BITS = {
+    "BOOL": 8,
+    "U8": 8,
+    "I8": 8,
+    "F8_E5M2": 8,
+    "F8_E4M3": 8,
+    "I16": 16,
+    "U16": 16,
+    "F16": 16,
+    "BF16": 16,
+    "I32": 32,
+    "U32": 32,
+    "F32": 32,
+    "I64": 64,
+    "U64": 64,
+    "F64": 64,
+}
+
+
+class SafetensorsHeaderError(Exception):
+    """A file doesn't start with a valid safetensors header."""
+
+
+def is_safetensors(path) -> bool:
+    return path.lower().endswith(SAFETENSORS_EXTENSIONS)
+
+
+def read_header(path):
+    """Return (header dict, header length) of a safetensors file.
+
+    Only the 8 byte length prefix and the JSON header are mapped, so this
+    costs the same for a 100 KB LoRA and a 20 GB checkpoint.
+    """
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise SafetensorsHeaderError(f"{path} is too small to be a safetensors file")
+        (header_size,) = struct.unpack("<Q", prefix)
+        if header_size > MAX_HEADER_SIZE or 8 + header_size > file_size:
+            raise SafetensorsHeaderError(f"{path} has an invalid header length {header_size}")
+        with mmap.mmap(f.fileno(), 8 + header_size, access=mmap.ACCESS_READ) as mm:
+            raw = mm[8 : 8 + header_size]
+    try:
+        header = json.loads(raw)
+    except ValueError as e:
+        raise SafetensorsHeaderError(f"{path} has an unreadable header: {e}")
+    if not isinstance(header, dict):
+        raise SafetensorsHeaderError(f"{path} header is not a JSON object")
+    return header, header_size
+
+
+def summarize_header(header, header_size, file_size) -> Dict[str, object]:
+    """Tensor count, parameter count and dtype mix described by a header.
+
+    "complete" is False when the file is shorter than the tensors the
+    header declares, which usually means an interrupted download.
+    """
+    tensors = 0
+    parameters = 0
+    dtypes: Dict[str, int] = {}
+    data_end = 0
+    for name, info in header.items():
+        if name == "__metadata__" or not isinstance(info, dict):
+            continue
+        count = 1
+        for dim in info.get("shape", []):
+            count *= dim
+        tensors += 1
+        parameters += count
+        dtype = info.get("dtype", "unknown")
+        dtypes[dtype] = dtypes.get(dtype, 0) + count
+        offsets = info.get("data_offsets") or [0, 0]
+        data_end = max(data_end, offsets[1])
+
+    metadata = header.get("__metadata__") or {}
+    return {
+        "tensors": tensors,
+        "parameters": parameters,
+        "dtypes": dtypes,
+        "weights_bytes": sum(
+            count * DTYPE_BITS[dtype] // 8
+            for dtype, count in dtypes.items()
+            if dtype in DTYPE_BITS
+        ),
+        "complete": 8 + header_size + data_end <= file_size,
+        "metadata": {
+            key: value
+            for key, value in metadata.items()
+            if isinstance(value, str) and len(value) <= MAX_METADATA_VALUE_LENGTH
+        },
+    }
+
+
+def quick_fingerprint(
+    path, header_size=0, samples=FINGERPRINT_SAMPLES, block_size=FINGERPRINT_BLOCK_SIZE
+) -> str:
+    """A cheap SHA-256 over the file size, the header and a few evenly spaced blocks.
+
+    It reads at most header + samples * block_size bytes. Files with the
+    same fingerprint are very likely identical, but it is only a hint for
+    display and pre-checks: different files can collide, so package
+    contents are still identified by the full hash.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        h.update(struct.pack("<Q", file_size))
+        start = 8 + header_size if header_size else 0
+        h.update(f.read(start))
+        span = file_size - start
+        if span <= samples * block_size:
+            offsets = [start]
+            block_size = span
+        else:
+            step = (span - block_size) // max(1, samples - 1)
+            offsets = [start + i * step for i in range(samples)]
+        for offset in offsets:
+            f.seek(offset)
+            h.update(f.read(block_size))
+    return h.hexdigest()
+
+
+def describe_model(path) -> Dict[str, object]:
+    """Size, quick fingerprint and, for safetensors files, a header summary."""
+    file_size = os.path.getsize(path)
+    info: Dict[str, object] = {"file_size": file_size}
+    header_size = 0
+    if is_safetensors(path):
+        try:
+            header, header_size = read_header(path)
+            info["safetensors"] = summarize_header(header, header_size, file_size)
+        except (SafetensorsHeaderError, TypeError, IndexError) as e:
+            # TypeError/IndexError: a header with malformed shapes or offsets
+            print(f"Could not read safetensors header: {e}")
+    info["quick_fingerprint"] = quick_fingerprint(path, header_size)
+    return info
+
+
+def describe_models(paths) -> Dict[str, Optional[Dict[str, object]]]:
+    """describe_model for each path; None for files that can't be read."""
+    results: Dict[str, Optional[Dict[str, object]]] = {}
+    for path in paths:
+        try:
+            results[path] = describe_model(path)
+        except OSError as e:
+            print(f"Could not describe {path}: {e}")
+            results[path] = None
+    return results
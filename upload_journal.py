@@ -0,0 +1,219 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+# Journals whose URLs don't say when they expire are dropped after the
+# longest lifetime S3 allows a presigned URL
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+# A journal is treated as expired this long before its URLs stop working,
+# so a resume doesn't start on URLs about to run out
+EXPIRY_MARGIN = 300
+
+
+def url_expires_at(url) -> Optional[float]:
+    """When a presigned S3 URL stops working, from its query string, or None if it doesn't say."""
+    query = parse_qs(urlparse(url).query)
+    try:
+        if "X-Amz-Date" in query and "X-Amz-Expires" in query:
+            signed_at = datetime.datetime.strptime(query["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ")
+            signed_at = signed_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+            return signed_at + int(query["X-Amz-Expires"][0])
+        if "Expires" in query:
+            # Signature version 2: an absolute epoch time
+            return float(query["Expires"][0])
+    except ValueError:
+        pass
+    return None
+
+
+class UploadJournal:
+    """Persisted state of one multipart upload so it can be resumed.
+
+    Records the upload id, part size, presigned part URLs, the encoding the
+    file is sent with and the ETag of every part that has been sent. After
+    a crash or a failed part, only the parts missing from the journal need
+    to be uploaded again. Journals belong to one deployment_id and expire
+    with their presigned URLs.
+
+    The upload parameters and URLs are written once; each finished part is
+    appended as a line to a separate parts log, so recording a part costs
+    the same however many parts the file has.
+    """
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def journal_path(journal_dir, key, upload_id):
+        digest = hashlib.sha256(f"{key}:{upload_id}".encode("utf-8")).hexdigest()
+        return os.path.join(journal_dir, f"{digest[:32]}.json")
+
+    @classmethod
+    def open(
+        cls,
+        journal_dir,
+        file_path,
+        key,
+        upload_id,
+        chunk_size,
+        urls,
+        content_type,
+        deployment=None,
+        content_encoding=None,
+        deployment_id=None,
+        completion=None,
+    ):
+        """Load the journal for an upload, or start a new one.
+
+        completion is what the deployment records once its package is
+        built, so that a resume can record it too.
+        """
+        path = cls.journal_path(journal_dir, key, upload_id)
+        st = os.stat(file_path)
+        existing = cls.load(path)
+        if existing is not None:
+            state = existing.state
+            if (
+                state.get("file_size") == st.st_size
+                and state.get("mtime_ns") == st.st_mtime_ns
+                and state.get("chunk_size") == chunk_size
+                and state.get("content_encoding") == content_encoding
+            ):
+                return existing
+            print(f"{file_path} changed since its upload started, re-sending all parts")
+        # Parts logged against an older journal at this path don't apply to a new one
+        cls(path, {}).remove()
+
+        now = time.time()
+        expiries = [e for e in (url_expires_at(url) for url in urls) if e is not None]
+        journal = cls(
+            path,
+            {
+                "file_path": file_path,
+                "file_size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "key": key,
+                "upload_id": upload_id,
+                "chunk_size": chunk_size,
+                "urls": urls,
+                "content_type": content_type,
+                "content_encoding": content_encoding,
+                "deployment": deployment,
+                "deployment_id": deployment_id,
+                "completion": completion,
+                "created_at": now,
+                "expires_at": min(expiries) if expiries else now + DEFAULT_MAX_AGE,
+                "parts": {},
+            },
+        )
+        journal.save()
+        return journal
+
+    @property
+    def parts_path(self):
+        return f"{self.path[: -len('.json')]}.parts"
+
+    @classmethod
+    def load(cls, path) -> Optional["UploadJournal"]:
+        try:
+            with open(path, "r") as f:
+                journal = cls(path, json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable upload journal {path}: {e}")
+            return None
+        journal.state.setdefault("parts", {})
+        try:
+            with open(journal.parts_path, "r") as f:
+                for line in f:
+                    try:
+                        part_number, etag = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash is just a part to send again
+                        continue
+                    journal.state["parts"][str(part_number)] = etag
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Ignoring unreadable parts log {journal.parts_path}: {e}")
+        return journal
+
+    @classmethod
+    def list_journals(cls, journal_dir, deployment_id=None) -> List["UploadJournal"]:
+        """Return the unfinished uploads recorded in journal_dir, optionally of one deployment.
+
+        Expired journals are deleted instead: their URLs can't be used any more.
+        """
+        if not os.path.isdir(journal_dir):
+            return []
+        journals = []
+        now = time.time()
+        for name in sorted(os.listdir(journal_dir)):
+            if not name.endswith(".json"):
+                continue
+            journal = cls.load(os.path.join(journal_dir, name))
+            if journal is None:
+                continue
+            if journal.is_expired(now):
+                print(f"Dropping expired upload journal for {journal.state.get('file_path')}")
+                journal.remove()
+                continue
+            if deployment_id is None or journal.state.get("deployment_id") == deployment_id:
+                journals.append(journal)
+        return journals
+
+    @classmethod
+    def remove_journals(cls, journal_dir, predicate: Callable[["UploadJournal"], bool]) -> int:
+        """Delete the journals in journal_dir that predicate matches; returns how many."""
+        removed = 0
+        for journal in cls.list_journals(journal_dir):
+            if predicate(journal):
+                journal.remove()
+                removed += 1
+        return removed
+
+    def is_expired(self, now=None) -> bool:
+        expires_at = self.state.get("expires_at")
+        if expires_at is None:
+            # Written before journals recorded an expiry
+            try:
+                expires_at = os.path.getmtime(self.path) + DEFAULT_MAX_AGE
+            except OSError:
+                return True
+        return (time.time() if now is None else now) >= expires_at - EXPIRY_MARGIN
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            data = json.dumps(self.state)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def completed_parts(self) -> Dict[int, str]:
+        with self._lock:
+            return {int(n): etag for n, etag in self.state["parts"].items()}
+
+    def record_part(self, part_number, etag):
+        with self._lock:
+            self.state["parts"][str(part_number)] = etag
+            with open(self.parts_path, "a") as f:
+                f.write(json.dumps([part_number, etag]) + "\n")
+
+    def remove(self):
+        for path in (self.path, self.parts_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence
+
+
+DEFAULT_MAX_FILES = 3
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_MAX_INFLIGHT_BYTES = 1024 * 1024 * 1024
+
+
+class RateLimiter:
+    """Token bucket shared by every upload thread.
+
+    consume(n) blocks until n more bytes may be sent. Bursts are capped at
+    one second's worth of bytes, so a stalled upload can't save up and
+    then flood the link.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self.capacity = self.rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Reads can be larger than the bucket; let them through once it's full
+                if self._tokens >= min(nbytes, self.capacity):
+                    self._tokens -= nbytes
+                    return
+                wait_for = (min(nbytes, self.capacity) - self._tokens) / self.rate
+            time.sleep(min(wait_for, 0.25))
+
+
+class UploadBudget:
+    """Caps the parts in flight across all files, by count and by bytes.
+
+    acquire() blocks until a connection slot and the part's bytes fit. A
+    part larger than the byte budget is still let through once nothing
+    else is in flight, so it can't wait forever.
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS, max_inflight_bytes=None):
+        self.max_connections = max(1, max_connections)
+        self.max_inflight_bytes = max_inflight_bytes
+        self.connections = 0
+        self.inflight_bytes = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, nbytes):
+        if self.connections >= self.max_connections:
+            return False
+        if self.max_inflight_bytes is None or self.connections == 0:
+            return True
+        return self.inflight_bytes + nbytes <= self.max_inflight_bytes
+
+    def acquire(self, nbytes, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Wait for room for one part; returns False if cancel_event was set first."""
+        with self._cond:
+            while not self._fits(nbytes):
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                self._cond.wait(0.25)
+            self.connections += 1
+            self.inflight_bytes += nbytes
+            return True
+
+    def release(self, nbytes):
+        with self._cond:
+            self.connections -= 1
+            self.inflight_bytes -= nbytes
+            self._cond.notify_all()
+
+
+def upload_order(sizes: Sequence[int]) -> List[int]:
+    """Return indexes into sizes in the order files should start uploading.
+
+    The largest file goes first so the longest transfer starts as early as
+    possible; the rest follow smallest first, so while it runs the other
+    slots work through the small files instead of queueing behind it.
+    """
+    if not sizes:
+        return []
+    largest = max(range(len(sizes)), key=lambda i: sizes[i])
+    rest = sorted((i for i in range(len(sizes)) if i != largest), key=lambda i: sizes[i])
+    return [largest] + rest
+
+
+def upload_files(
+    items: Sequence,
+    sizes: Sequence[int],
+    upload_fn: Callable[[object], object],
+    max_files=DEFAULT_MAX_FILES,
+) -> List[object]:
+    """Run upload_fn(item) for several files at once, in upload_order.
+
+    Returns the results in the order of `items`. After the first failure no
+    further files are started; files already running finish (their parts
+    are journaled either way) and then the first error is raised.
+    """
+    results: List[object] = [None] * len(items)
+    if not items:
+        return results
+    order = upload_order(sizes)
+    workers = max(1, min(max_files, len(items)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deploy-file") as pool:
+        # The pool runs tasks in submission order
+        futures = {pool.submit(upload_fn, items[i]): i for i in order}
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        errors = [future.exception() for future in done if future.exception() is not None]
+        first_error = errors[0] if errors else None
+        for future, i in futures.items():
+            if future.cancelled() or future.exception() is not None:
+                continue
+            results[i] = future.result()
+    if first_error is not None:
+        raise first_error
+    return results
@@ -4,9 +4,61 @@ import { api } from "../../scripts/api.js";
 // Initialize module state at the top level
 const DeploySystem = {
     isInitialized: false,
-    isDeploying: false
+    isDeploying: false,
+    currentJobId: null
 };
 
+const JOB_POLL_INTERVAL_MS = 2000;
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+async function parseApiResponse(response) {
+    return response instanceof Response ? await response.json() : response;
+}
+
+// Deployments run as background jobs on the server; poll until the job finishes
+// and return the job's result in the same shape the endpoint used to return
+async function waitForJob(queuedResponse) {
+    if (queuedResponse.status !== "queued" || !queuedResponse.job_id) {
+        return queuedResponse;
+    }
+
+    DeploySystem.currentJobId = queuedResponse.job_id;
+    try {
+        while (true) {
+            await sleep(JOB_POLL_INTERVAL_MS);
+            const job = await parseApiResponse(
+                await api.fetchApi(`/deploy/jobs/${queuedResponse.job_id}`, { method: "GET" })
+            );
+            if (job.status === "queued" || job.status === "running") {
+                continue;
+            }
+            if (job.status === "cancelled") {
+                return { status: "error", message: "Deployment cancelled" };
+            }
+            if (job.result) {
+                return job.result;
+            }
+            return { status: "error", message: job.error || "Deployment failed" };
+        }
+    } finally {
+        DeploySystem.currentJobId = null;
+    }
+}
+
+async function cancelCurrentJob() {
+    if (!DeploySystem.currentJobId) {
+        return;
+    }
+    try {
+        await api.fetchApi(`/deploy/jobs/${DeploySystem.currentJobId}/cancel`, { method: "POST" });
+    } catch (error) {
+        console.error("Error cancelling deployment:", error);
+    }
+}
+
 function saveObjectAsJSON(obj, filename) {
     const jsonStr = JSON.stringify(obj, null, 2);  // Pretty print with 2 spaces
     const blob = new Blob([jsonStr], { type: 'application/json' });
@@ -192,7 +244,9 @@ function createDeployModal() {
     const additionalModelsInput = document.createElement('input');
     additionalModelsInput.type = 'text';
     additionalModelsInput.id = 'deploy-additional-models-input';
-    additionalModelsInput.placeholder = 'Enter path and click Add';
+    additionalModelsInput.placeholder = 'Enter paths (separate several with ;) and click Add';
+    additionalModelsInput.setAttribute('list', 'deploy-model-suggestions');
+    additionalModelsInput.autocomplete = 'off';
     additionalModelsInput.style.cssText = `
         flex-grow: 1; /* Takes available space */
         padding: 8px;
@@ -216,7 +270,12 @@ function createDeployModal() {
         cursor: pointer;
     `;
 
+    // Filled from /deploy/models/search as the user types
+    const modelSuggestions = document.createElement('datalist');
+    modelSuggestions.id = 'deploy-model-suggestions';
+
     additionalInputContainer.appendChild(additionalModelsInput);
+    additionalInputContainer.appendChild(modelSuggestions);
     additionalInputContainer.appendChild(addModelButton);
 
     // Create button container
@@ -239,6 +298,12 @@ function createDeployModal() {
         cursor: pointer;
     `;
     cancelButton.onclick = () => {
+        if (DeploySystem.currentJobId) {
+            if (confirm("Cancel the running deployment?")) {
+                cancelCurrentJob();
+            }
+            return;
+        }
         modalOverlay.style.display = 'none';
     };
 
@@ -279,6 +344,23 @@ function createDeployModal() {
     `;
     document.head.appendChild(styleElement);
 
+    // Live progress reported by the server while a deployment job runs
+    const progressArea = document.createElement('div');
+    progressArea.id = 'deploy-progress';
+    progressArea.style.cssText = `
+        display: none;
+        max-height: 200px;
+        overflow-y: auto;
+        margin-top: 10px;
+        padding: 8px;
+        background-color: #333;
+        border: 1px solid #444;
+        border-radius: 3px;
+        color: #ccc;
+        font-size: 0.85em;
+        box-sizing: border-box;
+    `;
+
     // Create status message element
     const statusMessage = document.createElement('div');
     statusMessage.id = 'deploy-status-message';
@@ -307,6 +389,8 @@ function createDeployModal() {
             return;
         }
 
+        resetDeployProgress();
+
         // Show loading spinner and disable button
         deployButton.disabled = true;
         deployButton.style.backgroundColor = '#444';
@@ -334,6 +418,7 @@ function createDeployModal() {
     modalContent.appendChild(additionalModelsLabel);
     modalContent.appendChild(additionalInputContainer);
     modalContent.appendChild(loadingSpinner);
+    modalContent.appendChild(progressArea);
     modalContent.appendChild(statusMessage);
     modalContent.appendChild(buttonContainer);
 
@@ -344,6 +429,82 @@ function createDeployModal() {
     return modalOverlay;
 }
 
+const STAGE_LABELS = {
+    scan: "Scanning",
+    hash: "Hashing",
+    chunk: "Chunking",
+    git: "Reading git info",
+    package: "Sending package",
+    upload: "Uploading",
+    build: "Triggering build",
+    export: "Exporting",
+    done: "Done"
+};
+
+function formatBytes(bytes) {
+    if (bytes >= 1024 ** 3) return (bytes / 1024 ** 3).toFixed(2) + " GB";
+    if (bytes >= 1024 ** 2) return (bytes / 1024 ** 2).toFixed(1) + " MB";
+    if (bytes >= 1024) return (bytes / 1024).toFixed(1) + " KB";
+    return bytes + " B";
+}
+
+function formatEta(seconds) {
+    if (seconds === null || seconds === undefined) return "--";
+    if (seconds >= 3600) return Math.floor(seconds / 3600) + "h " + Math.floor((seconds % 3600) / 60) + "m";
+    if (seconds >= 60) return Math.floor(seconds / 60) + "m " + Math.floor(seconds % 60) + "s";
+    return Math.round(seconds) + "s";
+}
+
+function resetDeployProgress() {
+    const progressArea = document.getElementById('deploy-progress');
+    if (progressArea) {
+        progressArea.innerHTML = '';
+        progressArea.style.display = 'none';
+    }
+}
+
+// Render a progress event sent by the server over the websocket
+function renderDeployProgress(event) {
+    const progressArea = document.getElementById('deploy-progress');
+    if (!progressArea) {
+        return;
+    }
+    if (DeploySystem.currentJobId && event.job_id && event.job_id !== DeploySystem.currentJobId) {
+        return;
+    }
+    progressArea.style.display = 'block';
+
+    if (event.type === "stage") {
+        let stageLine = document.getElementById('deploy-progress-stage');
+        if (!stageLine) {
+            stageLine = document.createElement('div');
+            stageLine.id = 'deploy-progress-stage';
+            stageLine.style.cssText = 'color: #fff; margin-bottom: 5px;';
+            progressArea.prepend(stageLine);
+        }
+        const label = STAGE_LABELS[event.stage] || event.stage;
+        stageLine.textContent = label + (event.message ? ": " + event.message : "");
+        return;
+    }
+
+    const rowId = 'deploy-progress-' + event.stage + '-' + event.path;
+    let row = document.getElementById(rowId);
+    if (!row) {
+        row = document.createElement('div');
+        row.id = rowId;
+        row.style.cssText = 'padding: 2px 0; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;';
+        progressArea.appendChild(row);
+    }
+    const percent = event.bytes_total > 0 ? Math.floor(100 * event.bytes_done / event.bytes_total) : 100;
+    const label = STAGE_LABELS[event.stage] || event.stage;
+    let text = `${label} ${event.file}: ${percent}% (${formatBytes(event.bytes_done)} / ${formatBytes(event.bytes_total)})`;
+    if (!event.finished) {
+        text += ` at ${event.mb_per_s} MB/s, ETA ${formatEta(event.eta_s)}`;
+    }
+    row.textContent = text;
+    row.style.color = event.finished ? '#8fbc8f' : '#ccc';
+}
+
 // Helper function to create a model entry div with a remove button
 function createModelEntryDiv(modelPath, areaToUpdate) {
     const entryDiv = document.createElement('div');
@@ -383,11 +544,67 @@ function createModelEntryDiv(modelPath, areaToUpdate) {
         }
     };
 
+    // Filled in by annotateModelEntries; not a span, so it isn't collected as a path
+    const infoLabel = document.createElement('small');
+    infoLabel.className = 'deploy-model-info';
+    infoLabel.dataset.path = modelPath;
+    infoLabel.style.cssText = `
+        margin-left: auto;
+        padding: 0 8px;
+        color: #aaa;
+        white-space: nowrap;
+    `;
+
     entryDiv.appendChild(pathSpan);
+    entryDiv.appendChild(infoLabel);
     entryDiv.appendChild(removeButton);
     return entryDiv;
 }
 
+function formatModelInfo(info) {
+    if (!info) return "";
+    const parts = [];
+    const st = info.safetensors;
+    if (st) {
+        const params = st.parameters;
+        if (params >= 1e9) parts.push((params / 1e9).toFixed(2) + "B params");
+        else if (params >= 1e6) parts.push((params / 1e6).toFixed(1) + "M params");
+        else parts.push(params + " params");
+        const dtypes = Object.entries(st.dtypes).sort((a, b) => b[1] - a[1]).map(([dtype]) => dtype);
+        if (dtypes.length > 0) parts.push(dtypes.slice(0, 2).join("/"));
+        if (!st.complete) parts.push("incomplete file");
+    }
+    parts.push(formatBytes(info.file_size));
+    return parts.join(" · ");
+}
+
+// Show size, parameter count and dtypes next to model entries without hashing them
+async function annotateModelEntries(area, modelInfo) {
+    const labels = Array.from(area.querySelectorAll('small.deploy-model-info'))
+        .filter(label => !label.textContent);
+    if (labels.length === 0) return;
+    try {
+        if (!modelInfo) {
+            const response = await api.fetchApi("/deploy/model_info", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ paths: labels.map(label => label.dataset.path) })
+            });
+            const result = response instanceof Response ? await response.json() : response;
+            modelInfo = (result && result.models) || {};
+        }
+        labels.forEach(label => {
+            const info = modelInfo[label.dataset.path];
+            if (info) {
+                label.textContent = formatModelInfo(info);
+                if (info.safetensors && !info.safetensors.complete) label.style.color = '#e07a5f';
+            }
+        });
+    } catch (error) {
+        console.error("Error loading model info:", error);
+    }
+}
+
 // Show the modal when the button is clicked
 async function showDeployModal() {
     const modal = createDeployModal();
@@ -411,7 +628,7 @@ async function showDeployModal() {
         const response = await api.fetchApi("/deploy/get_initial_models", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ workflow: workflow })
+            body: JSON.stringify({ workflow: workflow, with_info: true })
         });
 
         let initialModels;
@@ -433,6 +650,8 @@ async function showDeployModal() {
             });
             if (detectedModelsArea.childElementCount === 0) { // Should not happen if models.length > 0 but good practice
                 detectedModelsArea.innerHTML = '<div>No models automatically detected. Add paths below.</div>';
+            } else {
+                annotateModelEntries(detectedModelsArea, initialModels.model_info);
             }
         } else {
             detectedModelsArea.innerHTML = '<div>No models automatically detected in the workflow. Add paths below.</div>';
@@ -448,18 +667,54 @@ async function showDeployModal() {
     const additionalModelInputField = document.getElementById('deploy-additional-models-input'); // Renamed for clarity
     const currentDetectedModelsArea = document.getElementById('deploy-detected-models'); // Use current reference
 
+    let suggestionTimer = null;
+    let suggestionQuery = null;
+    additionalModelInputField.oninput = () => {
+        clearTimeout(suggestionTimer);
+        const query = additionalModelInputField.value.split(';').pop().trim();
+        if (query.length < 2 || query === suggestionQuery) {
+            return;
+        }
+        suggestionTimer = setTimeout(async () => {
+            suggestionQuery = query;
+            try {
+                const response = await api.fetchApi(
+                    "/deploy/models/search?limit=20&q=" + encodeURIComponent(query)
+                );
+                const result = response instanceof Response ? await response.json() : response;
+                if (query !== suggestionQuery || !result || !result.results) {
+                    return;
+                }
+                const suggestions = document.getElementById('deploy-model-suggestions');
+                suggestions.innerHTML = '';
+                result.results.forEach(match => {
+                    const option = document.createElement('option');
+                    option.value = match.path;
+                    option.textContent = match.relative_path;
+                    suggestions.appendChild(option);
+                });
+            } catch (error) {
+                console.error("Error searching models:", error);
+            }
+        }, 150);
+    };
+
     addModelBtn.onclick = async () => {
-        const pathToAdd = additionalModelInputField.value.trim();
-        if (!pathToAdd) {
+        const pathsToAdd = additionalModelInputField.value
+            .split(';')
+            .map(path => path.trim())
+            .filter(path => path !== '');
+        if (pathsToAdd.length === 0) {
             alert("Please enter a model or folder path.");
             return;
         }
 
         try {
-            const response = await api.fetchApi("/deploy/validate_and_get_model_paths", {
+            // All paths are validated in one request
+            const response = await api.fetchApi("/deploy/validate_model_paths", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ path: pathToAdd })
+                body: JSON.stringify({ paths: pathsToAdd })
             });
 
             let validationResult;
@@ -469,6 +724,9 @@ async function showDeployModal() {
                 validationResult = response;
             }
 
+            const failedPaths = Object.entries((validationResult && validationResult.results) || {})
+                .filter(([, result]) => result.status !== "success");
+
             if (validationResult && validationResult.status === "success" && validationResult.model_paths) {
                 if (validationResult.model_paths.length > 0) {
                     // Clear "loading" or "no models" message if it's the first real addition
@@ -496,12 +754,18 @@ async function showDeployModal() {
                             // Optionally show a small message to user that it's a duplicate
                         }
                     });
-                    additionalModelInputField.value = ''; // Clear input field
+                    annotateModelEntries(currentDetectedModelsArea);
+                    // Keep only the paths that couldn't be resolved in the input
+                    additionalModelInputField.value = failedPaths.map(([path]) => path).join('; ');
+                    if (failedPaths.length > 0) {
+                        alert(failedPaths.map(([, result]) => result.message).join("\n"));
+                    }
                 } else {
                     alert("No valid model files found at the specified path.");
                 }
             } else {
-                alert("Error validating path: " + (validationResult.message || "Unknown error"));
+                const messages = failedPaths.map(([, result]) => result.message);
+                alert("Error validating path: " + (messages.join("\n") || validationResult.message || "Unknown error"));
             }
         } catch (error) {
             console.error("Error adding model path:", error);
@@ -554,32 +818,11 @@ async function performDeployment(product_name, user_id, secret_key) {
         var workflow = graph.output;
 
 
-        // Fetch object_info and properly extract the JSON data
-        const response = await api.fetchApi("/object_info", {
-            method: "GET",
-            headers: { "Content-Type": "application/json" }
-        });
-
-        // Check if response is a Response object that needs to be parsed
-        let object_info;
-        if (response instanceof Response) {
-            try {
-                object_info = await response.json();
-            } catch (e) {
-                console.error("Error parsing response JSON:", e);
-                object_info = {}; // Set default value if parsing fails
-            }
-        } else {
-            // If api.fetchApi already returns parsed data
-            object_info = response;
-        }
-
-
-        // Create the request body
+        // Create the request body. Custom nodes are looked up on the server
+        // from ComfyUI's node registry, so object_info isn't sent.
         const requestData = {
             "workflow": workflow,
             "filePath": filename,
-            "object_info": object_info,
             "product_name": product_name,
             "user_id": user_id,
             "secret_key": secret_key,
@@ -611,6 +854,7 @@ async function performDeployment(product_name, user_id, secret_key) {
             // If api.fetchApi already returns parsed data
             responseData = requirements_response;
         }
+        responseData = await waitForJob(responseData);
 
         if (responseData.status === "error") {
             // Show error message from the API
@@ -621,6 +865,11 @@ async function performDeployment(product_name, user_id, secret_key) {
             if (statusMessage) {
                 statusMessage.textContent = responseData.message || "An error occurred during deployment";
                 statusMessage.style.color = "#d64545";
+                if (responseData.resumable) {
+                    statusMessage.appendChild(
+                        createResumeButton(user_id, secret_key, responseData.deployment_id)
+                    );
+                }
             }
         } else {
             // Notify user that deployment was successful
@@ -658,6 +907,83 @@ async function performDeployment(product_name, user_id, secret_key) {
     }
 }
 
+// Button offered when an upload failed part-way; only the missing parts are re-sent
+function createResumeButton(user_id, secret_key, deployment_id) {
+    const resumeButton = document.createElement('button');
+    resumeButton.textContent = 'Resume Upload';
+    resumeButton.style.cssText = `
+        display: block;
+        margin: 10px auto 0;
+        padding: 8px 15px;
+        background-color: #007bff;
+        border: none;
+        border-radius: 3px;
+        color: #fff;
+        cursor: pointer;
+    `;
+    resumeButton.onclick = () => resumeUploads(user_id, secret_key, deployment_id);
+    return resumeButton;
+}
+
+async function resumeUploads(user_id, secret_key, deployment_id) {
+    if (DeploySystem.isDeploying) {
+        console.log("Deployment already in progress");
+        return;
+    }
+    DeploySystem.isDeploying = true;
+
+    const loadingSpinner = document.getElementById('deploy-loading-spinner');
+    const statusMessage = document.getElementById('deploy-status-message');
+    if (loadingSpinner) {
+        loadingSpinner.style.display = 'block';
+    }
+    if (statusMessage) {
+        statusMessage.style.color = "#fff";
+        statusMessage.textContent = "Resuming upload...";
+    }
+
+    try {
+        const response = await api.fetchApi("/deploy/resume_uploads", {
+            method: "POST",
+            body: JSON.stringify({
+                user_id: user_id,
+                secret_key: secret_key,
+                deployment_id: deployment_id
+            }),
+            headers: { "Content-Type": "application/json" }
+        });
+        const responseData = await waitForJob(await parseApiResponse(response));
+
+        if (responseData.status === "error") {
+            const errors = (responseData.failed || []).map(f => f.error).join("; ")
+                || responseData.message;
+            showDeploymentMessage("error", "Resuming the upload failed: " + errors);
+            if (statusMessage) {
+                statusMessage.textContent = "Resuming the upload failed: " + errors;
+                statusMessage.style.color = "#d64545";
+                // Nothing failed means nothing is left to resume
+                if ((responseData.failed || []).length) {
+                    statusMessage.appendChild(createResumeButton(user_id, secret_key, deployment_id));
+                }
+            }
+        } else {
+            showDeploymentMessage("success", "Deployment upload completed!");
+            if (statusMessage) {
+                statusMessage.textContent = "Deployment upload completed!";
+                statusMessage.style.color = "#2e7d32";
+            }
+        }
+    } catch (error) {
+        console.error("Error resuming upload:", error);
+        showDeploymentMessage("error", "An error occurred while resuming the upload. Please check the console for details.");
+    } finally {
+        DeploySystem.isDeploying = false;
+        if (loadingSpinner) {
+            loadingSpinner.style.display = 'none';
+        }
+    }
+}
+
 // Function to show deployment messages to the user
 function showDeploymentMessage(type, message) {
     // Create notification element if it doesn't exist
@@ -722,6 +1048,7 @@ function initializeDeployExtension() {
         app.registerExtension({
             name: "deploy-node.menu.button",
             async setup() {
+                api.addEventListener("deploy-node.progress", (event) => renderDeployProgress(event.detail));
                 try {
                     let deploy_button = new (await import("../../scripts/ui/components/button.js")).ComfyButton({
                         action: (e) => {